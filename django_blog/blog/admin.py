@@ -1,16 +1,228 @@
-from django.contrib import admin
-from blog.models import Category, Comment, Post
+from django.contrib import admin, messages
+from django.db import transaction
+from django.db.models import Count
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from django.utils.text import Truncator, capfirst
+from django.utils.translation import ngettext
+from blog.bulk import chunked
+from blog.models import ArchivedComment, Category, Comment, PendingComment, Post
+from blog.outbox import publish
+from blog.pagination import EstimatedCountPaginator
+from blog.search import filter_posts
+
+
+class BigTableAdmin(admin.ModelAdmin):
+    """
+    Base class of the admins of tables that grow to millions of rows.
+    The change list counts the rows with EstimatedCountPaginator and
+    doesn't count the whole table a second time for the filters.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+def without_delete_selected(actions):
+    # Django's delete action loads and lists every selected row and
+    # deletes them one by one, the bulk actions replace it
+    actions.pop("delete_selected", None)
+    return actions
+
+
+class ArchivedCommentAdmin(BigTableAdmin):
+    """
+    Archived comments are listed like the comments, newest archived
+    first, and searched by the id of their post.
+    """
+
+    list_display = ("author", "post", "created_on", "archived_on")
+    list_select_related = ("post",)
+    ordering = ("-pk",)
+    raw_id_fields = ("post",)
+    search_fields = ("post__id",)
+    search_help_text = "Post id."
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("post__body", "post__body_html")
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if search_term.isdigit():
+            return queryset.filter(post_id=int(search_term)), False
+        return queryset, False
+
 
 class CategoryAdmin(admin.ModelAdmin):
-    pass
+    list_display = ("name", "slug", "post_count")
+    ordering = ("name",)
+    search_fields = ("name",)
+
+
+class CommentAdmin(BigTableAdmin):
+    """
+    Comments are listed newest first and drilled down by date through
+    the created_on index, and searched by the exact author name or the
+    id of the post, which are indexed too. The post of every row is
+    loaded by the same query, without its body.
+    """
+
+    list_display = ("author", "short_body", "post", "created_on")
+    list_select_related = ("post",)
+    date_hierarchy = "created_on"
+    ordering = ("-created_on", "-id")
+    raw_id_fields = ("post",)
+    search_fields = ("author",)
+    search_help_text = "Exact author name or post id."
+    actions = ("delete_comments",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("post__body", "post__body_html")
+
+    def get_actions(self, request):
+        return without_delete_selected(super().get_actions(request))
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if search_term.isdigit():
+            return queryset.filter(post_id=int(search_term)), False
+        return queryset.filter(author=search_term), False
+
+    @admin.display(description="Comment")
+    def short_body(self, comment):
+        return Truncator(comment.body).chars(80)
+
+    @admin.action(description="Delete selected comments", permissions=["delete"])
+    def delete_comments(self, request, queryset):
+        """
+        Deletes the selected comments with a single DELETE and recounts
+        the comments of their posts, instead of sending signals for
+        every comment.
+        """
+
+        with transaction.atomic():
+            post_ids = list(queryset.order_by().values_list("post_id", flat=True).distinct())
+            deleted = queryset.select_related(None).order_by()._raw_delete(queryset.db)
+            for chunk in chunked(post_ids, 500):
+                Post.objects.filter(pk__in=chunk).update_comment_counts(
+                    last_modified=timezone.now()
+                )
+        self.message_user(request, ngettext(
+            "Deleted %d comment.", "Deleted %d comments.", deleted
+        ) % deleted, messages.SUCCESS)
+
+
+class PendingCommentAdmin(admin.ModelAdmin):
+    """
+    The outbox, oldest first. Comments can be published or rejected
+    before drain_comments gets to them.
+    """
+
+    list_display = ("author", "post", "received_on")
+    list_select_related = ("post",)
+    ordering = ("pk",)
+    raw_id_fields = ("post",)
+    actions = ("approve_comments", "reject_comments")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("post__body", "post__body_html")
+
+    def get_actions(self, request):
+        return without_delete_selected(super().get_actions(request))
+
+    @admin.action(description="Publish selected comments", permissions=["delete"])
+    def approve_comments(self, request, queryset):
+        with transaction.atomic():
+            pending = list(queryset.select_related(None).order_by("pk"))
+            if pending:
+                publish(pending)
+        self.message_user(request, ngettext(
+            "Published %d comment.", "Published %d comments.", len(pending)
+        ) % len(pending), messages.SUCCESS)
+
+    @admin.action(description="Reject selected comments", permissions=["delete"])
+    def reject_comments(self, request, queryset):
+        # Nothing listens to deleted pending comments, so this is a single DELETE
+        deleted, _ = queryset.delete()
+        self.message_user(request, ngettext(
+            "Rejected %d comment.", "Rejected %d comments.", deleted
+        ) % deleted, messages.SUCCESS)
+
+
+class PostAdmin(BigTableAdmin):
+    """
+    Posts are listed newest first and drilled down by date through the
+    created_on index, filtered by category and searched through the
+    full text search index.
+    """
+
+    list_display = ("title", "created_on", "last_modified", "comment_count")
+    list_filter = ("categories",)
+    date_hierarchy = "created_on"
+    ordering = ("-created_on", "-id")
+    search_fields = ("title",)
+    search_help_text = "Words in the title or the body."
+    actions = ("recount_comments",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("body_html")
+
+    def get_search_results(self, request, queryset, search_term):
+        return filter_posts(queryset, search_term), False
+
+    def get_deleted_objects(self, objs, request):
+        """
+        Lists the posts to delete with the number of their comments,
+        counted per post. Django's default loads and lists every
+        comment.
+        """
+
+        posts = list(objs)
+        ids = [post.pk for post in posts]
+        model_count = {Post._meta.verbose_name_plural: len(posts)}
+        perms_needed = set()
+        counts = {}
+        for model in (Comment, ArchivedComment, PendingComment):
+            rows = model.objects.filter(post__in=ids).order_by().values_list("post")
+            counts[model] = dict(rows.annotate(Count("pk")))
+            if counts[model]:
+                model_count[model._meta.verbose_name_plural] = sum(counts[model].values())
+                if not self.admin_site.get_model_admin(model).has_delete_permission(request):
+                    perms_needed.add(model._meta.verbose_name)
+
+        deleted_objects = []
+        for post in posts:
+            url = reverse(f"{self.admin_site.name}:blog_post_change", args=[post.pk])
+            deleted_objects.append(format_html(
+                '{}: <a href="{}">{}</a>', capfirst(Post._meta.verbose_name), url, post
+            ))
+            comments = [
+                f"{capfirst(model._meta.verbose_name_plural)}: {per_post[post.pk]}"
+                for model, per_post in counts.items() if post.pk in per_post
+            ]
+            if comments:
+                deleted_objects.append(comments)
+        return deleted_objects, model_count, perms_needed, []
 
-class CommentAdmin(admin.ModelAdmin):
-    pass
+    def delete_view(self, request, object_id, extra_context=None):
+        # Django runs the whole view in one transaction, which would
+        # hold the write lock while delete_model deletes the comments
+        # chunk by chunk, each chunk in a transaction of its own
+        return self._delete_view(request, object_id, extra_context)
 
-class PostAdmin(admin.ModelAdmin):
-    pass
+    @admin.action(description="Recount comments of selected posts", permissions=["change"])
+    def recount_comments(self, request, queryset):
+        updated = queryset.update_comment_counts()
+        self.message_user(request, ngettext(
+            "Recounted the comments of %d post.", "Recounted the comments of %d posts.", updated
+        ) % updated, messages.SUCCESS)
 
 # Register the models with the admin classes
+admin.site.register(ArchivedComment, ArchivedCommentAdmin)
 admin.site.register(Category, CategoryAdmin)
 admin.site.register(Comment, CommentAdmin)
+admin.site.register(PendingComment, PendingCommentAdmin)
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,230 @@
+from functools import wraps
+
+from django.core.exceptions import BadRequest
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_safe
+
+from blog.cache import category_nav, conditional_page
+from blog.models import Comment, Post
+from blog.pagination import CursorPaginator, get_comments_page_size
+from blog.views import EPOCH, page_rows, post_validator_queryset, rows_modified
+
+
+# Version 1 of the read-only JSON API. The fields of a response can be
+# chosen with ?fields=, e.g. ?fields=id,title. Only the columns behind
+# the chosen fields are loaded, with values(), so no model instances
+# are created and the body is only read when it is asked for.
+
+POST_FIELDS = (
+    "id", "title", "excerpt", "body", "body_format", "body_html",
+    "created_on", "last_modified", "comment_count", "categories", "url",
+)
+POST_LIST_DEFAULT_FIELDS = (
+    "id", "title", "excerpt", "created_on", "last_modified", "comment_count", "categories", "url",
+)
+POST_DEFAULT_FIELDS = POST_LIST_DEFAULT_FIELDS + ("body_html",)
+COMMENT_FIELDS = ("id", "author", "body", "created_on")
+CATEGORY_FIELDS = ("name", "slug", "post_count", "url")
+
+# Fields that are not columns of the post table
+COMPUTED_FIELDS = {"categories", "url"}
+
+
+def requested_fields(request, allowed, default):
+    """
+    Returns the fields listed in the comma separated `fields` parameter,
+    or the default fields without it. Unknown fields are a bad request.
+    """
+
+    value = request.GET.get("fields")
+    if value is None:
+        return default
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(",") if field.strip()))
+    unknown = sorted(set(fields) - set(allowed))
+    if unknown or not fields:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown)}." if unknown else "No fields.")
+    return fields
+
+
+def columns(fields, *needed):
+    """
+    Returns the columns to load for the fields, after the columns the
+    view needs itself, e.g. for the page cursors.
+    """
+
+    stored = [field for field in fields if field not in COMPUTED_FIELDS]
+    return list(dict.fromkeys([*needed, *stored]))
+
+
+def serialize_posts(rows, fields):
+    """
+    Turns rows of posts loaded with values() into the response items.
+    The categories of all the posts are loaded with one query, and
+    only when they are asked for.
+    """
+
+    categories = {}
+    if "categories" in fields:
+        links = (
+            Post.categories.through.objects.filter(post__in=[row["id"] for row in rows])
+            .order_by("category__name")
+            .values_list("post_id", "category__slug")
+        )
+        for post_id, slug in links:
+            categories.setdefault(post_id, []).append(slug)
+
+    items = []
+    for row in rows:
+        if "categories" in fields:
+            row["categories"] = categories.get(row["id"], [])
+        if "url" in fields:
+            row["url"] = reverse("blog_detail", kwargs={"pk": row["id"]})
+        items.append({field: row[field] for field in fields})
+    return items
+
+
+def api_view(view):
+    """
+    Returns errors of an API view as JSON instead of an HTML page.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404 as error:
+            return JsonResponse({"error": str(error) or "Not found."}, status=404)
+        except BadRequest as error:
+            return JsonResponse({"error": str(error)}, status=400)
+
+    return wrapper
+
+
+def posts_queryset(request):
+    slug = request.GET.get("category")
+    if slug:
+        return Post.objects.filter(categories__slug=slug)
+    return Post.objects.all()
+
+
+def posts_validators(request):
+    fields = requested_fields(request, POST_FIELDS, POST_LIST_DEFAULT_FIELDS)
+    rows = list(page_rows(request, posts_queryset(request)))
+    return (fields, request.GET.get("category"), rows), rows_modified(rows)
+
+
+def post_validators(request, pk):
+    fields = requested_fields(request, POST_FIELDS, POST_DEFAULT_FIELDS)
+    post = post_validator_queryset(pk).first()
+    if post is None:
+        return None
+    version = (pk, fields, post["last_modified"], post["comment_count"])
+    # comment_count is part of the payload, a new comment doesn't bump last_modified
+    return version, max(post["last_modified"], post["latest_on"] or EPOCH)
+
+
+def comments_validators(request, pk):
+    fields = requested_fields(request, COMMENT_FIELDS, COMMENT_FIELDS)
+    post = post_validator_queryset(pk).first()
+    if post is None:
+        return None
+    version = (pk, fields, post["last_modified"], post["comment_count"], request.GET.get("after"))
+    return version, max(post["last_modified"], post["latest_on"] or EPOCH)
+
+
+def categories_validators(request):
+    fields = requested_fields(request, CATEGORY_FIELDS, CATEGORY_FIELDS)
+    nav = category_nav()
+    return (fields, nav["version"]), nav["last_modified"]
+
+
+@api_view
+@require_safe
+@conditional_page(posts_validators)
+def api_posts(request):
+    """
+    Returns a page of posts as JSON, newest first, continuing from the
+    cursor given in the `after` or `before` parameter. The `category`
+    parameter limits the posts to the category with the given slug.
+    The response contains the posts and the cursors of the next and
+    previous pages, which are null at the ends of the list.
+    """
+
+    fields = requested_fields(request, POST_FIELDS, POST_LIST_DEFAULT_FIELDS)
+    paginator = CursorPaginator(
+        posts_queryset(request).values(*columns(fields, "id", "created_on"))
+    )
+    page = paginator.get_page(after=request.GET.get("after"), before=request.GET.get("before"))
+    data = {
+        "posts": serialize_posts(page.object_list, fields),
+        "next": page.next_cursor,
+        "previous": page.previous_cursor,
+    }
+
+    return JsonResponse(data)
+
+
+@api_view
+@require_safe
+@conditional_page(post_validators)
+def api_post(request, pk):
+    """
+    Returns a single post as JSON, or 404 when it doesn't exist. By
+    default the body is returned as the stored, sanitized HTML, the
+    raw body is only loaded when it is asked for.
+    """
+
+    fields = requested_fields(request, POST_FIELDS, POST_DEFAULT_FIELDS)
+    row = Post.objects.filter(pk=pk).values(*columns(fields, "id")).first()
+    if row is None:
+        raise Http404("No post found.")
+
+    return JsonResponse(serialize_posts([row], fields)[0])
+
+
+@api_view
+@require_safe
+@conditional_page(comments_validators)
+def api_comments(request, pk):
+    """
+    Returns a page of the post's comments as JSON, oldest first,
+    continuing from the cursor given in the `after` parameter. The
+    response contains the comments and the cursor of the next page,
+    which is null on the last page.
+    """
+
+    fields = requested_fields(request, COMMENT_FIELDS, COMMENT_FIELDS)
+    if not Post.objects.filter(pk=pk).exists():
+        raise Http404("No post found.")
+    paginator = CursorPaginator(
+        Comment.objects.filter(post=pk).values(*columns(fields, "id", "created_on")),
+        page_size=get_comments_page_size(),
+        descending=False,
+    )
+    page = paginator.get_page(after=request.GET.get("after"))
+    data = {
+        "comments": [{field: row[field] for field in fields} for row in page],
+        "next": page.next_cursor,
+    }
+
+    return JsonResponse(data)
+
+
+@api_view
+@require_safe
+@conditional_page(categories_validators)
+def api_categories(request):
+    """
+    Returns the categories that have posts as JSON, by name, with the
+    number of posts in each. They come from the cached category
+    navigation, so this runs no queries while it is cached.
+    """
+
+    fields = requested_fields(request, CATEGORY_FIELDS, CATEGORY_FIELDS)
+    categories = category_nav()["categories"]
+    data = {
+        "categories": [{field: row[field] for field in fields} for row in categories],
+    }
+
+    return JsonResponse(data)
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        # Connect the cache invalidation signal handlers
+        from blog import signals  # noqa: F401
+        from blog.search import install_search_index
+
+        # Table rebuilds by later migrations drop the search triggers
+        post_migrate.connect(install_search_index, sender=self)
@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from blog.models import ArchivedComment, Comment, Post
+
+
+ARCHIVED_FIELDS = ("id", "post_id", "author", "body", "created_on")
+
+
+def archive_days():
+    """
+    Returns the age in days after which comments are archived, or None
+    to keep them regardless of their age. Can be changed with the
+    BLOG_COMMENT_ARCHIVE_DAYS setting.
+    """
+
+    return getattr(settings, "BLOG_COMMENT_ARCHIVE_DAYS", None)
+
+
+def archive_keep():
+    """
+    Returns how many of the newest comments of a post stay in the
+    comment table, or None to keep them all. Can be changed with the
+    BLOG_COMMENT_ARCHIVE_KEEP setting.
+    """
+
+    return getattr(settings, "BLOG_COMMENT_ARCHIVE_KEEP", None)
+
+
+def move_to_archive(queryset):
+    """
+    Moves the comments of the queryset to the archive table and
+    returns how many were moved. Copying the comments, deleting them
+    and recounting the comments of their posts happen in one
+    transaction, so a comment is never lost or shown twice.
+    last_modified of the posts is bumped, which renders their comment
+    lists again.
+    """
+
+    with transaction.atomic():
+        rows = list(queryset.values(*ARCHIVED_FIELDS))
+        if not rows:
+            return 0
+        now = timezone.now()
+        ArchivedComment.objects.bulk_create(
+            [ArchivedComment(archived_on=now, **row) for row in rows]
+        )
+        # The posts are recounted below, the signal handlers aren't needed
+        moved = Comment.objects.filter(pk__in=[row["id"] for row in rows])
+        moved._raw_delete(moved.db)
+        Post.objects.filter(pk__in={row["post_id"] for row in rows}).update_comment_counts(
+            last_modified=now
+        )
+    return len(rows)
+
+
+def archive_old(days, batch_size):
+    """
+    Archives the comments older than the given number of days, oldest
+    first, in batches found through the created_on index. Returns the
+    number of comments archived.
+    """
+
+    before = timezone.now() - timedelta(days=days)
+    old = Comment.objects.filter(created_on__lt=before).order_by("created_on", "id")
+    archived = 0
+    while count := move_to_archive(old[:batch_size]):
+        archived += count
+    return archived
+
+
+def archive_crowded(keep, batch_size):
+    """
+    Archives the comments of every post that has more than `keep`
+    comments, except its `keep` newest ones, in batches. Only posts
+    whose stored comment count is too high are looked at, and their
+    comments are found through the comment index of the post. Returns
+    the number of comments archived.
+    """
+
+    archived = 0
+    # Listed up front, archiving changes the counts being filtered on
+    posts = list(Post.objects.filter(comment_count__gt=keep).values_list("pk", flat=True))
+    for pk in posts:
+        comments = Comment.objects.filter(post=pk)
+        oldest_kept = (
+            comments.order_by("-created_on", "-id")
+            .values_list("created_on", "id")[keep - 1 : keep].first()
+            if keep else None
+        )
+        if oldest_kept is not None:
+            created_on, kept_pk = oldest_kept
+            comments = comments.filter(
+                Q(created_on__lt=created_on) | Q(created_on=created_on, id__lt=kept_pk)
+            )
+        comments = comments.order_by("created_on", "id")
+        while count := move_to_archive(comments[:batch_size]):
+            archived += count
+    return archived
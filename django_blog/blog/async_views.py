@@ -0,0 +1,138 @@
+from django.http import Http404, HttpResponseRedirect
+from django.shortcuts import aget_object_or_404, redirect, render
+from blog.models import Category, Post
+from blog.cache import acategory_nav, conditional_page, fragment_timeout
+from blog.forms import CommentForm
+from blog.outbox import asave_comment
+from blog.ratelimit import acheck_comment
+from blog.pagination import CursorPaginator, decode_cursor
+from blog.related import related_posts
+from blog.views import (
+    comment_page,
+    comments_paginator,
+    listing_queryset,
+    listing_version,
+    page_rows,
+    post_validator_queryset,
+    post_version,
+)
+
+
+# Async versions of the read views, used when BLOG_ASYNC_VIEWS is on.
+# The queries run through Django's async ORM API, and every queryset
+# is evaluated before rendering, since templates can't run queries
+# from an async context.
+
+
+async def index_validators(request):
+    rows = [row async for row in page_rows(request, Post.objects.all())]
+    return listing_version(rows, await acategory_nav())
+
+
+async def category_validators(request, slug):
+    category = await Category.objects.filter(slug=slug).values("pk", "name").afirst()
+    if category is None:
+        return None
+    rows = page_rows(request, Post.objects.filter(categories=category["pk"]))
+    return listing_version([row async for row in rows], await acategory_nav(), category["name"])
+
+
+async def detail_validators(request, pk):
+    post = await post_validator_queryset(pk).afirst()
+    return post_version(request, pk, post, await acategory_nav())
+
+
+async def get_page(request, queryset):
+    """
+    Async counterpart of blog.pagination.paginate.
+    """
+
+    after, before = request.GET.get("after"), request.GET.get("before")
+    paginator = CursorPaginator(queryset)
+    rows = [row async for row in paginator.page_queryset(after, before)]
+    return paginator.build_page(rows, after, before)
+
+
+@conditional_page(index_validators)
+async def blog_index(request):
+    """
+    Display a list of all posts. Async version of
+    blog.views.blog_index.
+    """
+
+    page = await get_page(request, listing_queryset(Post.objects.all()))
+    context = {
+        "posts": page.object_list,
+        "page": page,
+        "category_nav": await acategory_nav(),
+    }
+
+    return render(request, "blog/index.html", context)
+
+
+@conditional_page(category_validators)
+async def blog_category(request, slug):
+    """
+    Display posts in the given category. Async version of
+    blog.views.blog_category.
+    """
+
+    category = await Category.objects.filter(slug=slug).afirst()
+    if category is None:
+        category = await Category.objects.filter(name=slug).order_by("pk").afirst()
+        if category is None:
+            raise Http404("No category found.")
+        return redirect("blog_category", slug=category.slug, permanent=True)
+
+    page = await get_page(request, listing_queryset(Post.objects.filter(
+        categories=category
+    )))
+    context = {
+        "category": category,
+        "posts": page.object_list,
+        "page": page,
+        "category_nav": await acategory_nav(),
+    }
+
+    return render(request, "blog/category.html", context)
+
+
+@conditional_page(detail_validators)
+async def blog_detail(request, pk):
+    """
+    Displays the full post and saves new comments. Async version of
+    blog.views.blog_detail. The categories and the page of comments
+    are loaded before rendering, so unlike in the sync view a cached
+    fragment only saves the rendering, not the query.
+    """
+
+    post = await aget_object_or_404(Post.objects.defer("body"), pk=pk)
+    rejected = None
+
+    if request.method == "POST":
+        form = CommentForm(request.POST)
+        if form.is_valid():
+            rejected = await acheck_comment(request, pk, form.cleaned_data)
+            if rejected is None:
+                await asave_comment(post, form.cleaned_data)
+
+                return HttpResponseRedirect(request.path_info)
+            form.add_error(None, rejected[0])
+
+    cursor = request.GET.get("comments", "")
+    if cursor:
+        decode_cursor(cursor)
+    paginator = comments_paginator(post)
+    rows = [comment async for comment in paginator.page_queryset(after=cursor or None)]
+    context = {
+        "post": post,
+        "categories": [category async for category in post.categories.all()],
+        "related_posts": [row async for row in related_posts(pk)],
+        "comments": paginator.build_page(rows, after=cursor or None),
+        "comments_cursor": cursor,
+        "cache_timeout": fragment_timeout(),
+        "form": form if rejected else CommentForm(),
+        "category_nav": await acategory_nav(),
+    }
+
+    return comment_page(request, context, rejected)
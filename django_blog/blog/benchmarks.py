@@ -0,0 +1,314 @@
+import math
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from blog.bulk import preserved_timestamps
+from blog.cache import invalidate_category_nav
+from blog import metrics
+from blog.models import ArchivedComment, Category, Comment, PendingComment, Post, RelatedPost
+from blog.pagination import encode_cursor
+from blog.related import rebuild_related
+from blog.rendering import MARKDOWN, PLAIN
+
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+    "exercitation ullamco laboris nisi aliquip ex ea commodo consequat duis aute irure "
+    "in reprehenderit voluptate velit esse cillum fugiat nulla pariatur excepteur sint "
+    "occaecat cupidatat non proident sunt culpa qui officia deserunt mollit anim id est "
+    "python django database query index cache template render page post comment"
+).split()
+
+# Most posts get a few comments and a few posts get thousands
+COMMENT_TAIL = 1.2
+MAX_COMMENTS_PER_POST = 50000
+
+
+def words(rng, count):
+    return " ".join(rng.choices(WORDS, k=count))
+
+
+def comment_count(rng, mean):
+    """
+    Draws the number of comments of a post from a Pareto distribution
+    with the given mean.
+    """
+
+    if mean <= 0:
+        return 0
+    scale = mean * (COMMENT_TAIL - 1) / COMMENT_TAIL
+    return min(int(rng.paretovariate(COMMENT_TAIL) * scale), MAX_COMMENTS_PER_POST)
+
+
+def generate(posts, categories=None, comments_per_post=5.0, seed=0, batch_size=2000, progress=None):
+    """
+    Bulk creates `posts` posts with categories and comments, drawn from
+    a random generator seeded with `seed`, so the same arguments give
+    the same data. Post bodies vary in length and a third of them are
+    Markdown, a few categories hold most of the posts and comments per
+    post follow a heavy tailed distribution. Posts are spread over the
+    last years, newest with the highest id.
+
+    The related posts of every post are rebuilt afterwards. Returns the
+    number of categories, posts and comments created.
+    """
+
+    rng = random.Random(seed)
+    categories = categories or max(5, posts // 1000)
+    category_objects = [
+        Category(name=f"{WORDS[number % len(WORDS)].capitalize()} {number}")
+        for number in range(categories)
+    ]
+    # Unique also next to the categories of an earlier run
+    taken = set(Category.objects.values_list("slug", flat=True))
+    for category in category_objects:
+        category.slug = category.unique_slug(taken)
+        taken.add(category.slug)
+    Category.objects.bulk_create(category_objects)
+    category_ids = [category.pk for category in category_objects]
+    # Zipf-like popularity of the categories
+    weights = [1 / rank for rank in range(1, categories + 1)]
+
+    Through = Post.categories.through
+    now = timezone.now()
+    start = now - timedelta(days=3 * 365)
+    step = timedelta(days=3 * 365) / max(posts, 1)
+    total_comments = 0
+
+    with preserved_timestamps():
+        for first in range(0, posts, batch_size):
+            batch, counts = [], []
+            for number in range(first, min(first + batch_size, posts)):
+                created_on = start + step * number
+                post = Post(
+                    title=words(rng, rng.randint(3, 9)).capitalize(),
+                    body="\n\n".join(
+                        words(rng, rng.randint(20, 120))
+                        for _ in range(max(1, int(rng.lognormvariate(1.2, 0.6))))
+                    ),
+                    body_format=MARKDOWN if rng.random() < 0.33 else PLAIN,
+                    created_on=created_on,
+                    last_modified=created_on,
+                )
+                post.update_derived_fields()
+                counts.append(comment_count(rng, comments_per_post))
+                post.comment_count = counts[-1]
+                batch.append(post)
+            Post.objects.bulk_create(batch)
+
+            links = []
+            for post in batch:
+                chosen = set(rng.choices(category_ids, weights, k=rng.randint(1, 3)))
+                links += [Through(post_id=post.pk, category_id=pk) for pk in chosen]
+            Through.objects.bulk_create(links, batch_size=batch_size)
+
+            comments = []
+            for post, count in zip(batch, counts):
+                for number in range(count):
+                    comments.append(Comment(
+                        post_id=post.pk,
+                        author=words(rng, 1).capitalize(),
+                        body=words(rng, rng.randint(5, 60)),
+                        created_on=min(post.created_on + timedelta(minutes=number + 1), now),
+                    ))
+                    if len(comments) >= batch_size:
+                        Comment.objects.bulk_create(comments)
+                        total_comments += len(comments)
+                        comments = []
+            Comment.objects.bulk_create(comments)
+            total_comments += len(comments)
+
+            if progress:
+                progress(len(batch) + first, total_comments)
+
+    Category.objects.filter(pk__in=category_ids).update_post_counts()
+    invalidate_category_nav()
+    rebuild_related()
+    return categories, posts, total_comments
+
+
+def empty_blog():
+    """
+    Deletes every post, comment and category, with plain DELETEs.
+    Deleting through the ORM would send signals for every row.
+    """
+
+    models = (
+        PendingComment, ArchivedComment, Comment, RelatedPost, Post.categories.through, Post,
+        Category,
+    )
+    with connection.cursor() as cursor:
+        for model in models:
+            cursor.execute(f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)}")
+
+
+def benchmark_paths():
+    """
+    Returns the named paths measured by the benchmark: the first and
+    a deep page of the front page, the biggest category, a typical and
+    the most commented post, the comment and JSON APIs, search and a
+    feed.
+    """
+
+    paths = {"index": "/"}
+    count = Post.objects.count()
+    middle = Post.objects.order_by("-created_on", "-id").values_list("created_on", "id")[
+        count // 2 : count // 2 + 1
+    ].first()
+    if middle:
+        paths["index_deep"] = "/?after=" + encode_cursor(*middle)
+
+    biggest = Category.objects.order_by("-post_count", "pk").values_list("slug", flat=True).first()
+    if biggest:
+        paths["category"] = f"/category/{biggest}/"
+
+    counts = Post.objects.order_by("comment_count", "id").values_list("pk", flat=True)
+    if count:
+        paths["detail"] = f"/post/{counts[count // 2]}/"
+        heaviest = Post.objects.order_by("-comment_count", "id").values_list("pk", flat=True)[0]
+        paths["detail_most_comments"] = f"/post/{heaviest}/"
+        paths["comments_api"] = f"/post/{heaviest}/comments/"
+        paths["api_post"] = f"/api/v1/posts/{heaviest}/"
+
+    paths["api_posts"] = "/api/v1/posts/"
+    paths["search"] = "/search/?q=django+cache"
+    paths["feed"] = "/feed/atom/"
+    return paths
+
+
+def measure(client, path, iterations, clear_cache):
+    """
+    Requests the path `iterations` times and returns the latency
+    percentiles, the number of queries, the response size and the
+    peak memory allocated while handling one more request.
+    """
+
+    latencies, queries = [], []
+    size = 0
+    for _ in range(iterations):
+        if clear_cache:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(path)
+            content = b"".join(response.streaming_content) if response.streaming else response.content
+            latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}")
+        queries.append(len(captured))
+        size = len(content)
+
+    if clear_cache:
+        cache.clear()
+    tracemalloc.start()
+    response = client.get(path)
+    if response.streaming:
+        b"".join(response.streaming_content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "path": path,
+        "iterations": iterations,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[min(math.ceil(len(latencies) * 0.95) - 1, len(latencies) - 1)],
+        "mean_ms": statistics.fmean(latencies),
+        "queries": max(queries),
+        "bytes": size,
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def template_engines():
+    """
+    Returns the TEMPLATES settings of the engines the template
+    benchmark compares, by name. The Jinja2 templates are only
+    measured when the Jinja2 package is installed.
+    """
+
+    django_templates = [
+        config for config in settings.TEMPLATES
+        if config["BACKEND"] != settings.BLOG_JINJA2_TEMPLATES["BACKEND"]
+    ]
+    engines = {"django": django_templates}
+    try:
+        import jinja2  # noqa: F401
+    except ImportError:
+        return engines
+    engines["jinja2"] = [settings.BLOG_JINJA2_TEMPLATES, *django_templates]
+    return engines
+
+
+def measure_render(client, path, iterations, clear_cache):
+    """
+    Requests the path `iterations` times and returns the median time
+    spent rendering templates and the median latency of the requests,
+    along with the response size. Every request is measured through
+    the request metrics, whatever the BLOG_METRICS setting.
+    """
+
+    render, latencies = [], []
+    size = 0
+    for _ in range(iterations):
+        if clear_cache:
+            cache.clear()
+        measured = metrics.RequestMetrics()
+        token = metrics.current.set(measured)
+        try:
+            started = time.perf_counter()
+            response = client.get(path)
+            latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            metrics.current.reset(token)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}")
+        render.append(measured.template_ms)
+        size = len(response.content)
+
+    return {
+        "path": path,
+        "iterations": iterations,
+        "render_p50_ms": statistics.median(render),
+        "p50_ms": statistics.median(latencies),
+        "bytes": size,
+    }
+
+
+def compare(results, baseline, max_slowdown):
+    """
+    Returns the regressions of `results` against `baseline`: views that
+    run more queries or whose median latency grew by more than the
+    factor max_slowdown, at the same scale.
+    """
+
+    previous = {
+        (scale["posts"], name): view
+        for scale in baseline["scales"] for name, view in scale["views"].items()
+    }
+    regressions = []
+    for scale in results["scales"]:
+        for name, view in scale["views"].items():
+            before = previous.get((scale["posts"], name))
+            if before is None:
+                continue
+            if view["queries"] > before["queries"]:
+                regressions.append(
+                    f"{name} at {scale['posts']} posts: {before['queries']} -> {view['queries']} queries"
+                )
+            if view["p50_ms"] > before["p50_ms"] * max_slowdown:
+                regressions.append(
+                    f"{name} at {scale['posts']} posts: "
+                    f"p50 {before['p50_ms']:.2f} -> {view['p50_ms']:.2f} ms"
+                )
+    return regressions
@@ -0,0 +1,73 @@
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from blog.models import Comment, Post
+
+
+def chunked(iterable, size):
+    """
+    Yields lists of up to `size` items from the iterable.
+    """
+
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+@contextmanager
+def preserved_timestamps():
+    """
+    Turns off auto_now and auto_now_add on the timestamp fields, so
+    rows written inside the block keep the times set on them. Only for
+    management commands that copy existing data. The fields are shared
+    by every thread of the process, so it must never be used while
+    requests are served: rows saved by other threads would get no
+    timestamps.
+    """
+
+    fields = [
+        Post._meta.get_field("created_on"),
+        Post._meta.get_field("last_modified"),
+        Comment._meta.get_field("created_on"),
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Progress:
+    """
+    Counts processed rows per kind and writes the count and the rate
+    to a stream every `every` rows.
+    """
+
+    def __init__(self, stream, every=10000):
+        self.stream = stream
+        self.every = every
+        self.counts = {}
+        self.started = time.perf_counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def add(self, kind, count):
+        before = self.counts.get(kind, 0)
+        self.counts[kind] = before + count
+        if self.every and before // self.every != self.counts[kind] // self.every:
+            self.report(kind)
+
+    def report(self, kind):
+        count = self.counts[kind]
+        self.stream.write(f"{kind}: {count} ({count / max(self.elapsed(), 1e-9):.0f}/s)")
+
+    def summary(self):
+        parts = ", ".join(f"{count} {kind}" for kind, count in self.counts.items())
+        elapsed = self.elapsed()
+        total = sum(self.counts.values())
+        return f"{parts or 'nothing'} in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} rows/s)"
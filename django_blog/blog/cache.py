@@ -0,0 +1,276 @@
+import copy
+import hashlib
+import re
+from datetime import datetime, timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.middleware.csrf import get_token
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from blog.models import Category
+
+
+CATEGORY_NAV_KEY = "blog.category_nav"
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# The CSRF token of a form, as rendered by {% csrf_token %} and
+# Jinja2's csrf_input, and what stands in for it in cached pages.
+# Quotes in the posts and comments are escaped, so they can't match.
+CSRF_INPUT_RE = re.compile(rb'name="csrfmiddlewaretoken" value="[^"]*"')
+CSRF_PLACEHOLDER = b'name="csrfmiddlewaretoken" value="blog-csrf-token"'
+
+
+def fragment_timeout():
+    """
+    Returns how long rendered fragments are kept in the cache. Can be
+    changed with the BLOG_FRAGMENT_CACHE_TIMEOUT setting.
+    """
+
+    return getattr(settings, "BLOG_FRAGMENT_CACHE_TIMEOUT", 60 * 60)
+
+
+def post_fragment_keys(post, comments_cursor="", static_site=""):
+    """
+    Returns the cache keys of the category bar and comment list
+    fragments rendered by detail.html for the current version of
+    the post. Editing or deleting a comment bumps last_modified of the
+    post and a new comment changes comment_count, so the keys change
+    with every change to the rendered content. Pages rendered by
+    build_static_site link the comment pages differently and keep
+    their comment lists under their own keys.
+    """
+
+    version = [post.pk, post.last_modified.isoformat()]
+    return [
+        make_template_fragment_key("post_categories", version),
+        make_template_fragment_key(
+            "post_comments", version + [post.comment_count, comments_cursor, static_site]
+        ),
+    ]
+
+
+def invalidate_post(post):
+    cache.delete_many(post_fragment_keys(post))
+
+
+def category_nav_queryset():
+    # Empty categories too, their last_modified counts for the navigation
+    return Category.objects.order_by("name", "pk").values(
+        "name", "slug", "post_count", "last_modified"
+    )
+
+
+def build_category_nav(rows):
+    """
+    Returns the category navigation shown on every page: the categories
+    that have posts with their URL and number of posts, a version that
+    changes with the content and the time the categories last changed,
+    which are used by the page validators.
+    """
+
+    last_modified = max((row.pop("last_modified") for row in rows), default=EPOCH)
+    rows = [row for row in rows if row["post_count"] > 0]
+    for row in rows:
+        row["url"] = reverse("blog_category", kwargs={"slug": row["slug"]})
+    return {
+        "categories": rows,
+        "version": make_etag(rows),
+        "last_modified": last_modified,
+    }
+
+
+def category_nav():
+    """
+    Returns the category navigation from the cache, querying the stored
+    post counts only when it isn't cached. The signal handlers that
+    maintain the counts delete the cached navigation.
+    """
+
+    nav = cache.get(CATEGORY_NAV_KEY)
+    if nav is None:
+        nav = build_category_nav(list(category_nav_queryset()))
+        cache.set(CATEGORY_NAV_KEY, nav, fragment_timeout())
+    return nav
+
+
+async def acategory_nav():
+    nav = await cache.aget(CATEGORY_NAV_KEY)
+    if nav is None:
+        nav = build_category_nav([row async for row in category_nav_queryset()])
+        await cache.aset(CATEGORY_NAV_KEY, nav, fragment_timeout())
+    return nav
+
+
+def invalidate_category_nav():
+    # After the commit, so that no request caches the old counts again
+    transaction.on_commit(lambda: cache.delete(CATEGORY_NAV_KEY))
+
+
+def page_cache_enabled():
+    """
+    Whether whole pages are stored in the cache for anonymous readers.
+    Can be changed with the BLOG_PAGE_CACHE setting.
+    """
+
+    return getattr(settings, "BLOG_PAGE_CACHE", False)
+
+
+def page_cache_timeout():
+    return getattr(settings, "BLOG_PAGE_CACHE_TIMEOUT", 60 * 10)
+
+
+def make_etag(version):
+    return quote_etag(hashlib.md5(repr(version).encode()).hexdigest())
+
+
+def page_cache_key(request, etag):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return "blog.page.%s.%s" % (path, etag.strip('"'))
+
+
+def _check_conditions(request, validators):
+    """
+    Returns the ETag, the Last-Modified timestamp and a 304 response
+    when the request's conditions still match, otherwise None.
+    """
+
+    version, last_modified = validators
+    etag = make_etag(version)
+    timestamp = int(last_modified.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validator_headers(response, etag, timestamp)
+    return etag, timestamp, response
+
+
+def set_validator_headers(response, etag, timestamp):
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(timestamp)
+
+
+def _cached_copy(request, response):
+    """
+    Returns the copy of the response to cache, without its CSRF
+    tokens, or None when it can't be cached.
+    """
+
+    if response.streaming:
+        return None
+    cached = copy.copy(response)
+    cached.content, tokens = CSRF_INPUT_RE.subn(CSRF_PLACEHOLDER, response.content)
+    # A token used anywhere else would be served to every visitor
+    if request.META.get("CSRF_COOKIE_NEEDS_UPDATE") and not tokens:
+        return None
+    return cached
+
+
+def _from_cache(request, response):
+    # Every visitor gets a token of their own, with its cookie
+    if CSRF_PLACEHOLDER in response.content:
+        token = b'name="csrfmiddlewaretoken" value="%s"' % get_token(request).encode()
+        response.content = response.content.replace(CSRF_PLACEHOLDER, token)
+    return response
+
+
+def conditional_page(get_validators):
+    """
+    Decorator for the read views. get_validators is called with the
+    view's arguments and returns a (version, last_modified) tuple built
+    from a few cheap indexed queries, or None when the view should run
+    as usual. The version is hashed into a strong ETag.
+
+    A request whose If-None-Match or If-Modified-Since still matches
+    gets a 304 response without rendering anything. In page caching
+    mode the rendered page is also cached for anonymous readers under
+    its ETag, so any change to the underlying rows leads to a new key.
+    The CSRF token of a form belongs to a single visitor, so it is left
+    out of the cached page and filled in for every visitor it is served
+    to. Streaming responses are not cached.
+
+    The version is kept as request.page_version, so a view can use the
+    rows it was built from instead of querying them again.
+
+    Async views are decorated the same way, their get_validators has
+    to be a coroutine function as well.
+    """
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return await view(request, *args, **kwargs)
+
+                validators = await get_validators(request, *args, **kwargs)
+                if validators is None:
+                    return await view(request, *args, **kwargs)
+                request.page_version = validators[0]
+
+                etag, timestamp, response = _check_conditions(request, validators)
+                if response is not None:
+                    return response
+
+                key = None
+                if page_cache_enabled() and not (await request.auser()).is_authenticated:
+                    key = page_cache_key(request, etag)
+                    response = await cache.aget(key)
+
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                    set_validator_headers(response, etag, timestamp)
+                    cached = _cached_copy(request, response) if key else None
+                    if cached is not None:
+                        await cache.aset(key, cached, page_cache_timeout())
+                else:
+                    response = _from_cache(request, response)
+
+                return response
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+
+            validators = get_validators(request, *args, **kwargs)
+            if validators is None:
+                return view(request, *args, **kwargs)
+            request.page_version = validators[0]
+
+            etag, timestamp, response = _check_conditions(request, validators)
+            if response is not None:
+                return response
+
+            key = None
+            if page_cache_enabled() and not request.user.is_authenticated:
+                key = page_cache_key(request, etag)
+                response = cache.get(key)
+
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                set_validator_headers(response, etag, timestamp)
+                cached = _cached_copy(request, response) if key else None
+                if cached is not None:
+                    cache.set(key, cached, page_cache_timeout())
+            else:
+                response = _from_cache(request, response)
+
+            return response
+
+        return wrapper
+
+    return decorator
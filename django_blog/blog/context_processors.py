@@ -0,0 +1,14 @@
+from django.utils.functional import SimpleLazyObject
+
+from blog.cache import category_nav as get_category_nav
+
+
+def category_nav(request):
+    """
+    Adds the category navigation to the context of every template
+    rendered with a request. It is only fetched from the cache when a
+    template uses it. The async views put it in their context
+    themselves, templates can't wait for the cache or the database.
+    """
+
+    return {"category_nav": SimpleLazyObject(get_category_nav)}
@@ -0,0 +1,247 @@
+import json
+from io import StringIO
+
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from blog.cache import conditional_page
+from blog.models import Category, Post
+from blog.views import EPOCH
+
+
+FEED_TITLE = "My Personal Blog"
+
+
+def get_feed_length():
+    """
+    Returns the number of newest posts included in the feeds. Can be
+    changed with the BLOG_FEED_LENGTH setting.
+    """
+
+    return getattr(settings, "BLOG_FEED_LENGTH", 50)
+
+
+def feed_scope(slug):
+    """
+    Returns the posts and the category of a feed. Without a slug the
+    feed contains every post.
+    """
+
+    if slug is None:
+        return Post.objects.all(), None
+    category = Category.objects.filter(slug=slug).first()
+    if category is None:
+        raise Http404("No category found.")
+    return Post.objects.filter(categories=category), category
+
+
+def feed_posts(queryset):
+    """
+    Returns an iterator over the newest posts of the feed. Rows are
+    fetched in chunks together with their categories, so memory use
+    doesn't grow with the length of the feed.
+    """
+
+    return (
+        queryset.defer("body")
+        .prefetch_related("categories")
+        .order_by("-created_on", "-id")[: get_feed_length()]
+        .iterator(chunk_size=100)
+    )
+
+
+def feed_rows(queryset):
+    """
+    Returns the ids and modification times of the posts in the feed.
+    """
+
+    return list(
+        queryset.order_by("-created_on", "-id")
+        .values_list("id", "last_modified")[: get_feed_length()]
+    )
+
+
+def feed_validators(request, slug=None):
+    """
+    Returns the ETag version and the last modification time of a feed
+    from the ids and modification times of the posts in it.
+    """
+
+    queryset, category = feed_scope(slug)
+    rows = feed_rows(queryset)
+    last_modified = max((row[1] for row in rows), default=EPOCH)
+    return (request.path, category and category.name, rows), last_modified
+
+
+class FeedInfo:
+    """
+    Title and absolute URLs of a feed, of all posts or of the category
+    with the given slug and name.
+    """
+
+    def __init__(self, request, slug, name, feed_url):
+        self.title = FEED_TITLE if slug is None else f"{FEED_TITLE}: {name}"
+        if slug is None:
+            self.link = request.build_absolute_uri(reverse("blog_index"))
+        else:
+            self.link = request.build_absolute_uri(
+                reverse("blog_category", kwargs={"slug": slug})
+            )
+        self.feed_url = request.build_absolute_uri(feed_url)
+        self.request = request
+
+    def post_url(self, post):
+        return self.request.build_absolute_uri(reverse("blog_detail", kwargs={"pk": post.pk}))
+
+
+class ChunkedXML:
+    """
+    XML generator that hands out what has been written so far, so a
+    document can be streamed element by element.
+    """
+
+    def __init__(self):
+        self.buffer = StringIO()
+        self.xml = SimplerXMLGenerator(self.buffer, "utf-8", short_empty_elements=True)
+
+    def flush(self):
+        chunk = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return chunk
+
+
+def atom_chunks(info, posts, updated):
+    out = ChunkedXML()
+    xml = out.xml
+    xml.startDocument()
+    xml.startElement("feed", {"xmlns": "http://www.w3.org/2005/Atom"})
+    xml.addQuickElement("title", info.title)
+    xml.addQuickElement("link", None, {"rel": "alternate", "href": info.link})
+    xml.addQuickElement("link", None, {"rel": "self", "href": info.feed_url})
+    xml.addQuickElement("id", info.feed_url)
+    xml.addQuickElement("updated", rfc3339_date(updated))
+    xml.startElement("author", {})
+    xml.addQuickElement("name", FEED_TITLE)
+    xml.endElement("author")
+    yield out.flush()
+
+    for post in posts:
+        url = info.post_url(post)
+        xml.startElement("entry", {})
+        xml.addQuickElement("title", post.title)
+        xml.addQuickElement("link", None, {"rel": "alternate", "href": url})
+        xml.addQuickElement("id", url)
+        xml.addQuickElement("published", rfc3339_date(post.created_on))
+        xml.addQuickElement("updated", rfc3339_date(post.last_modified))
+        xml.addQuickElement("summary", post.excerpt)
+        xml.addQuickElement("content", post.body_html, {"type": "html"})
+        for category in post.categories.all():
+            xml.addQuickElement("category", None, {"term": category.name})
+        xml.endElement("entry")
+        yield out.flush()
+
+    xml.endElement("feed")
+    yield out.flush()
+
+
+def rss_chunks(info, posts, updated):
+    out = ChunkedXML()
+    xml = out.xml
+    xml.startDocument()
+    xml.startElement("rss", {"version": "2.0", "xmlns:atom": "http://www.w3.org/2005/Atom"})
+    xml.startElement("channel", {})
+    xml.addQuickElement("title", info.title)
+    xml.addQuickElement("link", info.link)
+    xml.addQuickElement("description", info.title)
+    xml.addQuickElement("atom:link", None, {"rel": "self", "href": info.feed_url})
+    xml.addQuickElement("lastBuildDate", rfc2822_date(updated))
+    yield out.flush()
+
+    for post in posts:
+        url = info.post_url(post)
+        xml.startElement("item", {})
+        xml.addQuickElement("title", post.title)
+        xml.addQuickElement("link", url)
+        xml.addQuickElement("guid", url, {"isPermaLink": "true"})
+        xml.addQuickElement("pubDate", rfc2822_date(post.created_on))
+        xml.addQuickElement("description", post.body_html)
+        for category in post.categories.all():
+            xml.addQuickElement("category", category.name)
+        xml.endElement("item")
+        yield out.flush()
+
+    xml.endElement("channel")
+    xml.endElement("rss")
+    yield out.flush()
+
+
+def json_chunks(info, posts, updated):
+    header = json.dumps({
+        "version": "https://jsonfeed.org/version/1.1",
+        "title": info.title,
+        "home_page_url": info.link,
+        "feed_url": info.feed_url,
+    })
+    # Leave the object open and stream the items into it
+    yield header[:-1] + ', "items": ['
+
+    separator = ""
+    for post in posts:
+        url = info.post_url(post)
+        item = {
+            "id": url,
+            "url": url,
+            "title": post.title,
+            "content_html": post.body_html,
+            "summary": post.excerpt,
+            "date_published": post.created_on.isoformat(),
+            "date_modified": post.last_modified.isoformat(),
+            "tags": [category.name for category in post.categories.all()],
+        }
+        yield separator + json.dumps(item)
+        separator = ", "
+
+    yield "]}"
+
+
+def stream_feed(request, slug, chunks, content_type):
+    # The version checked by feed_validators holds the posts of the feed
+    _, name, rows = request.page_version
+    info = FeedInfo(request, slug, name, request.path)
+    updated = max((row[1] for row in rows), default=EPOCH)
+    posts = feed_posts(Post.objects.filter(pk__in=[row[0] for row in rows]))
+    return StreamingHttpResponse(chunks(info, posts, updated), content_type=content_type)
+
+
+@conditional_page(feed_validators)
+def atom_feed(request, slug=None):
+    """
+    Streams an Atom feed of the newest posts, of all posts or of the
+    category given by the slug.
+    """
+
+    return stream_feed(request, slug, atom_chunks, "application/atom+xml; charset=utf-8")
+
+
+@conditional_page(feed_validators)
+def rss_feed(request, slug=None):
+    """
+    Streams an RSS 2.0 feed of the newest posts, of all posts or of the
+    category given by the slug.
+    """
+
+    return stream_feed(request, slug, rss_chunks, "application/rss+xml; charset=utf-8")
+
+
+@conditional_page(feed_validators)
+def json_feed(request, slug=None):
+    """
+    Streams a JSON Feed of the newest posts, of all posts or of the
+    category given by the slug.
+    """
+
+    return stream_feed(request, slug, json_chunks, "application/feed+json; charset=utf-8")
@@ -0,0 +1,111 @@
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.template import defaultfilters
+from django.template.backends.jinja2 import Jinja2, Template
+from django.urls import reverse
+from django.utils.html import linebreaks as linebreaks_html
+from django.utils.module_loading import import_string
+from jinja2 import Environment, pass_context
+from markupsafe import Markup
+
+from blog.metrics import TimedRenderMixin
+from blog.templatetags import blog_tags
+
+
+# Jinja2 versions of the blog pages, for BLOG_TEMPLATE_ENGINE=jinja2.
+# The templates in blog/jinja2/ render the same HTML as the Django
+# templates, with the helpers below standing in for the template tags
+# and filters they use. This module imports Jinja2, so it's only
+# loaded when the engine is configured.
+
+
+def url(name, *args, **kwargs):
+    return reverse(name, args=args or None, kwargs=kwargs or None)
+
+
+@pass_context
+def page_link(context, name, cursor):
+    return blog_tags.page_link(context, name, cursor)
+
+
+def fragment_cache():
+    # The cache used by Django's {% cache %} tag
+    try:
+        return caches["template_fragments"]
+    except InvalidCacheBackendError:
+        return caches["default"]
+
+
+def cached(timeout, name, *vary_on, caller):
+    """
+    Caches the content of a {% call cached(...) %} block like the
+    {% cache %} tag of the Django templates, under the same keys, so
+    blog.cache.invalidate_post drops the fragments of both engines.
+    """
+
+    cache = fragment_cache()
+    key = make_template_fragment_key(name, vary_on)
+    value = cache.get(key)
+    if value is None:
+        value = str(caller())
+        cache.set(key, value, timeout)
+    return Markup(value)
+
+
+def linebreaks(value):
+    return Markup(linebreaks_html(value, autoescape=True))
+
+
+def environment(**options):
+    """
+    Returns the Jinja2 environment of the blog templates.
+    """
+
+    env = Environment(**options)
+    env.globals.update(url=url, page_link=page_link, cached=cached)
+    env.filters.update(
+        date=defaultfilters.date,
+        linebreaks=linebreaks,
+        pluralize=defaultfilters.pluralize,
+    )
+    return env
+
+
+class BlogJinja2Template(Template):
+    def render(self, context=None, request=None):
+        # Django's Jinja2 backend lets the context processors override
+        # the context of the view. The async views pass the category
+        # navigation themselves, so the view wins here, as it does
+        # with the Django templates.
+        if request is not None:
+            processed = {}
+            for processor in self.backend.blog_context_processors:
+                processed.update(processor(request))
+            context = {**processed, **(context or {})}
+        return super().render(context, request)
+
+
+class TimedJinja2Template(TimedRenderMixin, BlogJinja2Template):
+    pass
+
+
+class TimedJinja2(Jinja2):
+    """
+    Jinja2 template backend that adds the time spent rendering
+    templates to the metrics of the current request, like
+    blog.metrics.TimedDjangoTemplates.
+    """
+
+    def __init__(self, params):
+        super().__init__(params)
+        self.blog_context_processors = [
+            import_string(path) for path in self.context_processors
+        ]
+        self.context_processors = []
+
+    def from_string(self, template_code):
+        return TimedJinja2Template(self.env.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedJinja2Template(template.template, self)
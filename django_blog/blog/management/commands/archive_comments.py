@@ -0,0 +1,58 @@
+import time
+from argparse import ArgumentTypeError
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.archive import archive_crowded, archive_days, archive_keep, archive_old
+
+
+def non_negative(value):
+    number = int(value)
+    if number < 0:
+        raise ArgumentTypeError(f"{value} is negative.")
+    return number
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves comments out of the comment table into the archive in "
+        "batches, one transaction per batch: comments older than a number "
+        "of days, and the comments of a post beyond its newest ones. The "
+        "defaults come from the BLOG_COMMENT_ARCHIVE_DAYS and "
+        "BLOG_COMMENT_ARCHIVE_KEEP settings. Archived comments are still "
+        "shown on their own page, linked from the post."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than", type=non_negative, metavar="DAYS",
+            help="Archive comments older than this many days.",
+        )
+        parser.add_argument(
+            "--keep", type=non_negative,
+            help="Archive all but this many of the newest comments of every post.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of comments moved per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        days = options["older_than"] if options["older_than"] is not None else archive_days()
+        keep = options["keep"] if options["keep"] is not None else archive_keep()
+        if days is None and keep is None:
+            raise CommandError(
+                "Nothing to archive. Give --older-than or --keep, or set "
+                "BLOG_COMMENT_ARCHIVE_DAYS or BLOG_COMMENT_ARCHIVE_KEEP."
+            )
+        if (days is not None and days < 0) or (keep is not None and keep < 0):
+            raise CommandError("The number of days and of comments to keep can't be negative.")
+
+        started = time.perf_counter()
+        archived = 0
+        if days is not None:
+            archived += archive_old(days, options["batch_size"])
+        if keep is not None:
+            archived += archive_crowded(keep, options["batch_size"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"Archived {archived} comments in {elapsed:.2f}s.")
@@ -0,0 +1,113 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from blog.models import Post
+from blog.pagination import CursorPaginator
+from blog.views import listing_queryset
+
+
+def value_size(value):
+    if value is None:
+        return 0
+    if isinstance(value, bytes):
+        return len(value)
+    return len(str(value).encode())
+
+
+class StatementRecorder:
+    """
+    Execute wrapper that remembers every statement run through the
+    connection, so it can be replayed to measure the fetched rows.
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def fetched_bytes(statements):
+    total = 0
+    with connection.cursor() as cursor:
+        for sql, params in statements:
+            cursor.execute(sql, params)
+            total += sum(value_size(value) for row in cursor.fetchall() for value in row)
+    return total
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the bytes fetched from the database per listing page "
+        "with the full post body and with the body deferred."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--posts", type=int, default=200,
+            help="Synthetic posts to create for the run (rolled back afterwards). "
+            "Use 0 to measure the existing posts.",
+        )
+        parser.add_argument(
+            "--body-size", type=int, default=20000,
+            help="Length of the synthetic post bodies in characters.",
+        )
+        parser.add_argument(
+            "--pages", type=int, default=5, help="Number of listing pages to fetch."
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options["posts"]:
+                self.create_posts(options["posts"], options["body_size"])
+
+            results = {
+                "full body": self.measure(
+                    Post.objects.prefetch_related("categories"), options["pages"]
+                ),
+                "deferred body": self.measure(
+                    listing_queryset(Post.objects.all()), options["pages"]
+                ),
+            }
+            transaction.set_rollback(True)
+
+        for label, (pages, total, elapsed) in results.items():
+            self.stdout.write(
+                f"{label:>14}: {total / max(pages, 1):12.0f} bytes/page "
+                f"{elapsed * 1000 / max(pages, 1):8.2f} ms/page ({pages} pages)"
+            )
+
+        full, deferred = results["full body"][1], results["deferred body"][1]
+        if deferred:
+            self.stdout.write(f"Reduction: {full / deferred:.1f}x fewer bytes fetched")
+
+    def create_posts(self, count, body_size):
+        body = ("lorem ipsum dolor sit amet " * (body_size // 27 + 1))[:body_size]
+        posts = [Post(title=f"Benchmark post {i}", body=body) for i in range(count)]
+        for post in posts:
+            post.update_derived_fields()
+        Post.objects.bulk_create(posts, batch_size=500)
+
+    def measure(self, queryset, pages):
+        """
+        Fetches the given number of pages and returns the number of pages
+        fetched, the total bytes of the fetched rows and the elapsed time.
+        """
+
+        paginator = CursorPaginator(queryset)
+        recorder = StatementRecorder()
+        after = None
+        fetched = 0
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            for _ in range(pages):
+                page = paginator.get_page(after=after)
+                fetched += 1
+                if not page.has_next:
+                    break
+                after = page.next_cursor
+        elapsed = time.perf_counter() - started
+        return fetched, fetched_bytes(recorder.statements), elapsed
@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+
+from blog.benchmarks import benchmark_paths, empty_blog, generate, measure_render, template_engines
+
+
+# The pages rendered by both template engines
+PAGES = ("index", "category", "detail", "detail_most_comments")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the time spent rendering the index, category and post "
+        "pages with the Django and the Jinja2 templates, against a "
+        "synthetic blog generated inside a transaction that is rolled "
+        "back afterwards. The page cache is off and the caches are "
+        "cleared before every request unless --warm is given, so every "
+        "page is rendered in full."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1000, help="Number of posts.")
+        parser.add_argument(
+            "--comments-per-post", type=float, default=5.0,
+            help="Average number of comments per post.",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed of the data.")
+        parser.add_argument(
+            "--page-size", type=int, default=200,
+            help="Posts per listing page and comments per post page.",
+        )
+        parser.add_argument(
+            "--iterations", type=int, default=20, help="Requests per page and engine."
+        )
+        parser.add_argument(
+            "--engines", default="django,jinja2", help="Comma separated engines to compare."
+        )
+        parser.add_argument(
+            "--warm", action="store_true",
+            help="Keep the caches between requests, fragments included.",
+        )
+
+    def handle(self, *args, **options):
+        available = template_engines()
+        engines = options["engines"].split(",")
+        for engine in engines:
+            if engine not in available:
+                raise CommandError(f"Unknown or unavailable template engine: {engine}")
+
+        with override_settings(
+            CACHES={"default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "blog-benchmark",
+            }},
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            BLOG_PAGE_CACHE=False,
+            BLOG_METRICS=False,
+            BLOG_PAGE_SIZE=options["page_size"],
+            BLOG_COMMENTS_PAGE_SIZE=options["page_size"],
+        ), transaction.atomic():
+            empty_blog()
+            categories, posts, comments = generate(
+                options["posts"], comments_per_post=options["comments_per_post"],
+                seed=options["seed"],
+            )
+            self.stdout.write(f"{posts} posts, {comments} comments, {categories} categories")
+
+            paths = benchmark_paths()
+            for engine in engines:
+                self.stdout.write(engine)
+                with override_settings(TEMPLATES=available[engine]):
+                    self.measure_engine(paths, options)
+            transaction.set_rollback(True)
+
+    def measure_engine(self, paths, options):
+        client = Client()
+        for name in PAGES:
+            if name not in paths:
+                continue
+            # The first request compiles the templates
+            client.get(paths[name])
+            page = measure_render(
+                client, paths[name], options["iterations"], not options["warm"]
+            )
+            self.stdout.write(
+                f"  {name:>22}  render p50 {page['render_p50_ms']:8.2f} ms  "
+                f"request p50 {page['p50_ms']:8.2f} ms  {page['bytes']:8d} bytes"
+            )
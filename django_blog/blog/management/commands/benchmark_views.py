@@ -0,0 +1,139 @@
+import json
+import platform
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from blog.benchmarks import benchmark_paths, compare, empty_blog, generate, measure
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the views against synthetic blogs of the given sizes. "
+        "For every scale the blog is emptied and filled with generated "
+        "data inside a transaction that is rolled back afterwards, so the "
+        "database is left as it was. Each view is requested a number of "
+        "times, and its median and 95th percentile latency, query count, "
+        "response size and peak memory are reported and optionally "
+        "written to a JSON file. With --baseline the results are compared "
+        "to an earlier run and the command fails on regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales", default="1000",
+            help="Comma separated numbers of posts, e.g. 1000,100000,1000000.",
+        )
+        parser.add_argument(
+            "--comments-per-post", type=float, default=5.0,
+            help="Average number of comments per post.",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed of the data.")
+        parser.add_argument(
+            "--iterations", type=int, default=20, help="Requests per view and scale."
+        )
+        parser.add_argument(
+            "--warm", action="store_true",
+            help="Keep the caches between requests. By default every request starts cold.",
+        )
+        parser.add_argument("--json", help="Write the results to this file.")
+        parser.add_argument("--baseline", help="Results of an earlier run to compare to.")
+        parser.add_argument(
+            "--max-slowdown", type=float, default=1.25,
+            help="Factor by which a median latency may grow before it counts as a regression.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(scale) for scale in options["scales"].split(",")]
+        except ValueError:
+            raise CommandError("--scales must be a list of numbers.")
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+
+        results = {
+            "commit": current_commit(),
+            "created": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "seed": options["seed"],
+            "comments_per_post": options["comments_per_post"],
+            "warm": options["warm"],
+            "scales": [],
+        }
+
+        # A cache of its own, clearing the site's cache would hurt it
+        with override_settings(
+            CACHES={"default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "blog-benchmark",
+            }},
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            BLOG_METRICS=False,
+        ):
+            for posts in scales:
+                results["scales"].append(self.run_scale(posts, options))
+
+        if options["json"]:
+            with open(options["json"], "w") as file:
+                json.dump(results, file, indent=2)
+
+        if baseline:
+            regressions = compare(results, baseline, options["max_slowdown"])
+            if regressions:
+                raise CommandError("Regressions:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions."))
+
+    def run_scale(self, posts, options):
+        with transaction.atomic():
+            empty_blog()
+            started = time.perf_counter()
+            categories, posts, comments = generate(
+                posts, comments_per_post=options["comments_per_post"], seed=options["seed"]
+            )
+            generated = time.perf_counter() - started
+            self.stdout.write(
+                f"{posts} posts, {comments} comments, {categories} categories "
+                f"(generated in {generated:.1f}s)"
+            )
+
+            client = Client()
+            views = {}
+            for name, path in benchmark_paths().items():
+                # The first request fills the template and connection state
+                client.get(path)
+                view = measure(client, path, options["iterations"], not options["warm"])
+                views[name] = view
+                self.stdout.write(
+                    f"  {name:>22}  p50 {view['p50_ms']:8.2f} ms  p95 {view['p95_ms']:8.2f} ms  "
+                    f"{view['queries']:3d} queries  {view['bytes']:8d} bytes  "
+                    f"{view['peak_memory_kb']:9.0f} KiB peak"
+                )
+            transaction.set_rollback(True)
+
+        return {
+            "posts": posts,
+            "categories": categories,
+            "comments": comments,
+            "generate_s": generated,
+            "views": views,
+        }
@@ -0,0 +1,38 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.static_site import build_site
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders the front page, every category page and every post page "
+        "to HTML files in a directory laid out by URL, to be served by a "
+        "web server such as nginx. Pages of the paginated lists are "
+        "written to page/<number>/ below them. Later runs only render the "
+        "posts that changed since the last build. The static pages have "
+        "no comment form; search and the feeds still need the site."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output_dir", help="Directory to write the site to.")
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Number of processes rendering pages. Defaults to the number of CPUs.",
+        )
+        parser.add_argument(
+            "--full", action="store_true",
+            help="Render every page, e.g. after the templates have changed.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rendered, removed = build_site(
+            options["output_dir"], workers=options["workers"], full=options["full"]
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {rendered} posts and removed {removed} in {elapsed:.2f}s."
+        ))
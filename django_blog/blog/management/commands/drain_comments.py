@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.models import PendingComment
+from blog.outbox import drain_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the comments waiting in the outbox to the comment table in "
+        "batches. Without --interval it exits once the outbox is empty, "
+        "with it it keeps running and checks the outbox again after the "
+        "given number of seconds, to be run as a worker next to the site "
+        "when BLOG_COMMENT_QUEUE is on."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Number of comments written per transaction.",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Keep running and check the outbox again after this many seconds.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            drained = 0
+            while count := drain_batch(options["batch_size"]):
+                drained += count
+            if drained or not options["interval"]:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"Moved {drained} comments in {elapsed:.2f}s, "
+                    f"{PendingComment.objects.count()} waiting."
+                )
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,105 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from blog.bulk import Progress, chunked
+from blog.models import ArchivedComment, Category, Comment, Post
+
+
+POST_FIELDS = ("id", "title", "body", "body_format", "created_on", "last_modified")
+COMMENT_FIELDS = ("id", "post", "author", "body", "created_on")
+
+
+def category_records():
+    for row in Category.objects.order_by("pk").values("id", "name", "slug").iterator():
+        yield {"type": "category", **row}
+
+
+def post_records(chunk_size):
+    """
+    Yields the posts with the ids of their categories. The category
+    ids of a chunk of posts are fetched with one query.
+    """
+
+    Through = Post.categories.through
+    posts = Post.objects.order_by("pk").values(*POST_FIELDS).iterator(chunk_size=chunk_size)
+    for chunk in chunked(posts, chunk_size):
+        categories = {}
+        links = Through.objects.filter(
+            post_id__in=[row["id"] for row in chunk]
+        ).order_by("pk").values_list("post_id", "category_id")
+        for post_id, category_id in links:
+            categories.setdefault(post_id, []).append(category_id)
+        for row in chunk:
+            yield {
+                "type": "post",
+                **row,
+                "created_on": row["created_on"].isoformat(),
+                "last_modified": row["last_modified"].isoformat(),
+                "categories": categories.get(row["id"], []),
+            }
+
+
+def comment_records(chunk_size):
+    comments = Comment.objects.order_by("pk").values(*COMMENT_FIELDS)
+    for row in comments.iterator(chunk_size=chunk_size):
+        yield {"type": "comment", **row, "created_on": row["created_on"].isoformat()}
+
+
+def archived_comment_records(chunk_size):
+    comments = ArchivedComment.objects.order_by("pk").values(*COMMENT_FIELDS, "archived_on")
+    for row in comments.iterator(chunk_size=chunk_size):
+        yield {
+            "type": "archived_comment",
+            **row,
+            "created_on": row["created_on"].isoformat(),
+            "archived_on": row["archived_on"].isoformat(),
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports all categories, posts, comments and archived comments as "
+        "newline delimited "
+        "JSON, one object per line, in the format read by import_blog. "
+        "Rows are streamed from the database in chunks, so memory use "
+        "doesn't grow with the size of the blog."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?", default="-",
+            help="File to write to. Defaults to standard output.",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=2000,
+            help="Number of rows fetched from the database at a time.",
+        )
+        parser.add_argument(
+            "--progress-every", type=int, default=10000,
+            help="Report progress after this many rows of a kind. 0 turns it off.",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        progress = Progress(self.stderr, options["progress_every"])
+        records = (
+            ("categories", category_records()),
+            ("posts", post_records(chunk_size)),
+            ("comments", comment_records(chunk_size)),
+            ("archived comments", archived_comment_records(chunk_size)),
+        )
+
+        if options["path"] == "-":
+            self.export(lambda text: self.stdout.write(text, ending=""), records, progress)
+        else:
+            with open(options["path"], "w", encoding="utf-8") as file:
+                self.export(file.write, records, progress)
+
+        self.stderr.write(self.style.SUCCESS(f"Exported {progress.summary()}."))
+
+    def export(self, write, records, progress):
+        for kind, rows in records:
+            for chunk in chunked(rows, 1000):
+                write("".join(json.dumps(row) + "\n" for row in chunk))
+                progress.add(kind, len(chunk))
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.benchmarks import generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Adds synthetic posts, categories and comments to the database, "
+        "for load tests and profiling. The data is drawn from a seeded "
+        "random generator, so the same arguments always give the same "
+        "data. Comments per post follow a heavy tailed distribution."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1000, help="Number of posts.")
+        parser.add_argument(
+            "--categories", type=int,
+            help="Number of categories. Defaults to one per 1000 posts, at least 5.",
+        )
+        parser.add_argument(
+            "--comments-per-post", type=float, default=5.0,
+            help="Average number of comments per post.",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+        parser.add_argument(
+            "--batch-size", type=int, default=2000, help="Rows inserted per query."
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(posts, comments):
+            elapsed = time.perf_counter() - started
+            self.stderr.write(
+                f"{posts} posts, {comments} comments ({(posts + comments) / elapsed:.0f} rows/s)"
+            )
+
+        with transaction.atomic():
+            categories, posts, comments = generate(
+                options["posts"],
+                categories=options["categories"],
+                comments_per_post=options["comments_per_post"],
+                seed=options["seed"],
+                batch_size=options["batch_size"],
+                progress=progress,
+            )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {categories} categories, {posts} posts and {comments} comments "
+            f"in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,237 @@
+import json
+import sys
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from blog.bulk import Progress, chunked, preserved_timestamps
+from blog.cache import invalidate_category_nav
+from blog.models import ArchivedComment, Category, Comment, Post
+from blog.related import rebuild_related
+from blog.rendering import PLAIN
+
+
+# Rows of a kind are written after the rows they refer to
+KINDS = ("category", "post", "comment", "archived_comment")
+
+
+def parse_time(value, default):
+    if value is None:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"invalid date and time {value!r}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.get_default_timezone())
+    return parsed
+
+
+def build_category(record):
+    # Categories without a slug get a unique one when they are written
+    return Category(id=record.get("id"), name=record["name"], slug=record.get("slug") or "")
+
+
+def build_post(record):
+    now = timezone.now()
+    post = Post(
+        id=record.get("id"),
+        title=record["title"],
+        body=record["body"],
+        body_format=record.get("body_format") or PLAIN,
+        created_on=parse_time(record.get("created_on"), now),
+        last_modified=parse_time(record.get("last_modified"), now),
+    )
+    # bulk_create doesn't call save(), so render the body here
+    post.update_derived_fields()
+    return post
+
+
+def build_comment(record):
+    return Comment(
+        id=record.get("id"),
+        post_id=record["post"],
+        author=record["author"],
+        body=record["body"],
+        created_on=parse_time(record.get("created_on"), timezone.now()),
+    )
+
+
+def build_archived_comment(record):
+    now = timezone.now()
+    return ArchivedComment(
+        id=record["id"],
+        post_id=record["post"],
+        author=record["author"],
+        body=record["body"],
+        created_on=parse_time(record.get("created_on"), now),
+        archived_on=parse_time(record.get("archived_on"), now),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports categories, posts and comments from newline delimited "
+        "JSON, as written by export_blog. Rows are inserted with "
+        "bulk_create in batches, one transaction per batch, keeping "
+        "their ids and timestamps. The comment counts of the posts that "
+        "got comments, the post counts of the categories and the related "
+        "posts are recalculated once at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?", default="-",
+            help="File to read from. Defaults to standard input.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=2000,
+            help="Number of rows inserted per transaction.",
+        )
+        parser.add_argument(
+            "--skip-existing", action="store_true",
+            help="Skip rows whose id or slug is already taken instead of failing.",
+        )
+        parser.add_argument(
+            "--progress-every", type=int, default=10000,
+            help="Report progress after this many rows of a kind. 0 turns it off.",
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        self.ignore_conflicts = options["skip_existing"]
+        self.progress = Progress(self.stderr, options["progress_every"])
+        self.pending = {kind: [] for kind in KINDS}
+        self.links = []
+        self.commented_post_ids = set()
+
+        builders = {
+            "category": build_category,
+            "post": build_post,
+            "comment": build_comment,
+            "archived_comment": build_archived_comment,
+        }
+        if options["path"] == "-":
+            lines = nullcontext(sys.stdin)
+        else:
+            try:
+                lines = open(options["path"], encoding="utf-8")
+            except OSError as error:
+                raise CommandError(error)
+
+        with lines as file, preserved_timestamps():
+            for number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    kind = record["type"]
+                    obj = builders[kind](record)
+                except (ValueError, KeyError, TypeError) as error:
+                    raise CommandError(f"Line {number}: invalid record ({error}).")
+                self.pending[kind].append(obj)
+                if kind == "post":
+                    self.links += [(obj, category) for category in record.get("categories", [])]
+                if len(self.pending[kind]) >= self.batch_size:
+                    self.flush(kind)
+            self.flush("archived_comment")
+
+        self.finish()
+        self.stderr.write(self.style.SUCCESS(f"Imported {self.progress.summary()}."))
+
+    def flush(self, kind):
+        """
+        Writes the pending rows of the kind, after the pending rows of
+        the kinds it refers to.
+        """
+
+        for earlier in KINDS[: KINDS.index(kind)]:
+            if self.pending[earlier]:
+                self.flush(earlier)
+
+        rows, self.pending[kind] = self.pending[kind], []
+        if not rows:
+            return
+        model = {
+            "category": Category,
+            "post": Post,
+            "comment": Comment,
+            "archived_comment": ArchivedComment,
+        }[kind]
+        try:
+            with transaction.atomic():
+                if kind == "category":
+                    self.fill_slugs(rows)
+                model.objects.bulk_create(rows, ignore_conflicts=self.ignore_conflicts)
+                if kind == "post":
+                    self.write_links(rows)
+                elif kind in ("comment", "archived_comment"):
+                    self.commented_post_ids.update(comment.post_id for comment in rows)
+        except DatabaseError as error:
+            raise CommandError(
+                f"Writing {model._meta.verbose_name_plural} failed: {error}. "
+                "Use --skip-existing to import into a blog that already has these rows."
+            )
+        self.progress.add(model._meta.verbose_name_plural, len(rows))
+
+    def fill_slugs(self, rows):
+        taken = {category.slug for category in rows if category.slug}
+        for category in rows:
+            if not category.slug:
+                category.slug = category.unique_slug(taken)
+                taken.add(category.slug)
+
+    def imported_pks(self, rows):
+        """
+        Returns the pks of the posts of the batch that are in the
+        database, looked up by title and creation time. bulk_create
+        doesn't set the pks when conflicts are ignored, so they are
+        set here, and rows whose id was taken weren't written.
+        """
+
+        found = {}
+        posts = Post.objects.filter(title__in={post.title for post in rows}).order_by("pk")
+        for pk, title, created_on in posts.values_list("pk", "title", "created_on"):
+            found.setdefault((title, created_on), []).append(pk)
+
+        pks = set()
+        for post in rows:
+            candidates = found.get((post.title, post.created_on), [])
+            if post.pk is None and candidates:
+                post.pk = candidates[-1]
+            if post.pk in candidates:
+                pks.add(post.pk)
+        return pks
+
+    def write_links(self, rows):
+        Through = Post.categories.through
+        links, self.links = self.links, []
+        if self.ignore_conflicts:
+            pks = self.imported_pks(rows)
+            links = [(post, category) for post, category in links if post.pk in pks]
+        Through.objects.bulk_create(
+            [Through(post_id=post.pk, category_id=category) for post, category in links],
+            batch_size=self.batch_size,
+            ignore_conflicts=self.ignore_conflicts,
+        )
+
+    def finish(self):
+        # Comments of a post can be spread over many batches, so each
+        # post is counted once here instead of once per batch.
+        for post_ids in chunked(sorted(self.commented_post_ids), self.batch_size):
+            with transaction.atomic():
+                Post.objects.filter(pk__in=post_ids).update_comment_counts()
+        Category.objects.update_post_counts()
+        invalidate_category_nav()
+        rebuild_related()
+
+        # Rows were inserted with explicit ids, so databases with
+        # sequences have to be told to continue after them.
+        statements = connection.ops.sequence_reset_sql(no_style(), [Category, Post, Comment])
+        if statements:
+            with transaction.atomic(), connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
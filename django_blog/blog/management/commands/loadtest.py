@@ -0,0 +1,188 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.models import Category, Post
+
+
+def percentile(values, fraction):
+    """
+    Returns the value below which the given fraction of the sorted
+    values falls.
+    """
+
+    if not values:
+        return 0.0
+    index = min(int(len(values) * fraction), len(values) - 1)
+    return values[index]
+
+
+async def fetch(reader, writer, host, path):
+    """
+    Sends a GET request over a keep-alive connection and reads the
+    whole response. Returns the status code and whether the server
+    closes the connection.
+    """
+
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept-Encoding: identity\r\n\r\n".encode()
+    )
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by the server.")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+
+    close = headers.get("connection", "").lower() == "close"
+    return status, close or status_line.startswith(b"HTTP/1.0")
+
+
+async def worker(url, paths, deadline, latencies, errors, offset):
+    """
+    Requests the paths in turn until the deadline and records the
+    latency of every successful response.
+    """
+
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    prefix = parts.path.rstrip("/")
+    connection = None
+    number = offset
+    while time.perf_counter() < deadline:
+        path = prefix + paths[number % len(paths)]
+        number += 1
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(host, port)
+            started = time.perf_counter()
+            status, close = await fetch(*connection, parts.netloc, path)
+            elapsed = time.perf_counter() - started
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            errors.append(path)
+            connection = None
+            continue
+
+        if status >= 400:
+            errors.append(path)
+        else:
+            latencies.append(elapsed)
+        if close:
+            connection[1].close()
+            connection = None
+
+    if connection is not None:
+        connection[1].close()
+
+
+async def run_level(url, paths, concurrency, duration):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*[
+        worker(url, paths, deadline, latencies, errors, offset)
+        for offset in range(concurrency)
+    ])
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / duration,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Load tests running servers at rising concurrency and reports "
+        "requests per second and latency percentiles for each of them. "
+        "For example, start the WSGI and the ASGI deployment with "
+        "`gunicorn personal_blog.wsgi -b :8000` and "
+        "`uvicorn personal_blog.asgi:application --port 8001` and run "
+        "`manage.py loadtest wsgi=http://127.0.0.1:8000 asgi=http://127.0.0.1:8001`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "targets", nargs="+", metavar="name=url", help="Servers to compare."
+        )
+        parser.add_argument(
+            "--path", action="append", dest="paths",
+            help="Path to request, can be repeated. Defaults to the front page, "
+            "a category page and the newest post.",
+        )
+        parser.add_argument(
+            "--concurrency", default="1,8,32,128",
+            help="Comma separated numbers of concurrent connections.",
+        )
+        parser.add_argument(
+            "--duration", type=float, default=10.0,
+            help="Seconds to run each concurrency level.",
+        )
+        parser.add_argument(
+            "--warmup", type=float, default=2.0,
+            help="Seconds to warm up each server before measuring.",
+        )
+        parser.add_argument("--json", help="Write the results to this file as JSON.")
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options["targets"]:
+            name, sep, url = target.partition("=")
+            if not sep or not url.startswith("http://"):
+                raise CommandError(f"Expected name=http://host:port, got {target!r}.")
+            targets.append((name, url))
+
+        try:
+            levels = [int(level) for level in options["concurrency"].split(",")]
+        except ValueError:
+            raise CommandError("--concurrency must be a list of numbers.")
+        paths = options["paths"] or self.default_paths()
+
+        results = []
+        for name, url in targets:
+            if options["warmup"]:
+                asyncio.run(run_level(url, paths, max(levels), options["warmup"]))
+            for level in levels:
+                result = asyncio.run(run_level(url, paths, level, options["duration"]))
+                result["target"] = name
+                results.append(result)
+                self.stdout.write(
+                    f"{name:>8} c={level:<4} {result['rps']:9.1f} req/s "
+                    f"p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+                    f"errors {result['errors']}"
+                )
+
+        if options["json"]:
+            with open(options["json"], "w") as file:
+                json.dump({"paths": paths, "results": results}, file, indent=2)
+
+    def default_paths(self):
+        paths = ["/"]
+        category = Category.objects.filter(posts__isnull=False).values("slug").first()
+        if category:
+            paths.append(f"/category/{category['slug']}/")
+        post = Post.objects.order_by("-created_on").values("pk").first()
+        if post:
+            paths.append(f"/post/{post['pk']}/")
+        return paths
@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from blog.metrics import METRICS, report
+
+
+class Command(BaseCommand):
+    help = (
+        "Shows the request metrics recorded by PerformanceMiddleware: the "
+        "p50, p95 and p99 of each metric per view over the last windows. "
+        "The site's processes copy their metrics to the cache every few "
+        "seconds, so this needs a cache shared with them, such as "
+        "memcached or Redis. With the local memory cache use the "
+        "blog_metrics view instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        rows = report()
+        if options["json"]:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+        if not rows:
+            self.stdout.write("No requests recorded.")
+            return
+
+        for view, row in rows.items():
+            self.stdout.write(f"{view} ({row['requests']} requests)")
+            for name in METRICS:
+                values = row[name]
+                self.stdout.write(
+                    f"  {name:>12}  p50 {values['p50']:10.2f}  "
+                    f"p95 {values['p95']:10.2f}  p99 {values['p99']:10.2f}"
+                )
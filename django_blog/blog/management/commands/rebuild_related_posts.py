@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.related import rebuild_related
+
+
+class Command(BaseCommand):
+    help = (
+        "Ranks the related posts of every post again from the categories "
+        "they share, in batches of posts, one transaction per batch. Only "
+        "the lists that have changed are written. Run it after migrating, "
+        "and after writing post categories in bulk, which doesn't send the "
+        "signals that keep the related posts up to date."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Number of posts ranked per statement and transaction.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total, changed = rebuild_related(options["batch_size"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Ranked the related posts of {total} posts, {changed} changed, in {elapsed:.2f}s."
+        )
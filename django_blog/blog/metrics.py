@@ -0,0 +1,293 @@
+import math
+import os
+import socket
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.backends.django import DjangoTemplates, Template
+
+
+# Metrics of the request being handled, None when it isn't sampled.
+# Context variables are copied into the threads that run sync code
+# for async views, so queries made there are counted as well.
+current = ContextVar("blog_request_metrics", default=None)
+
+METRICS = ("wall_ms", "queries", "query_ms", "template_ms", "bytes")
+
+# Every process copies its histograms to the first free one of these
+# keys, which expire when the process stops updating them
+PROCESS_KEY = "blog.metrics.process.%d"
+
+# Histogram buckets grow by this ratio, so a percentile is off by at
+# most 9%
+BUCKET_RATIO = 2 ** (1 / 8)
+LOG_RATIO = math.log(BUCKET_RATIO)
+
+
+def metrics_enabled():
+    return getattr(settings, "BLOG_METRICS", False)
+
+
+def sample_rate():
+    """
+    Fraction of the requests that are measured. Can be changed with
+    the BLOG_METRICS_SAMPLE_RATE setting.
+    """
+
+    return getattr(settings, "BLOG_METRICS_SAMPLE_RATE", 1.0)
+
+
+def measured_views():
+    return getattr(
+        settings, "BLOG_METRICS_VIEWS", ["blog_index", "blog_category", "blog_detail"]
+    )
+
+
+def window_seconds():
+    return getattr(settings, "BLOG_METRICS_WINDOW", 60)
+
+
+def window_count():
+    """
+    Number of windows kept, the histograms cover the last
+    window_count() * window_seconds() seconds.
+    """
+
+    return getattr(settings, "BLOG_METRICS_WINDOWS", 15)
+
+
+def max_processes():
+    """
+    Number of processes whose histograms can be reported together.
+    Can be changed with the BLOG_METRICS_PROCESSES setting.
+    """
+
+    return getattr(settings, "BLOG_METRICS_PROCESSES", 64)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.query_ms = 0.0
+        self.template_ms = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every database connection. Times the
+    query when the current request is measured.
+    """
+
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.query_ms += (time.perf_counter() - started) * 1000
+
+
+def install_query_wrapper(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedRenderMixin:
+    """
+    Adds the render time of a template backend's template to the
+    metrics of the current request.
+    """
+
+    def render(self, context=None, request=None):
+        metrics = current.get()
+        if metrics is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_ms += (time.perf_counter() - started) * 1000
+
+
+class TimedTemplate(TimedRenderMixin, Template):
+    pass
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Django template backend that adds the time spent rendering
+    templates to the metrics of the current request. Queries run by
+    lazy querysets while rendering count as template time as well.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+class Histogram:
+    """
+    Counts values in logarithmic buckets. Memory use and the cost of
+    adding a value don't depend on the number of values, and
+    histograms from several processes are merged by adding their
+    bucket counts.
+    """
+
+    def __init__(self, buckets=None, zeros=0):
+        self.buckets = buckets or {}
+        self.zeros = zeros
+
+    @property
+    def count(self):
+        return self.zeros + sum(self.buckets.values())
+
+    def add(self, value):
+        if value <= 0:
+            self.zeros += 1
+        else:
+            index = math.floor(math.log(value) / LOG_RATIO)
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other):
+        self.zeros += other.zeros
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def percentile(self, fraction):
+        """
+        Returns the upper bound of the bucket holding the value below
+        which the given fraction of the values falls.
+        """
+
+        rank = fraction * self.count
+        seen = self.zeros
+        if seen >= rank:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return BUCKET_RATIO ** (index + 1)
+        return 0.0
+
+
+class Recorder:
+    """
+    Keeps the histograms of this process for each view and metric in
+    time windows. The windows are copied to the cache every few
+    seconds under a key of this process, so the report can merge the
+    histograms of every process of the site.
+
+    The key is one of max_processes() numbered keys, claimed with
+    cache.add() so that no two processes share one. It is claimed
+    again when another process has taken it over after it expired.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.windows = {}
+        self.flushed = 0.0
+        self.slot = None
+
+    # Not fixed at import time, servers fork their workers afterwards
+    @property
+    def name(self):
+        return f"{socket.gethostname()}.{os.getpid()}"
+
+    def record(self, view, values, now=None, flush=True):
+        """
+        Adds the values measured for a request to the view's histograms.
+        Returns whether the histograms are due to be copied to the
+        cache, which is done here unless flush is False.
+        """
+
+        now = time.time() if now is None else now
+        window = int(now // window_seconds())
+        with self.lock:
+            views = self.windows.setdefault(window, {})
+            histograms = views.setdefault(view, {name: Histogram() for name in METRICS})
+            for name, value in values.items():
+                histograms[name].add(value)
+            # Drop the windows that have rolled out
+            oldest = window - window_count() + 1
+            for old in [old for old in self.windows if old < oldest]:
+                del self.windows[old]
+            due = now - self.flushed >= getattr(settings, "BLOG_METRICS_FLUSH_INTERVAL", 10)
+        if due and flush:
+            self.flush(now)
+        return due
+
+    def flush(self, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            self.flushed = now
+            windows = {
+                window: {
+                    view: {name: (h.buckets.copy(), h.zeros) for name, h in histograms.items()}
+                    for view, histograms in views.items()
+                }
+                for window, views in self.windows.items()
+            }
+        snapshot = {"process": self.name, "windows": windows}
+        timeout = window_seconds() * window_count()
+        with self.flush_lock:
+            if self.slot is not None:
+                stored = cache.get(PROCESS_KEY % self.slot)
+                if stored is not None and stored["process"] == snapshot["process"]:
+                    cache.set(PROCESS_KEY % self.slot, snapshot, timeout)
+                    return
+            self.slot = None
+            for slot in range(max_processes()):
+                if cache.add(PROCESS_KEY % slot, snapshot, timeout):
+                    self.slot = slot
+                    return
+
+
+recorder = Recorder()
+
+
+def collect(now=None):
+    """
+    Merges the histograms of every process over the windows still in
+    range and returns {view: {metric: Histogram}}.
+    """
+
+    now = time.time() if now is None else now
+    oldest = int(now // window_seconds()) - window_count() + 1
+    merged = {}
+    snapshots = cache.get_many([PROCESS_KEY % slot for slot in range(max_processes())])
+    for snapshot in snapshots.values():
+        for window, views in snapshot["windows"].items():
+            if window < oldest:
+                continue
+            for view, histograms in views.items():
+                target = merged.setdefault(view, {name: Histogram() for name in METRICS})
+                for name, (buckets, zeros) in histograms.items():
+                    target[name].merge(Histogram(buckets, zeros))
+    return merged
+
+
+def report(now=None):
+    """
+    Returns the number of measured requests and the p50, p95 and p99
+    of every metric per view.
+    """
+
+    rows = {}
+    for view, histograms in sorted(collect(now).items()):
+        rows[view] = {"requests": histograms["wall_ms"].count}
+        for name, histogram in histograms.items():
+            rows[view][name] = {
+                "p50": histogram.percentile(0.50),
+                "p95": histogram.percentile(0.95),
+                "p99": histogram.percentile(0.99),
+            }
+    return rows
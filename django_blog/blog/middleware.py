@@ -0,0 +1,190 @@
+import os
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.urls import Resolver404, resolve
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from blog import metrics
+from blog.routers import replica_alias, replica_reads
+
+
+class PerformanceMiddleware:
+    """
+    Measures the wall time, the number and time of the database
+    queries, the template render time and the response size of the
+    views listed in BLOG_METRICS_VIEWS, for the fraction of requests
+    given by BLOG_METRICS_SAMPLE_RATE. The values go into rolling
+    histograms that the metrics_report command and the blog_metrics
+    view show. Template times are only measured with the
+    blog.metrics.TimedDjangoTemplates template backend.
+
+    Requests that aren't sampled only cost a call to random().
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics.metrics_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(metrics.install_query_wrapper)
+        for connection in connections.all(initialized_only=True):
+            metrics.install_query_wrapper(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= metrics.sample_rate():
+            return self.get_response(request)
+
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current.set(request_metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        self.record(request, response, request_metrics, started)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= metrics.sample_rate():
+            return await self.get_response(request)
+
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current.set(request_metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        if self.record(request, response, request_metrics, started, flush=False):
+            # The cache may be a network round trip, keep it off the event loop
+            await sync_to_async(metrics.recorder.flush)()
+        return response
+
+    def record(self, request, response, request_metrics, started, flush=True):
+        match = request.resolver_match
+        if match is None or match.url_name not in metrics.measured_views():
+            return False
+        return metrics.recorder.record(match.url_name, {
+            "wall_ms": (time.perf_counter() - started) * 1000,
+            "queries": request_metrics.queries,
+            "query_ms": request_metrics.query_ms,
+            "template_ms": request_metrics.template_ms,
+            # Streaming responses have no size before they are sent
+            "bytes": 0 if response.streaming else len(response.content),
+        }, flush=flush)
+
+
+# Cookie set after a form has been sent, while it is set the visitor
+# reads from the default database
+PIN_COOKIE = "blog_primary"
+
+
+class ReadReplicaMiddleware:
+    """
+    Lets GET and HEAD requests to the views in BLOG_REPLICA_VIEWS read
+    from the replica database through ReadReplicaRouter. A visitor who
+    has just sent a form, e.g. a comment, reads from the default
+    database for BLOG_REPLICA_PIN_SECONDS, so the redirect after it
+    shows the change even when the replica lags behind.
+
+    Not used when no replica is configured.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_alias():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def use_replica(self, request):
+        if request.method not in ("GET", "HEAD") or PIN_COOKIE in request.COOKIES:
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return match.url_name in getattr(settings, "BLOG_REPLICA_VIEWS", [])
+
+    def pin(self, request, response):
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=getattr(settings, "BLOG_REPLICA_PIN_SECONDS", 10),
+                httponly=True, samesite="Lax",
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = replica_reads.set(self.use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = replica_reads.set(self.use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return self.pin(request, response)
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    Serves the files collected into STATIC_ROOT through WhiteNoise,
+    picking the Brotli or gzip copy written by collectstatic when the
+    client accepts it. Files with a hash in their name are cached by
+    browsers and proxies for ten years, the others for
+    WHITENOISE_MAX_AGE seconds.
+
+    WhiteNoise's middleware only runs synchronously, which would move
+    every request of the async views onto a thread. Here other requests
+    go on without one, only opening a static file is run in a thread.
+
+    Not used before collectstatic has been run, unless the files are
+    looked up through the staticfiles finders, as with DEBUG on.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        use_finders = getattr(settings, "WHITENOISE_USE_FINDERS", settings.DEBUG)
+        if not use_finders and not os.path.isdir(settings.STATIC_ROOT or ""):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='category',
+            options={'verbose_name_plural': 'categories'},
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created_on', 'id'], name='blog_post_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 19:03
+
+from django.db import migrations
+from django.db.models.functions import Substr
+
+
+EXCERPT_LENGTH = 400
+
+
+def backfill_excerpts(apps, schema_editor):
+    # A single UPDATE instead of loading and saving every post
+    Post = apps.get_model("blog", "Post")
+    Post.objects.update(excerpt=Substr("body", 1, EXCERPT_LENGTH))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 19:20
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def backfill_slugs(apps, schema_editor):
+    Category = apps.get_model("blog", "Category")
+    used = set()
+    for category in Category.objects.order_by("pk").only("pk", "name").iterator():
+        base = slugify(category.name)[:30] or "category"
+        slug, number = base, 1
+        while slug in used:
+            number += 1
+            slug = f"{base}-{number}"
+        used.add(slug)
+        Category.objects.filter(pk=category.pk).update(slug=slug)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_backfill_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(max_length=40, null=True),
+        ),
+        migrations.RunPython(backfill_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(max_length=40, unique=True),
+        ),
+    ]
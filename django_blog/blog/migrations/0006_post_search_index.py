@@ -0,0 +1,73 @@
+# Generated by Django 5.2 on 2026-10-18 19:48
+
+from django.db import migrations
+
+
+# The search index as it was when this migration was written. Later
+# changes to blog.search don't change what this migration does.
+CREATE_INDEX_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS blog_post_fts USING fts5(
+        title, body, content='blog_post', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    "INSERT INTO blog_post_fts(blog_post_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_post_fts_insert AFTER INSERT ON blog_post BEGIN
+        INSERT INTO blog_post_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_post_fts_delete AFTER DELETE ON blog_post BEGIN
+        INSERT INTO blog_post_fts(blog_post_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_post_fts_update AFTER UPDATE OF title, body ON blog_post BEGIN
+        INSERT INTO blog_post_fts(blog_post_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO blog_post_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    "INSERT INTO blog_post_fts(blog_post_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS blog_post_fts_insert",
+    "DROP TRIGGER IF EXISTS blog_post_fts_delete",
+    "DROP TRIGGER IF EXISTS blog_post_fts_update",
+    "DROP TABLE IF EXISTS blog_post_fts",
+]
+
+
+def fts5_available(connection):
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def install_search_index(apps, schema_editor):
+    if fts5_available(schema_editor.connection):
+        for sql in CREATE_INDEX_SQL:
+            schema_editor.execute(sql)
+
+
+def uninstall_search_index(apps, schema_editor):
+    if fts5_available(schema_editor.connection):
+        for sql in DROP_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_category_slug'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2 on 2026-10-18 19:11
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+
+
+def backfill_body_html(apps, schema_editor):
+    # Every existing post is plain text, rendered the way plain text
+    # was when this migration was written, in batches
+    Post = apps.get_model("blog", "Post")
+    batch = []
+    for post in Post.objects.only("pk", "body").iterator(chunk_size=500):
+        post.body_html = linebreaks(post.body, autoescape=True)
+        batch.append(post)
+        if len(batch) == 500:
+            Post.objects.bulk_update(batch, ["body_html"])
+            batch = []
+    Post.objects.bulk_update(batch, ["body_html"])
+
+
+# The search index triggers as they were when this migration was
+# written. Adding the columns rebuilt blog_post, which dropped them.
+CREATE_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_post_fts_insert AFTER INSERT ON blog_post BEGIN
+        INSERT INTO blog_post_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_post_fts_delete AFTER DELETE ON blog_post BEGIN
+        INSERT INTO blog_post_fts(blog_post_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_post_fts_update AFTER UPDATE OF title, body ON blog_post BEGIN
+        INSERT INTO blog_post_fts(blog_post_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO blog_post_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+
+def reinstall_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'blog_post_fts'")
+        if cursor.fetchone() is None:
+            # No search index, FTS5 isn't available
+            return
+    for sql in CREATE_TRIGGERS_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_comment_pagination_and_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='body_format',
+            field=models.CharField(choices=[('plain', 'Plain text'), ('markdown', 'Markdown')], default='plain', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='body_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(backfill_body_html, migrations.RunPython.noop),
+        migrations.RunPython(reinstall_search_triggers, migrations.RunPython.noop),
+    ]
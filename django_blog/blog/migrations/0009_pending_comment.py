@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 19:16
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_post_body_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingComment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author', models.CharField(max_length=60)),
+                ('body', models.TextField()),
+                ('received_on', models.DateTimeField(default=django.utils.timezone.now)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='blog.post')),
+            ],
+        ),
+    ]
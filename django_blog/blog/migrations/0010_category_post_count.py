@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 21:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_post_counts(apps, schema_editor):
+    # A single UPDATE with a correlated subquery per category
+    Category = apps.get_model("blog", "Category")
+    Through = apps.get_model("blog", "Post").categories.through
+    counts = (
+        Through.objects.filter(category=OuterRef("pk"))
+        .order_by()
+        .values("category")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    Category.objects.update(post_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_pending_comment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_post_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 20:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_category_last_modified'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(blank=True, help_text='Made from the name when left empty.', max_length=40, unique=True),
+        ),
+    ]
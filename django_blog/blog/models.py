@@ -1,12 +1,72 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from django.utils.text import slugify
+
+from blog.rendering import FORMAT_CHOICES, PLAIN, make_excerpt, render_body
+
+
+def get_delete_chunk_size():
+    """
+    Returns how many comments are deleted per statement when posts are
+    deleted. Can be changed with the BLOG_DELETE_CHUNK_SIZE setting.
+    """
+
+    return getattr(settings, "BLOG_DELETE_CHUNK_SIZE", 1000)
+
+
+class CategoryQuerySet(models.QuerySet):
+    def update_post_counts(self):
+        """
+        Recounts the posts of the categories in the queryset with a
+        single UPDATE. Used when all posts of a category are removed
+        or its row was saved, and after bulk writes of the post
+        categories, which don't send signals.
+        """
+
+        Through = Post.categories.through
+        counts = (
+            Through.objects.filter(category=OuterRef("pk"))
+            .order_by()
+            .values("category")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        # The counts are shown by the category navigation on every page
+        return self.update(post_count=Coalesce(Subquery(counts), 0), last_modified=timezone.now())
+
+    def change_post_counts(self, change):
+        """
+        Adds `change` to the stored post counts of the categories in
+        the queryset with a single UPDATE, without counting the posts.
+        Used by the signal handlers when posts are added or removed.
+        """
+
+        return self.update(
+            post_count=Greatest(F("post_count") + change, 0), last_modified=timezone.now()
+        )
 
 
 class Category(models.Model):
     """
-    Post's category model. Contains category's name.
+    Post's category model. Contains category's name and a unique slug
+    used in the category page's URL. Also stores the number of posts
+    in the category for the category navigation, which is maintained
+    by signal handlers, and the time the category or its count last
+    changed.
     """
 
     name = models.CharField(max_length=30)
+    slug = models.SlugField(
+        max_length=40, unique=True, blank=True,
+        help_text="Made from the name when left empty.",
+    )
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+    last_modified = models.DateTimeField(auto_now=True)
+
+    objects = CategoryQuerySet.as_manager()
 
     # class to control the plural name of the class
     class Meta:
@@ -16,23 +76,149 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    def unique_slug(self, taken=()):
+        """
+        Builds a slug from the name. A number is appended when
+        another category already uses the same slug, or when it is
+        one of the `taken` slugs, e.g. of categories not saved yet.
+        """
+
+        base = slugify(self.name)[:30] or "category"
+        slug, number = base, 1
+        others = Category.objects.exclude(pk=self.pk)
+        while slug in taken or others.filter(slug=slug).exists():
+            number += 1
+            slug = f"{base}-{number}"
+        return slug
+
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = self.unique_slug()
+        super().save(*args, **kwargs)
+
+
+class PostQuerySet(models.QuerySet):
+    def update_comment_counts(self, **fields):
+        """
+        Recounts the comments and the archived comments of the posts in
+        the queryset with a single UPDATE, which also sets the given
+        fields. Used after bulk writes, which don't send the signals
+        that normally keep comment_count up to date.
+        """
+
+        def count(model):
+            counts = (
+                model.objects.filter(post=OuterRef("pk"))
+                .order_by()
+                .values("post")
+                .annotate(count=Count("id"))
+                .values("count")
+            )
+            return Coalesce(Subquery(counts), 0)
+
+        return self.update(
+            comment_count=count(Comment),
+            archived_comment_count=count(ArchivedComment),
+            **fields,
+        )
+
+    def delete_comments(self, chunk_size=None):
+        """
+        Deletes the comments, archived comments and pending comments of
+        the posts in chunks, each chunk in a transaction of its own
+        unless this runs inside a transaction already. Left to the
+        cascade, every comment would be loaded and sent signals for,
+        all in one transaction that holds the write lock.
+        """
+
+        chunk_size = chunk_size or get_delete_chunk_size()
+        for model in (Comment, ArchivedComment, PendingComment):
+            rows = model.objects.filter(post__in=self.values("pk"))
+            while ids := list(rows.values_list("pk", flat=True)[:chunk_size]):
+                with transaction.atomic():
+                    model.objects.filter(pk__in=ids)._raw_delete(rows.db)
+
+    def delete(self):
+        self.delete_comments()
+        return super().delete()
+
 
 class Post(models.Model):
     """
     Post's model. Contains title, body, time when created and 
     last modified. Creates a relationship between a post and categories.
+    The body is written in plain text or Markdown and stored rendered
+    as sanitized HTML, together with the beginning of the text as an
+    excerpt, so pages don't have to render or load the whole body.
+    Also stores the number of comments, which is maintained by signal
+    handlers, and the number of its comments in the archive.
     """
 
+    EXCERPT_LENGTH = 400
+
     title = models.CharField(max_length=255)
     body = models.TextField()
+    body_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default=PLAIN)
+    body_html = models.TextField(blank=True, editable=False)
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False)
     created_on = models.DateTimeField(auto_now_add=True)
     last_modified = models.DateTimeField(auto_now=True)
     categories = models.ManyToManyField("Category", related_name="posts")
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    archived_comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    # Composite index used by the keyset pagination of the listings
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_on", "id"], name="blog_post_created_id_idx"),
+        ]
 
     # String representation of object
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the stored HTML was rendered from. Deferred
+        # fields are not in __dict__ and must not be loaded here.
+        instance._rendered_from = (
+            instance.__dict__.get("body"), instance.__dict__.get("body_format")
+        )
+        return instance
+
+    def body_changed(self):
+        if "body" not in self.__dict__:
+            return False
+        return (self.body, self.body_format) != getattr(self, "_rendered_from", None)
+
+    def update_derived_fields(self):
+        """
+        Renders the body to HTML and updates the excerpt.
+        """
+
+        self.body_html = render_body(self.body, self.body_format)
+        self.excerpt = make_excerpt(
+            self.body, self.body_format, self.body_html, self.EXCERPT_LENGTH
+        )
+        self._rendered_from = (self.body, self.body_format)
+
+    # Render the body only when it has changed
+    def save(self, *args, **kwargs):
+        if self.body_changed():
+            self.update_derived_fields()
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and {"body", "body_format"} & set(update_fields):
+                kwargs["update_fields"] = {*update_fields, "body_html", "excerpt"}
+        super().save(*args, **kwargs)
+
+    # Delete the comments in chunks first, see PostQuerySet.delete_comments
+    def delete(self, *args, **kwargs):
+        Post.objects.filter(pk=self.pk).delete_comments()
+        return super().delete(*args, **kwargs)
+
 
 class Comment(models.Model):
     """
@@ -47,6 +233,92 @@ class Comment(models.Model):
     created_on = models.DateTimeField(auto_now_add=True)
     post = models.ForeignKey("Post", on_delete=models.CASCADE)
 
+    # Composite index used by the paginated comment list of a post,
+    # the others by the admin's ordering, date drill down and search
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["post", "created_on", "id"], name="blog_comment_post_created_idx"
+            ),
+            models.Index(fields=["created_on", "id"], name="blog_comment_created_id_idx"),
+            models.Index(fields=["author"], name="blog_comment_author_idx"),
+        ]
+
+    # String representation of object
+    def __str__(self):
+        return f"{self.author} on '{self.post}'"
+
+
+class ArchivedComment(models.Model):
+    """
+    A comment moved out of the comment table by the archive_comments
+    command, because it was old or its post had many newer comments.
+    Keeps the id of the comment. The post page only links to the
+    archived comments, they are read when that page is requested.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    author = models.CharField(max_length=60)
+    body = models.TextField()
+    created_on = models.DateTimeField()
+    archived_on = models.DateTimeField(default=timezone.now)
+    post = models.ForeignKey("Post", on_delete=models.CASCADE)
+
+    # Composite index used by the paginated archived comments of a post
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["post", "created_on", "id"], name="blog_archived_post_created_idx"
+            ),
+        ]
+
+    # String representation of object
+    def __str__(self):
+        return f"{self.author} on post {self.post_id} (archived)"
+
+
+class PendingComment(models.Model):
+    """
+    A submitted comment waiting in the outbox. With BLOG_COMMENT_QUEUE
+    on, the post page only stores the comment here and the
+    drain_comments command moves the waiting comments to the comment
+    table in batches, in the order they were received.
+    """
+
+    author = models.CharField(max_length=60)
+    body = models.TextField()
+    received_on = models.DateTimeField(default=timezone.now)
+    post = models.ForeignKey("Post", on_delete=models.CASCADE)
+
+    # String representation of object
+    def __str__(self):
+        return f"{self.author} on post {self.post_id} (pending)"
+
+
+class RelatedPost(models.Model):
+    """
+    A post suggested on the page of another post, precomputed from the
+    categories they share. Every post keeps its best ranked related
+    posts, chosen from the newest posts of its categories, those
+    sharing the most categories first and the newest first among
+    them, numbered by position. They are maintained by
+    signal handlers when categories change and rebuilt by the
+    rebuild_related_posts command, see blog.related.
+    """
+
+    post = models.ForeignKey("Post", on_delete=models.CASCADE, related_name="related_links")
+    related = models.ForeignKey("Post", on_delete=models.CASCADE, related_name="+")
+    shared = models.PositiveIntegerField()
+    position = models.PositiveSmallIntegerField()
+
+    # The unique index is used to read the related posts in order
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["post", "position"], name="blog_related_post_position"
+            ),
+        ]
+
     # String representation of object
     def __str__(self):
-        return f"{self.author} on '{self.post}'"
\ No newline at end of file
+        return f"Post {self.related_id} related to post {self.post_id}"
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from blog.models import Comment, PendingComment, Post
+
+
+def comment_queue_enabled():
+    """
+    Returns whether new comments go to the outbox instead of straight
+    to the comment table. Turned on with the BLOG_COMMENT_QUEUE setting.
+    """
+
+    return getattr(settings, "BLOG_COMMENT_QUEUE", False)
+
+
+def save_comment(post, data):
+    """
+    Stores a validated comment, in the outbox when the queue is on.
+    """
+
+    model = PendingComment if comment_queue_enabled() else Comment
+    model.objects.create(author=data["author"], body=data["body"], post=post)
+
+
+async def asave_comment(post, data):
+    model = PendingComment if comment_queue_enabled() else Comment
+    await model.objects.acreate(author=data["author"], body=data["body"], post=post)
+
+
+def publish(pending):
+    """
+    Moves the given waiting comments to the comment table, recounts the
+    comments of their posts and removes them from the outbox, with one
+    statement each. Must run in a transaction, so a comment is never
+    lost or stored twice. The comments keep the time they were
+    received, so they are listed in the order they were sent.
+    """
+
+    comments = Comment.objects.bulk_create([
+        Comment(author=item.author, body=item.body, post_id=item.post_id) for item in pending
+    ])
+    # created_on is set on insert, so the received times are written
+    # afterwards. Turning off auto_now_add instead would affect every
+    # other thread saving comments meanwhile.
+    for comment, item in zip(comments, pending):
+        comment.created_on = item.received_on
+    Comment.objects.bulk_update(comments, ["created_on"])
+    # Bump last_modified too, the comments may be older than the
+    # Last-Modified time clients have already seen
+    Post.objects.filter(pk__in={item.post_id for item in pending}).update_comment_counts(
+        last_modified=timezone.now()
+    )
+    PendingComment.objects.filter(pk__in=[item.pk for item in pending]).delete()
+
+
+def drain_batch(batch_size):
+    """
+    Moves up to batch_size of the oldest waiting comments to the
+    comment table with publish() and returns how many were moved.
+    """
+
+    with transaction.atomic():
+        pending = PendingComment.objects.order_by("pk")
+        if connection.features.has_select_for_update_skip_locked:
+            # Let several drains run side by side on databases with row locks
+            pending = pending.select_for_update(skip_locked=True)
+        pending = list(pending[:batch_size])
+        if pending:
+            publish(pending)
+    return len(pending)
@@ -0,0 +1,232 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+def get_page_size():
+    """
+    Returns the number of posts shown per listing page. Can be changed
+    with the BLOG_PAGE_SIZE setting.
+    """
+
+    return getattr(settings, "BLOG_PAGE_SIZE", 10)
+
+
+def get_comments_page_size():
+    """
+    Returns the number of comments shown per page on a post's page.
+    Can be changed with the BLOG_COMMENTS_PAGE_SIZE setting.
+    """
+
+    return getattr(settings, "BLOG_COMMENTS_PAGE_SIZE", 50)
+
+
+def get_exact_count_limit():
+    """
+    Returns up to how many rows the admin's change lists are counted
+    exactly. Can be changed with the BLOG_ADMIN_EXACT_COUNT_LIMIT setting.
+    """
+
+    return getattr(settings, "BLOG_ADMIN_EXACT_COUNT_LIMIT", 10000)
+
+
+def estimated_count(model, using):
+    """
+    Returns an estimate of the number of rows in the model's table
+    without counting them, or None when the database can't tell. On
+    PostgreSQL this is the row count kept by ANALYZE, on SQLite the
+    range of the integer primary key, which is read from the ends of
+    the index and counts deleted rows too.
+    """
+
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == "sqlite":
+            pk = connection.ops.quote_name(model._meta.pk.column)
+            cursor.execute(f"SELECT MAX({pk}) - MIN({pk}) + 1 FROM {table}")
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for the admin's change lists of big tables. Rows are only
+    counted up to get_exact_count_limit(), with a LIMIT, so counting a
+    filtered or searched list never reads more rows than that. Beyond
+    the limit such a list is shown as having exactly the limit, which
+    is enough pages to browse before narrowing the filter. The whole
+    table is estimated with estimated_count() instead, where the
+    database supports it.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list.order_by()
+        limit = get_exact_count_limit()
+        count = queryset[: limit + 1].count()
+        if count <= limit:
+            return count
+        if queryset.query.where:
+            return limit
+        estimate = estimated_count(queryset.model, queryset.db)
+        return queryset.count() if estimate is None else max(estimate, count)
+
+
+def encode_cursor(value, pk):
+    """
+    Encodes an ordering value and a primary key into an opaque,
+    URL-safe cursor string.
+    """
+
+    raw = f"{value.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor made by encode_cursor back into a (datetime, pk)
+    tuple. Raises Http404 when the cursor has been tampered with.
+    """
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        value, pk = raw.split("|")
+        return datetime.fromisoformat(value), int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise Http404("Invalid page cursor.")
+
+
+class CursorPage:
+    """
+    A single page of results returned by CursorPaginator. Iterating
+    over the page yields the objects on it.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator:
+    """
+    Keyset paginator over (field, id). Instead of OFFSET, every page is
+    fetched with a WHERE clause that continues from the last row seen,
+    so the database can seek straight to it through the composite index
+    and page N costs the same as page 1.
+    """
+
+    def __init__(self, queryset, page_size=None, field="created_on", descending=True):
+        self.queryset = queryset
+        self.page_size = page_size or get_page_size()
+        self.field = field
+        self.descending = descending
+
+    def _seek(self, queryset, cursor, forward):
+        value, pk = decode_cursor(cursor)
+        # Moving forward through a descending listing means going to
+        # smaller values, and the other way around.
+        op = "lt" if forward == self.descending else "gt"
+        return queryset.filter(
+            Q(**{f"{self.field}__{op}": value})
+            | Q(**{self.field: value, f"id__{op}": pk})
+        )
+
+    def _ordering(self, forward):
+        prefix = "-" if forward == self.descending else ""
+        return (f"{prefix}{self.field}", f"{prefix}id")
+
+    def page_queryset(self, after=None, before=None):
+        """
+        Returns the sliced queryset for the requested page. One extra
+        row is fetched to find out whether there is another page.
+        """
+
+        forward = before is None
+        queryset = self.queryset
+        if after is not None:
+            queryset = self._seek(queryset, after, forward=True)
+        elif before is not None:
+            queryset = self._seek(queryset, before, forward=False)
+
+        return queryset.order_by(*self._ordering(forward))[: self.page_size + 1]
+
+    def build_page(self, rows, after=None, before=None):
+        """
+        Turns the rows fetched with page_queryset into a CursorPage.
+        """
+
+        rows = list(rows)
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+
+        if before is not None:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, after is not None
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.cursor_for(rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.cursor_for(rows[0])
+
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+    def cursor_for(self, obj):
+        # Rows fetched with values() are dictionaries
+        if isinstance(obj, dict):
+            return encode_cursor(obj[self.field], obj["id"])
+        return encode_cursor(getattr(obj, self.field), obj.pk)
+
+    def get_page(self, after=None, before=None):
+        """
+        Fetches and returns the page that follows the `after` cursor or
+        precedes the `before` cursor. Without a cursor the first page
+        is returned.
+        """
+
+        rows = self.page_queryset(after, before)
+        return self.build_page(rows, after, before)
+
+
+def paginate(request, queryset):
+    """
+    Returns the page of the queryset requested with the `after` or
+    `before` query string parameters.
+    """
+
+    paginator = CursorPaginator(queryset)
+    return paginator.get_page(
+        after=request.GET.get("after"), before=request.GET.get("before")
+    )
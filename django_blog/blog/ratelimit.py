@@ -0,0 +1,123 @@
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+# A rate is a (comments, seconds) tuple: a bucket holds up to
+# `comments` tokens and refills at comments/seconds tokens per second.
+DEFAULT_IP_RATE = (5, 60)
+DEFAULT_POST_RATE = (30, 60)
+DEFAULT_DUPLICATE_WINDOW = 60 * 10
+
+
+def comment_rates():
+    """
+    Returns the (key prefix, rate) pairs of the buckets a comment has
+    to take a token from. The rates are set with the
+    BLOG_COMMENT_RATE_PER_IP and BLOG_COMMENT_RATE_PER_POST settings,
+    None turns a limit off.
+    """
+
+    return [
+        ("ip", getattr(settings, "BLOG_COMMENT_RATE_PER_IP", DEFAULT_IP_RATE)),
+        ("post", getattr(settings, "BLOG_COMMENT_RATE_PER_POST", DEFAULT_POST_RATE)),
+    ]
+
+
+def duplicate_window():
+    return getattr(settings, "BLOG_COMMENT_DUPLICATE_WINDOW", DEFAULT_DUPLICATE_WINDOW)
+
+
+def client_ip(request):
+    """
+    Returns the client's IP address. Behind a reverse proxy set
+    BLOG_CLIENT_IP_HEADER to the META key of the header the proxy adds,
+    e.g. "HTTP_X_FORWARDED_FOR". The last address in it is used, the
+    one added by the proxy itself.
+    """
+
+    header = getattr(settings, "BLOG_CLIENT_IP_HEADER", None)
+    if header and request.META.get(header):
+        return request.META[header].split(",")[-1].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def bucket_keys(request, pk):
+    values = {"ip": client_ip(request), "post": pk}
+    return {
+        f"blog.comment-rate.{name}.{values[name]}": rate
+        for name, rate in comment_rates() if rate
+    }
+
+
+def duplicate_key(pk, data):
+    digest = hashlib.sha256(
+        "\x00".join([str(pk), data["author"].strip(), data["body"].strip()]).encode()
+    ).hexdigest()
+    return f"blog.comment-duplicate.{digest}"
+
+
+def take_tokens(buckets, rates, now):
+    """
+    Takes one token from every bucket. `buckets` maps the cache keys to
+    their stored (tokens, time) state or is missing them for full
+    buckets. Returns the new states and 0, or None and the seconds
+    until every bucket has a token again. No token is taken unless all
+    the buckets have one.
+    """
+
+    states, wait = {}, 0
+    for key, (capacity, period) in rates.items():
+        tokens, updated = buckets.get(key, (capacity, now))
+        refill = capacity / period
+        tokens = min(capacity, tokens + (now - updated) * refill)
+        if tokens < 1:
+            wait = max(wait, (1 - tokens) / refill)
+        states[key] = (tokens - 1, now)
+    if wait:
+        return None, math.ceil(wait)
+    return states, 0
+
+
+def check_comment(request, pk, data):
+    """
+    Returns None when the comment may be saved, or an error message and
+    the number of seconds to wait before trying again. Only the cache
+    is used, so floods are turned away before touching the database.
+
+    The buckets are read and written without a lock, so concurrent
+    requests can get a few more comments through than the rate allows.
+    """
+
+    rates = bucket_keys(request, pk)
+    states, wait = take_tokens(cache.get_many(rates), rates, time.time())
+    if states is None:
+        return "You are posting comments too quickly.", wait
+    for key, state in states.items():
+        cache.set(key, state, rates[key][1])
+
+    window = duplicate_window()
+    if window and not cache.add(duplicate_key(pk, data), True, window):
+        return "This comment has already been posted.", window
+    return None
+
+
+async def acheck_comment(request, pk, data):
+    """
+    Async version of check_comment.
+    """
+
+    rates = bucket_keys(request, pk)
+    states, wait = take_tokens(await cache.aget_many(rates), rates, time.time())
+    if states is None:
+        return "You are posting comments too quickly.", wait
+    for key, state in states.items():
+        await cache.aset(key, state, rates[key][1])
+
+    window = duplicate_window()
+    if window and not await cache.aadd(duplicate_key(pk, data), True, window):
+        return "This comment has already been posted.", window
+    return None
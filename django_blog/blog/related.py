@@ -0,0 +1,264 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from blog.bulk import chunked
+from blog.models import Post, RelatedPost
+
+
+# Ranks the related posts of each of the given posts. The candidates
+# are the posts next to the post in each of its categories, the given
+# number of posts before and after it by creation time. This keeps the
+# work per post bounded however large the categories grow, and a
+# change to a post only affects the lists of the posts next to it.
+# They are ranked by the number of categories they share with the
+# post, counted through the unique index of the post categories table,
+# then newest first. One statement for a whole chunk of posts.
+RANKING_SQL = """
+    WITH mine AS (
+        SELECT post_id, category_id FROM {through} WHERE post_id IN ({placeholders})
+    ),
+    ordered AS (
+        SELECT member.category_id, member.post_id,
+               ROW_NUMBER() OVER (
+                   PARTITION BY member.category_id ORDER BY post.created_on, post.id
+               ) AS place
+        FROM {through} member
+        JOIN {post} post ON post.id = member.post_id
+        WHERE member.category_id IN (SELECT category_id FROM mine)
+    ),
+    candidates AS (
+        SELECT DISTINCT mine.post_id, theirs.post_id AS related_id
+        FROM mine
+        JOIN ordered me ON me.category_id = mine.category_id AND me.post_id = mine.post_id
+        JOIN ordered theirs
+            ON theirs.category_id = me.category_id
+            AND theirs.place BETWEEN me.place - %s AND me.place + %s
+            AND theirs.post_id <> me.post_id
+    )
+    SELECT post_id, related_id, shared, place FROM (
+        SELECT candidates.post_id, candidates.related_id, COUNT(*) AS shared,
+               ROW_NUMBER() OVER (
+                   PARTITION BY candidates.post_id
+                   ORDER BY COUNT(*) DESC, related.created_on DESC, related.id DESC
+               ) AS place
+        FROM candidates
+        JOIN mine ON mine.post_id = candidates.post_id
+        JOIN {through} theirs
+            ON theirs.post_id = candidates.related_id AND theirs.category_id = mine.category_id
+        JOIN {post} related ON related.id = candidates.related_id
+        GROUP BY candidates.post_id, candidates.related_id, related.created_on, related.id
+    ) ranked
+    WHERE place <= %s
+    ORDER BY post_id, place
+"""
+
+# Finds the posts next to the given (post, category) pairs, the ones
+# whose candidates include the post in that category. The pairs count
+# as members of their category, so this also finds the posts a post
+# has just left the candidates of.
+NEARBY_SQL = """
+    WITH changed (post_id, category_id) AS (
+        VALUES {values}
+    ),
+    members AS (
+        SELECT post_id, category_id FROM {through}
+        WHERE category_id IN (SELECT category_id FROM changed)
+        UNION
+        SELECT post_id, category_id FROM changed
+    ),
+    ordered AS (
+        SELECT members.category_id, members.post_id,
+               ROW_NUMBER() OVER (
+                   PARTITION BY members.category_id ORDER BY post.created_on, post.id
+               ) AS place
+        FROM members
+        JOIN {post} post ON post.id = members.post_id
+    )
+    SELECT DISTINCT theirs.post_id
+    FROM changed
+    JOIN ordered me ON me.category_id = changed.category_id AND me.post_id = changed.post_id
+    JOIN ordered theirs
+        ON theirs.category_id = me.category_id
+        AND theirs.place BETWEEN me.place - %s AND me.place + %s
+"""
+
+
+def related_limit():
+    """
+    Returns how many related posts are kept and shown for every post.
+    Can be changed with the BLOG_RELATED_POSTS setting.
+    """
+
+    return getattr(settings, "BLOG_RELATED_POSTS", 5)
+
+
+def candidates_per_category():
+    """
+    Returns how many posts before and after a post in each of its
+    categories are considered as its related posts. Can be changed
+    with the BLOG_RELATED_CANDIDATES setting.
+    """
+
+    return getattr(settings, "BLOG_RELATED_CANDIDATES", 50)
+
+
+def rank_related(post_ids):
+    """
+    Returns the ranked related posts of the given posts as a dictionary
+    of lists of (related_id, shared) tuples, best first.
+    """
+
+    quote = connection.ops.quote_name
+    sql = RANKING_SQL.format(
+        through=quote(Post.categories.through._meta.db_table),
+        post=quote(Post._meta.db_table),
+        placeholders=", ".join(["%s"] * len(post_ids)),
+    )
+    ranked = {pk: [] for pk in post_ids}
+    with connection.cursor() as cursor:
+        limit = candidates_per_category()
+        cursor.execute(sql, [*post_ids, limit, limit, related_limit()])
+        for post_id, related_id, shared, place in cursor.fetchall():
+            ranked[post_id].append((related_id, shared))
+    return ranked
+
+
+def write_related(ranked):
+    """
+    Writes the related posts given as a dictionary of best first lists
+    of (related_id, shared) tuples by post, for the posts whose stored
+    lists differ. Posts whose page shows different related posts now
+    get their last_modified bumped, which invalidates their cached
+    pages. Returns the number of posts whose related posts changed.
+    """
+
+    stored = {pk: [] for pk in ranked}
+    rows = (
+        RelatedPost.objects.filter(post__in=list(ranked))
+        .order_by("post", "position")
+        .values_list("post", "related", "shared")
+    )
+    for post_id, related_id, shared in rows:
+        stored[post_id].append((related_id, shared))
+
+    outdated = [pk for pk in ranked if ranked[pk] != stored[pk]]
+    if not outdated:
+        return 0
+    RelatedPost.objects.filter(post__in=outdated).delete()
+    RelatedPost.objects.bulk_create([
+        RelatedPost(post_id=pk, related_id=related_id, shared=shared, position=position)
+        for pk in outdated
+        for position, (related_id, shared) in enumerate(ranked[pk], start=1)
+    ])
+    # Only the order of the related posts is shown, not the counts
+    shown = [
+        pk for pk in outdated
+        if [row[0] for row in ranked[pk]] != [row[0] for row in stored[pk]]
+    ]
+    Post.objects.filter(pk__in=shown).update(last_modified=timezone.now())
+    return len(outdated)
+
+
+def refresh_related(post_ids, batch_size=500):
+    """
+    Ranks the related posts of the given posts again from all their
+    candidates, a batch at a time, one transaction per batch. Returns
+    the number of posts whose related posts changed.
+    """
+
+    changed = 0
+    for chunk in chunked(sorted(set(post_ids)), batch_size):
+        with transaction.atomic():
+            changed += write_related(rank_related(chunk))
+    return changed
+
+
+def listing_posts(post_ids):
+    return RelatedPost.objects.filter(related__in=post_ids).values_list("post", flat=True)
+
+
+def nearby_posts(pairs):
+    """
+    Returns the ids of the posts next to the given (post_id,
+    category_id) pairs in their categories, the posts themselves
+    included.
+    """
+
+    quote = connection.ops.quote_name
+    limit = candidates_per_category()
+    found = set()
+    for chunk in chunked(sorted(set(pairs)), 500):
+        sql = NEARBY_SQL.format(
+            through=quote(Post.categories.through._meta.db_table),
+            post=quote(Post._meta.db_table),
+            values=", ".join(["(CAST(%s AS INTEGER), CAST(%s AS INTEGER))"] * len(chunk)),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*(value for pair in chunk for value in pair), limit, limit])
+            found.update(row[0] for row in cursor.fetchall())
+    return found
+
+
+def affected_posts(post_ids, category_ids=()):
+    """
+    Returns the posts whose related posts may change when the given
+    posts join or leave the given categories, or are deleted: the
+    posts themselves, the posts listing them and the posts next to
+    them in their categories. Grows with the number of candidates, not
+    with the size of the categories. Must run while the posts exist.
+    """
+
+    post_ids = list(post_ids)
+    if not post_ids:
+        return set()
+    pairs = {(pk, category_id) for pk in post_ids for category_id in category_ids}
+    pairs.update(
+        Post.categories.through.objects.filter(post__in=post_ids).values_list(
+            "post", "category"
+        )
+    )
+    return {*post_ids, *listing_posts(post_ids), *nearby_posts(pairs)}
+
+
+def update_related(post_ids, category_ids=()):
+    """
+    Updates the related posts after the given posts have been added to
+    or removed from the given categories, by ranking the lists of the
+    affected posts again. Returns the number of posts whose related
+    posts changed.
+    """
+
+    return refresh_related(affected_posts(post_ids, category_ids))
+
+
+def rebuild_related(batch_size=500):
+    """
+    Ranks the related posts of every post again, in batches of posts
+    by primary key, one transaction per batch. Used after bulk writes
+    of the post categories, which don't send signals. Returns the
+    number of posts and the number of posts whose related posts
+    changed.
+    """
+
+    total = changed = last = 0
+    posts = Post.objects.order_by("pk").values_list("pk", flat=True)
+    while chunk := list(posts.filter(pk__gt=last)[:batch_size]):
+        changed += refresh_related(chunk, batch_size)
+        total += len(chunk)
+        last = chunk[-1]
+    return total, changed
+
+
+def related_posts(pk):
+    """
+    Returns the related posts shown on the page of a post, with the
+    fields their links need. A single lookup through the unique index
+    on the post and the position.
+    """
+
+    return (
+        RelatedPost.objects.filter(post=pk)
+        .order_by("position")
+        .values("related_id", "related__title", "related__created_on")
+    )
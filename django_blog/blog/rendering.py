@@ -0,0 +1,40 @@
+from html import unescape
+
+import markdown
+import nh3
+from django.utils.html import linebreaks, strip_tags
+
+
+PLAIN = "plain"
+MARKDOWN = "markdown"
+
+FORMAT_CHOICES = [
+    (PLAIN, "Plain text"),
+    (MARKDOWN, "Markdown"),
+]
+
+MARKDOWN_EXTENSIONS = ["fenced_code", "tables", "sane_lists"]
+
+
+def render_body(body, body_format):
+    """
+    Renders a post body to HTML. Plain text gets paragraphs and line
+    breaks like the linebreaks filter. Markdown is converted and then
+    sanitized, so raw HTML in the source can't inject scripts.
+    """
+
+    if body_format == MARKDOWN:
+        return nh3.clean(markdown.markdown(body, extensions=MARKDOWN_EXTENSIONS))
+    return linebreaks(body, autoescape=True)
+
+
+def make_excerpt(body, body_format, body_html, length):
+    """
+    Returns the beginning of the post's text. For Markdown the text is
+    taken from the rendered HTML, so the listings don't show the
+    Markdown syntax.
+    """
+
+    if body_format == MARKDOWN:
+        return unescape(strip_tags(body_html)).strip()[:length]
+    return body[:length]
@@ -0,0 +1,40 @@
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+def replica_alias():
+    """
+    Returns the alias of the read replica database, set with the
+    BLOG_READ_REPLICA setting, or None.
+    """
+
+    return getattr(settings, "BLOG_READ_REPLICA", None)
+
+
+# Whether the current request may read from the replica. Set by
+# blog.middleware.ReadReplicaMiddleware.
+replica_reads = ContextVar("blog_replica_reads", default=False)
+
+
+class ReadReplicaRouter:
+    """
+    Sends the reads of the read-only blog views to the read replica
+    database when one is configured. Everything else, including all
+    writes and migrations, uses the default database.
+    """
+
+    def db_for_read(self, model, **hints):
+        if replica_reads.get():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != replica_alias()
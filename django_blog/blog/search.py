@@ -0,0 +1,199 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from blog.models import Post
+
+
+# Markers put around the matched terms by the FTS5 highlight and
+# snippet functions. They are replaced with <mark> tags after the
+# text has been escaped.
+MATCH_START = "\x02"
+MATCH_END = "\x03"
+
+CREATE_INDEX_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS blog_post_fts USING fts5(
+        title, body, content='blog_post', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    # Matches in the title weigh ten times as much as in the body
+    "INSERT INTO blog_post_fts(blog_post_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+]
+
+# The triggers keep the index in sync with every write to blog_post,
+# including bulk inserts and updates that bypass model signals.
+CREATE_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_post_fts_insert AFTER INSERT ON blog_post BEGIN
+        INSERT INTO blog_post_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_post_fts_delete AFTER DELETE ON blog_post BEGIN
+        INSERT INTO blog_post_fts(blog_post_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_post_fts_update AFTER UPDATE OF title, body ON blog_post BEGIN
+        INSERT INTO blog_post_fts(blog_post_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO blog_post_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+SEARCH_SQL = """
+    SELECT blog_post.id, blog_post.title, blog_post.created_on,
+        highlight(blog_post_fts, 0, %s, %s) AS title_match,
+        snippet(blog_post_fts, 1, %s, %s, '…', 32) AS body_match
+    FROM blog_post_fts
+    JOIN blog_post ON blog_post.id = blog_post_fts.rowid
+    WHERE blog_post_fts MATCH %s
+    ORDER BY rank
+    LIMIT %s OFFSET %s
+"""
+
+
+def fts_available(conn=None):
+    """
+    Returns whether the database is SQLite with the FTS5 extension
+    compiled in. Checked once per connection.
+    """
+
+    conn = conn or connection
+    if conn.vendor != "sqlite":
+        return False
+    if getattr(conn, "blog_fts5", None) is None:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            conn.blog_fts5 = bool(cursor.fetchone()[0])
+    return conn.blog_fts5
+
+
+def install_search_index(sender=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Runs after every migrate. Creates the FTS5 index and its triggers
+    when any of them is missing, and indexes the posts then. SQLite
+    drops the triggers whenever a migration rebuilds the blog_post
+    table, so migrations that alter Post don't have to reinstall them.
+    Nothing is done before the migration that adds the index.
+    """
+
+    conn = connections[using]
+    if not fts_available(conn):
+        return
+    if ("blog", "0006_post_search_index") not in MigrationRecorder(conn).applied_migrations():
+        return
+    names = [
+        "blog_post_fts", "blog_post_fts_insert", "blog_post_fts_delete", "blog_post_fts_update"
+    ]
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name IN (%s, %s, %s, %s)", names
+        )
+        if cursor.fetchone()[0] == len(names):
+            return
+        for sql in CREATE_INDEX_SQL + CREATE_TRIGGERS_SQL:
+            cursor.execute(sql)
+    rebuild_search_index(conn)
+
+
+def rebuild_search_index(conn=None):
+    """
+    Reindexes every post from the blog_post table.
+    """
+
+    with (conn or connection).cursor() as cursor:
+        cursor.execute("INSERT INTO blog_post_fts(blog_post_fts) VALUES ('rebuild')")
+        cursor.execute("INSERT INTO blog_post_fts(blog_post_fts) VALUES ('optimize')")
+
+
+def search_terms(query):
+    """
+    Splits the user's query into words. Only letters, digits and
+    underscores are kept, and the callers quote every word, so FTS5
+    query syntax in the input can't cause errors.
+    """
+
+    return re.findall(r"\w+", query)
+
+
+def highlight(text):
+    """
+    Escapes text returned by FTS5 and turns the match markers into
+    <mark> tags.
+    """
+
+    text = escape(text or "")
+    return mark_safe(text.replace(MATCH_START, "<mark>").replace(MATCH_END, "</mark>"))
+
+
+def filter_posts(queryset, query):
+    """
+    Narrows a queryset of posts down to the posts that contain every
+    word of the query, looked up in the search index. Used by the
+    admin, which orders the results itself.
+    """
+
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+    if fts_available():
+        match = " ".join(f'"{term}"' for term in terms)
+        return queryset.filter(pk__in=RawSQL(
+            "SELECT rowid FROM blog_post_fts WHERE blog_post_fts MATCH %s", [match]
+        ))
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(body__icontains=term)
+    return queryset.filter(condition)
+
+
+def search_posts(query, page=1, page_size=10):
+    """
+    Returns the posts that contain every word of the query, best
+    matches first, as a (posts, has_next) tuple. Each post has a
+    highlighted title_match and body_match.
+
+    Results are ordered by relevance, so pages are numbered and
+    fetched with OFFSET. FTS5 ranks the matching rows from the
+    index alone, only the rows of the page are read from blog_post.
+    """
+
+    terms = search_terms(query)
+    if not terms:
+        return [], False
+
+    offset = (page - 1) * page_size
+    if fts_available():
+        match = " ".join(f'"{term}"' for term in terms)
+        posts = list(Post.objects.raw(SEARCH_SQL, [
+            MATCH_START, MATCH_END, MATCH_START, MATCH_END,
+            match, page_size + 1, offset,
+        ]))
+    else:
+        # Without FTS5 fall back to scanning titles and bodies, and show
+        # the excerpts
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term) | Q(body__icontains=term)
+        posts = list(
+            Post.objects.filter(condition).defer("body")
+            .order_by("-created_on", "-id")[offset : offset + page_size + 1]
+        )
+        for post in posts:
+            post.title_match, post.body_match = post.title, post.excerpt
+
+    for post in posts:
+        post.title_match = highlight(post.title_match)
+        post.body_match = highlight(post.body_match)
+
+    return posts[:page_size], len(posts) > page_size
@@ -0,0 +1,160 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from blog.cache import invalidate_category_nav, invalidate_post
+from blog.models import ArchivedComment, Category, Comment, Post
+from blog.related import affected_posts, refresh_related, update_related
+
+
+def touch_posts(post_ids):
+    """
+    Bumps last_modified of the given posts. The rendered fragments of a
+    post are keyed by last_modified, so this invalidates them. update()
+    is used so that no further signals are sent.
+    """
+
+    Post.objects.filter(pk__in=post_ids).update(last_modified=timezone.now())
+
+
+def change_post_counts(category_ids, change):
+    """
+    Adds `change` to the post counts of the given categories and drops
+    the cached category navigation.
+    """
+
+    if category_ids and change:
+        Category.objects.filter(pk__in=category_ids).change_post_counts(change)
+        invalidate_category_nav()
+
+
+def recount_categories(category_ids):
+    """
+    Recounts the posts of the given categories and drops the cached
+    category navigation.
+    """
+
+    if category_ids:
+        Category.objects.filter(pk__in=category_ids).update_post_counts()
+        invalidate_category_nav()
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    # The categories of the post and the posts whose related posts
+    # depend on it can't be found after the delete
+    instance._deleted_category_ids = list(instance.categories.values_list("pk", flat=True))
+    instance._related_post_ids = affected_posts([instance.pk]) - {instance.pk}
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    invalidate_post(instance)
+    change_post_counts(getattr(instance, "_deleted_category_ids", None), -1)
+    refresh_related(getattr(instance, "_related_post_ids", []))
+
+
+@receiver(m2m_changed, sender=Post.categories.through)
+def post_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Adding or removing categories changes the category bar of the
+    affected posts, the post counts of the categories and the related
+    posts. With reverse=True the instance is a category.
+    """
+
+    if not reverse and action == "pre_remove":
+        # remove() reports every pk it was given, linked or not
+        instance._removed_category_ids = list(
+            instance.categories.filter(pk__in=pk_set).values_list("pk", flat=True)
+        )
+    elif not reverse and action in ("post_add", "post_remove"):
+        touch_posts([instance.pk])
+        # add() only reports the categories it actually linked
+        if action == "post_add":
+            change_post_counts(pk_set, 1)
+        else:
+            change_post_counts(getattr(instance, "_removed_category_ids", None), -1)
+        update_related([instance.pk], pk_set)
+    elif not reverse and action == "pre_clear":
+        instance._cleared_category_ids = list(instance.categories.values_list("pk", flat=True))
+    elif not reverse and action == "post_clear":
+        touch_posts([instance.pk])
+        recount_categories(getattr(instance, "_cleared_category_ids", None))
+        update_related([instance.pk], getattr(instance, "_cleared_category_ids", []))
+    elif reverse and action == "pre_remove":
+        instance._removed_post_count = instance.posts.filter(pk__in=pk_set).count()
+    elif reverse and action in ("post_add", "post_remove"):
+        touch_posts(pk_set)
+        if action == "post_add":
+            change_post_counts([instance.pk], len(pk_set))
+        else:
+            change_post_counts([instance.pk], -getattr(instance, "_removed_post_count", 0))
+        update_related(pk_set, [instance.pk])
+    elif reverse and action == "pre_clear":
+        # The affected posts can't be found anymore after the clear
+        instance._cleared_post_ids = list(instance.posts.values_list("pk", flat=True))
+        touch_posts(instance._cleared_post_ids)
+    elif reverse and action == "post_clear":
+        recount_categories([instance.pk])
+        update_related(getattr(instance, "_cleared_post_ids", []), [instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    """
+    Renaming a category changes the pages of its posts. save() writes
+    the post count held by the instance, which may be outdated, so it
+    is counted again.
+    """
+
+    if not created:
+        touch_posts(list(instance.posts.values_list("pk", flat=True)))
+        recount_categories([instance.pk])
+
+
+@receiver(pre_delete, sender=Category)
+def category_deleting(sender, instance, **kwargs):
+    # Run before the delete, the relations are gone afterwards
+    instance._deleted_post_ids = list(instance.posts.values_list("pk", flat=True))
+    touch_posts(instance._deleted_post_ids)
+    invalidate_category_nav()
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    # The navigation changes, but the deleted row can't carry the time
+    Category.objects.update(last_modified=timezone.now())
+    update_related(getattr(instance, "_deleted_post_ids", []), [instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """
+    Counts a new comment with a single atomic UPDATE. The new count
+    changes the cache keys of the post, editing a comment bumps its
+    last_modified instead.
+    """
+
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F("comment_count") + 1
+        )
+    else:
+        touch_posts([instance.post_id])
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(
+        comment_count=Greatest(F("comment_count") - 1, 0), last_modified=timezone.now()
+    )
+
+
+@receiver(post_delete, sender=ArchivedComment)
+def archived_comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(
+        archived_comment_count=Greatest(F("archived_comment_count") - 1, 0),
+        last_modified=timezone.now(),
+    )
@@ -0,0 +1,221 @@
+import json
+import math
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpRequest, QueryDict
+
+from blog import views
+from blog.bulk import chunked
+from blog.cache import build_category_nav, category_nav_queryset
+from blog.models import Category, Comment, Post
+from blog.pagination import encode_cursor, get_comments_page_size, get_page_size
+
+
+MANIFEST_NAME = ".build-manifest.json"
+
+
+class StaticPage:
+    """
+    Set as request.static_site on the requests rendered for the static
+    site. Links to other pages of a list point to the page files, and
+    detail.html leaves out the comment form.
+    """
+
+    def __init__(self, number):
+        self.number = number
+
+    # Part of the fragment cache keys of the pages
+    def __str__(self):
+        return "static"
+
+    def page_link(self, path, name):
+        number = self.number - 1 if name == "before" else self.number + 1
+        return page_path(path, number)
+
+
+def page_path(path, number):
+    return path if number == 1 else f"{path}page/{number}/"
+
+
+def make_request(path, number, cursor_name, cursor):
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = path
+    request.META = {"SERVER_NAME": "localhost", "SERVER_PORT": "80"}
+    request.GET = QueryDict(mutable=True)
+    if cursor:
+        request.GET[cursor_name] = cursor
+    request.user = AnonymousUser()
+    request.static_site = StaticPage(number)
+    return request
+
+
+def page_cursors(rows, page_size):
+    """
+    Returns the `after` cursor of every page of a list, None for the
+    first page, from its (value, id) rows in list order.
+    """
+
+    cursors, count = [None], 0
+    for count, (value, pk) in enumerate(rows, 1):
+        if count % page_size == 0:
+            cursors.append(encode_cursor(value, pk))
+    return cursors[: max(1, math.ceil(count / page_size))]
+
+
+def write_page(output_dir, path, content):
+    """
+    Writes the page for the URL path and returns the file's path
+    relative to output_dir. Unchanged files are left alone, changed
+    ones are replaced atomically so a half written file is never
+    served.
+    """
+
+    name = os.path.join(path.strip("/"), "index.html")
+    filename = os.path.join(output_dir, name)
+    try:
+        with open(filename, "rb") as file:
+            if file.read() == content:
+                return name
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename + ".tmp", "wb") as file:
+        file.write(content)
+    os.replace(filename + ".tmp", filename)
+    return name
+
+
+def render_list(output_dir, path, view, cursor_name, cursors, **kwargs):
+    """
+    Renders every page of a paginated view. The views are called
+    without their conditional_page decorator, so the static pages
+    don't end up in the page cache.
+    """
+
+    written = []
+    for number, cursor in enumerate(cursors, 1):
+        request = make_request(path, number, cursor_name, cursor)
+        response = view.__wrapped__(request, **kwargs)
+        written.append(write_page(output_dir, page_path(path, number), response.content))
+    return written
+
+
+def build_task(output_dir, task):
+    """
+    Renders the pages of a task and returns the files written. Runs in
+    the worker processes.
+    """
+
+    kind, arg = task
+    if kind == "index":
+        rows = Post.objects.order_by("-created_on", "-id").values_list("created_on", "id")
+        cursors = page_cursors(rows.iterator(), get_page_size())
+        return render_list(output_dir, "/", views.blog_index, "after", cursors)
+
+    if kind == "category":
+        rows = (
+            Post.objects.filter(categories__slug=arg)
+            .order_by("-created_on", "-id").values_list("created_on", "id")
+        )
+        cursors = page_cursors(rows.iterator(), get_page_size())
+        return render_list(
+            output_dir, f"/category/{arg}/", views.blog_category, "after", cursors, slug=arg
+        )
+
+    written = []
+    for pk in arg:
+        # Remove the old comment pages, the post may have fewer now
+        shutil.rmtree(os.path.join(output_dir, "post", str(pk), "page"), ignore_errors=True)
+        rows = (
+            Comment.objects.filter(post=pk)
+            .order_by("created_on", "id").values_list("created_on", "id")
+        )
+        cursors = page_cursors(rows.iterator(), get_comments_page_size())
+        written += render_list(
+            output_dir, f"/post/{pk}/", views.blog_detail, "comments", cursors, pk=pk
+        )
+    return written
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {"posts": {}, "listings": []}
+
+
+def save_manifest(output_dir, manifest):
+    filename = os.path.join(output_dir, MANIFEST_NAME)
+    with open(filename + ".tmp", "w") as file:
+        json.dump(manifest, file)
+    os.replace(filename + ".tmp", filename)
+
+
+def build_site(output_dir, workers=1, full=False, chunk_size=20):
+    """
+    Renders the front page, the category pages and the post pages with
+    all their pages into output_dir, laid out by URL path, e.g.
+    post/1/index.html and post/1/page/2/index.html.
+
+    The manifest in output_dir records last_modified and comment_count
+    of every post at the time of the build, and the newest
+    last_modified of its related posts, whose titles the post page
+    shows. Post pages are only
+    rendered again when these have changed or the post is new, pages
+    of deleted posts are removed. The manifest also records the version
+    of the category navigation, every post page is rendered again when
+    it has changed. The listings show every post, so they are always
+    rendered, but only changed files are rewritten.
+
+    With workers > 1 the pages are rendered by that many processes.
+    Returns the number of posts rendered and removed.
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {"posts": {}, "listings": []} if full else load_manifest(output_dir)
+
+    rows = Post.objects.annotate(related_on=views.newest_related()).values_list(
+        "pk", "last_modified", "comment_count", "related_on"
+    )
+    posts = {
+        str(pk): [last_modified.isoformat(), comment_count, related_on and related_on.isoformat()]
+        for pk, last_modified, comment_count, related_on in rows.iterator()
+    }
+    nav = build_category_nav(list(category_nav_queryset()))["version"]
+    changed = [
+        int(pk) for pk, state in posts.items()
+        if manifest["posts"].get(pk) != state
+        or manifest.get("nav") != nav
+        or not os.path.exists(os.path.join(output_dir, "post", pk, "index.html"))
+    ]
+    removed = set(manifest["posts"]) - set(posts)
+    for pk in removed:
+        shutil.rmtree(os.path.join(output_dir, "post", pk), ignore_errors=True)
+
+    listing_tasks = [("index", None)] + [
+        ("category", slug) for slug in Category.objects.values_list("slug", flat=True)
+    ]
+    tasks = listing_tasks + [("posts", chunk) for chunk in chunked(changed, chunk_size)]
+
+    if workers > 1:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=django.setup) as pool:
+            results = list(pool.map(build_task, [output_dir] * len(tasks), tasks))
+    else:
+        results = [build_task(output_dir, task) for task in tasks]
+
+    listings = sorted(name for result in results[: len(listing_tasks)] for name in result)
+    for name in set(manifest["listings"]) - set(listings):
+        try:
+            os.remove(os.path.join(output_dir, name))
+        except FileNotFoundError:
+            pass
+
+    save_manifest(output_dir, {"posts": posts, "listings": listings, "nav": nav})
+    return len(changed), len(removed)
@@ -0,0 +1,22 @@
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    Static files storage that gives every file collected by
+    collectstatic a name with a hash of its content, and writes gzip
+    and Brotli compressed copies next to it, so StaticFilesMiddleware
+    serves them with far-future cache headers and without compressing
+    anything per request.
+
+    Before collectstatic has been run, e.g. in development and in the
+    tests, there is no manifest, and the files keep their plain names
+    and are found by the staticfiles finders.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
@@ -0,0 +1,18 @@
+from django import template
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def page_link(context, name, cursor):
+    """
+    Returns the link to another page of a paginated list, given the
+    name of the query parameter and the cursor, e.g. "?after=<cursor>".
+    Pages rendered by build_static_site link to the page files instead.
+    """
+
+    static_site = getattr(context.get("request"), "static_site", None)
+    if static_site:
+        return static_site.page_link(context["request"].path, name)
+    return f"?{name}={cursor}"
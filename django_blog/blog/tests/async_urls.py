@@ -0,0 +1,25 @@
+from django.urls import path
+
+from blog import api, async_views, feeds, views
+
+
+# URL configuration that routes the read views to their async versions
+urlpatterns = [
+    path("", async_views.blog_index, name="blog_index"),
+    path("post/<int:pk>/", async_views.blog_detail, name="blog_detail"),
+    path("post/<int:pk>/comments/", views.blog_comments, name="blog_comments"),
+    path("post/<int:pk>/archived/", views.blog_archived_comments, name="blog_archived_comments"),
+    path("category/<str:slug>/", async_views.blog_category, name="blog_category"),
+    path("search/", views.blog_search, name="blog_search"),
+    path("metrics/", views.blog_metrics, name="blog_metrics"),
+    path("feed/atom/", feeds.atom_feed, name="blog_feed_atom"),
+    path("feed/rss/", feeds.rss_feed, name="blog_feed_rss"),
+    path("feed.json", feeds.json_feed, name="blog_feed_json"),
+    path("category/<str:slug>/feed/atom/", feeds.atom_feed, name="blog_category_feed_atom"),
+    path("category/<str:slug>/feed/rss/", feeds.rss_feed, name="blog_category_feed_rss"),
+    path("category/<str:slug>/feed.json", feeds.json_feed, name="blog_category_feed_json"),
+    path("api/v1/posts/", api.api_posts, name="blog_api_posts"),
+    path("api/v1/posts/<int:pk>/", api.api_post, name="blog_api_post"),
+    path("api/v1/posts/<int:pk>/comments/", api.api_comments, name="blog_api_comments"),
+    path("api/v1/categories/", api.api_categories, name="blog_api_categories"),
+]
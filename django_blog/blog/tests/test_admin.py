@@ -0,0 +1,209 @@
+from unittest import mock
+
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from blog.models import Category, Comment, PendingComment, Post
+from blog.pagination import EstimatedCountPaginator
+
+
+class RecordingTransaction:
+    """
+    Stands in for django.db.transaction and records whether a
+    transaction was open whenever atomic() is entered.
+    """
+
+    def __init__(self):
+        self.nested = []
+
+    def __getattr__(self, name):
+        return getattr(transaction, name)
+
+    def atomic(self, *args, **kwargs):
+        self.nested.append(connection.in_atomic_block)
+        return transaction.atomic(*args, **kwargs)
+
+
+class AdminTests(TestCase):
+    """Tests for the change lists and bulk actions of the blog admin"""
+
+    def setUp(self):
+        """
+        Set up a superuser and two posts with comments.
+        """
+
+        self.client.force_login(User.objects.create_superuser("admin", password="secret"))
+        self.category = Category.objects.create(name="Python")
+        self.posts = [
+            Post.objects.create(title="Fast queries", body="Indexes help"),
+            Post.objects.create(title="Slow queries", body="Full table scans"),
+        ]
+        self.posts[0].categories.add(self.category)
+        for post in self.posts:
+            for i in range(3):
+                Comment.objects.create(author=f"Reader {i}", body=f"Comment {i}", post=post)
+
+
+    def test_comment_changelist_query_count(self):
+        """
+        Test that the comment change list loads the posts of all rows in one
+        query, so the number of queries doesn't grow with the rows.
+        """
+
+        url = reverse("admin:blog_comment_changelist")
+        self.client.get(url)
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertContains(response, "Fast queries")
+
+        for i in range(20):
+            Comment.objects.create(author="Late", body=f"Late {i}", post=self.posts[1])
+        with self.assertNumQueries(6):
+            self.client.get(url)
+
+
+    def test_searches(self):
+        """
+        Test that posts are found through the search index and comments by
+        author or post id.
+        """
+
+        response = self.client.get(reverse("admin:blog_post_changelist"), {"q": "scans"})
+        self.assertEqual(list(response.context["cl"].result_list), [self.posts[1]])
+
+        url = reverse("admin:blog_comment_changelist")
+        response = self.client.get(url, {"q": "Reader 1"})
+        self.assertEqual(len(response.context["cl"].result_list), 2)
+        response = self.client.get(url, {"q": str(self.posts[0].pk)})
+        self.assertEqual(len(response.context["cl"].result_list), 3)
+
+
+    @override_settings(BLOG_ADMIN_EXACT_COUNT_LIMIT=2)
+    def test_paginator_counts_up_to_the_limit(self):
+        """
+        Test that filtered lists are counted up to the limit and whole tables estimated.
+        """
+
+        comments = Comment.objects.order_by("pk")
+        self.assertEqual(EstimatedCountPaginator(comments.filter(post=self.posts[0]), 1).count, 2)
+        Comment.objects.filter(author="Reader 1").delete()
+        # The estimate from the primary key range includes deleted rows
+        self.assertEqual(EstimatedCountPaginator(comments, 1).count, 6)
+
+        with override_settings(BLOG_ADMIN_EXACT_COUNT_LIMIT=10):
+            self.assertEqual(EstimatedCountPaginator(comments, 1).count, 4)
+
+
+    def test_delete_comments_action(self):
+        """
+        Test that the delete action removes the comments and recounts their posts.
+        """
+
+        comments = Comment.objects.filter(post=self.posts[0])[:2]
+        response = self.client.post(reverse("admin:blog_comment_changelist"), {
+            "action": "delete_comments",
+            ACTION_CHECKBOX_NAME: [comment.pk for comment in comments],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Comment.objects.count(), 4)
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].comment_count, 1)
+
+
+    def test_pending_comment_actions(self):
+        """
+        Test that pending comments can be published or rejected.
+        """
+
+        keep = PendingComment.objects.create(author="Good", body="Nice", post=self.posts[1])
+        spam = PendingComment.objects.create(author="Spam", body="Buy", post=self.posts[1])
+        url = reverse("admin:blog_pendingcomment_changelist")
+        self.client.post(url, {"action": "approve_comments", ACTION_CHECKBOX_NAME: [keep.pk]})
+        self.client.post(url, {"action": "reject_comments", ACTION_CHECKBOX_NAME: [spam.pk]})
+
+        self.assertFalse(PendingComment.objects.exists())
+        self.assertTrue(Comment.objects.filter(author="Good").exists())
+        self.assertFalse(Comment.objects.filter(author="Spam").exists())
+        self.posts[1].refresh_from_db()
+        self.assertEqual(self.posts[1].comment_count, 4)
+
+
+    def test_edit_post_in_admin(self):
+        """
+        Test that editing a post in the admin renders its new body.
+        """
+
+        post = self.posts[0]
+        response = self.client.post(reverse("admin:blog_post_change", args=[post.pk]), {
+            "title": post.title,
+            "body": "*Edited*",
+            "body_format": "markdown",
+            "categories": [self.category.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        post.refresh_from_db()
+        self.assertEqual(post.body_html, "<p><em>Edited</em></p>")
+
+
+    def test_add_category_without_slug(self):
+        """
+        Test that a category added in the admin with only a name gets a
+        unique slug made from it.
+        """
+
+        url = reverse("admin:blog_category_add")
+        response = self.client.post(url, {"name": "Python", "slug": ""})
+        self.assertRedirects(response, reverse("admin:blog_category_changelist"))
+        self.assertEqual(
+            list(Category.objects.order_by("pk").values_list("slug", flat=True)),
+            ["python", "python-2"],
+        )
+
+
+    def test_delete_post_confirmation_counts_comments(self):
+        """
+        Test that the confirmation page of a post deletion shows how many
+        comments go with it instead of listing every comment.
+        """
+
+        post = self.posts[0]
+        Comment.objects.bulk_create(
+            Comment(author="Reader", body="Bulk", post=post) for i in range(300)
+        )
+        url = reverse("admin:blog_post_delete", args=[post.pk])
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertContains(response, "Comments: 303", count=2)
+        self.assertNotContains(response, reverse("admin:blog_comment_change", args=[1]))
+
+        response = self.client.post(url, {"post": "yes"})
+        self.assertRedirects(response, reverse("admin:blog_post_changelist"))
+        self.assertFalse(Comment.objects.filter(post=post.pk).exists())
+        self.assertEqual(Comment.objects.count(), 3)
+
+
+class AdminDeleteTransactionTests(TransactionTestCase):
+    """Tests for the transactions of post deletions in the admin"""
+
+    def test_comments_deleted_in_transactions_of_their_own(self):
+        """
+        Test that deleting a post in the admin deletes its comments in
+        chunks that don't run inside one outer transaction.
+        """
+
+        self.client.force_login(User.objects.create_superuser("admin", password="secret"))
+        post = Post.objects.create(title="Busy", body="Many comments")
+        Comment.objects.bulk_create(
+            Comment(author="Reader", body="Bulk", post=post) for i in range(25)
+        )
+
+        recording = RecordingTransaction()
+        with override_settings(BLOG_DELETE_CHUNK_SIZE=10), \
+                mock.patch("blog.models.transaction", recording):
+            self.client.post(reverse("admin:blog_post_delete", args=[post.pk]), {"post": "yes"})
+        self.assertEqual(recording.nested, [False, False, False])
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
@@ -0,0 +1,110 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blog.models import Category, Comment, Post
+
+
+@override_settings(BLOG_PAGE_SIZE=2, BLOG_COMMENTS_PAGE_SIZE=2)
+class ApiTests(TestCase):
+    """Tests for the JSON API"""
+
+    def setUp(self):
+        """
+        Set up three posts in a category and three comments on the newest post.
+        """
+
+        cache.clear()
+        self.category = Category.objects.create(name="Python")
+        self.posts = [
+            Post.objects.create(title=f"Post {i}", body=f"*Body {i}*", body_format="markdown")
+            for i in range(3)
+        ]
+        self.category.posts.add(*self.posts[1:])
+        for i in range(3):
+            Comment.objects.create(author="Reader", body=f"Comment {i}", post=self.posts[-1])
+
+
+    def test_posts_are_paginated_with_cursors(self):
+        """
+        Test that the post list is returned newest first, page by page.
+        """
+
+        url = reverse("blog_api_posts")
+        first = self.client.get(url).json()
+        self.assertEqual([post["title"] for post in first["posts"]], ["Post 2", "Post 1"])
+        self.assertEqual(first["posts"][0]["categories"], ["python"])
+        self.assertEqual(first["posts"][0]["comment_count"], 3)
+        self.assertIsNone(first["previous"])
+
+        second = self.client.get(url, {"after": first["next"]}).json()
+        self.assertEqual([post["title"] for post in second["posts"]], ["Post 0"])
+        self.assertEqual(second["posts"][0]["categories"], [])
+        self.assertIsNone(second["next"])
+
+        filtered = self.client.get(url, {"category": "python", "fields": "id"}).json()
+        self.assertEqual(
+            filtered["posts"], [{"id": self.posts[2].pk}, {"id": self.posts[1].pk}]
+        )
+
+
+    def test_sparse_fields_only_load_their_columns(self):
+        """
+        Test that the body is only loaded when it is asked for.
+        """
+
+        url = reverse("blog_api_post", kwargs={"pk": self.posts[0].pk})
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(url, {"fields": "title,body_html"}).json()
+        self.assertEqual(data, {"title": "Post 0", "body_html": "<p><em>Body 0</em></p>"})
+        self.assertFalse(any('"blog_post"."body",' in query["sql"] for query in queries))
+
+        data = self.client.get(url, {"fields": "body"}).json()
+        self.assertEqual(data, {"body": "*Body 0*"})
+
+        response = self.client.get(url, {"fields": "title,password"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Unknown fields: password."})
+
+
+    def test_comments_and_categories(self):
+        """
+        Test that the comments of a post are paginated oldest first and the
+        categories are listed with their post counts.
+        """
+
+        url = reverse("blog_api_comments", kwargs={"pk": self.posts[-1].pk})
+        first = self.client.get(url, {"fields": "body"}).json()
+        self.assertEqual(first["comments"], [{"body": "Comment 0"}, {"body": "Comment 1"}])
+        second = self.client.get(url, {"after": first["next"], "fields": "body"}).json()
+        self.assertEqual(second, {"comments": [{"body": "Comment 2"}], "next": None})
+
+        data = self.client.get(reverse("blog_api_categories")).json()
+        self.assertEqual(data["categories"], [{
+            "name": "Python", "slug": "python", "post_count": 2, "url": "/category/python/",
+        }])
+
+
+    def test_etags_and_errors(self):
+        """
+        Test that unchanged responses are answered with 304 and errors are JSON.
+        """
+
+        url = reverse("blog_api_post", kwargs={"pk": self.posts[0].pk})
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.client.get(url, {"fields": "id"})["ETag"], etag)
+
+        self.posts[0].title = "Edited"
+        self.posts[0].save()
+        self.assertEqual(self.client.get(url, headers={"if-none-match": etag}).status_code, 200)
+
+        missing = reverse("blog_api_comments", kwargs={"pk": self.posts[-1].pk + 1})
+        response = self.client.get(missing)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {"error": "No post found."})
+        self.assertEqual(self.client.get(reverse("blog_api_posts"), {"after": "bad"}).status_code, 404)
+        self.assertEqual(self.client.post(reverse("blog_api_posts")).status_code, 405)
@@ -0,0 +1,142 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.archive import archive_crowded, archive_old
+from blog.models import ArchivedComment, Comment, Post
+
+
+@override_settings(BLOG_COMMENTS_PAGE_SIZE=2)
+class CommentArchiveTests(TestCase):
+    """Tests for the comment archive and the archive_comments command"""
+
+    def setUp(self):
+        """
+        Set up a post with five comments a day apart, half a day to four and a
+        half days old.
+        """
+
+        cache.clear()
+        self.post = Post.objects.create(title="Old post", body="Body")
+        now = timezone.now()
+        for i in range(5):
+            comment = Comment.objects.create(author="Reader", body=f"Comment {i}", post=self.post)
+            # created_on is set on insert, so it is moved back afterwards
+            Comment.objects.filter(pk=comment.pk).update(created_on=now - timedelta(days=4 - i, hours=12))
+
+
+    def test_archive_old_comments(self):
+        """
+        Test that comments older than the given age are moved to the archive
+        and the counts of the post follow.
+        """
+
+        self.assertEqual(archive_old(days=3, batch_size=1), 2)
+
+        self.assertEqual(
+            list(ArchivedComment.objects.order_by("pk").values_list("body", flat=True)),
+            ["Comment 0", "Comment 1"],
+        )
+        self.assertEqual(Comment.objects.count(), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 3)
+        self.assertEqual(self.post.archived_comment_count, 2)
+        self.assertEqual(archive_old(days=3, batch_size=1), 0)
+
+
+    def test_archive_crowded_posts(self):
+        """
+        Test that only the newest comments of a post are kept.
+        """
+
+        self.assertEqual(archive_crowded(keep=2, batch_size=2), 3)
+        self.assertEqual(
+            list(Comment.objects.order_by("pk").values_list("body", flat=True)),
+            ["Comment 3", "Comment 4"],
+        )
+        self.assertEqual(archive_crowded(keep=2, batch_size=2), 0)
+
+
+    def test_archived_comments_page(self):
+        """
+        Test that the post links to its archived comments, which are shown
+        oldest first, page by page.
+        """
+
+        archive_crowded(keep=2, batch_size=10)
+        detail = self.client.get(reverse("blog_detail", kwargs={"pk": self.post.pk}))
+        url = reverse("blog_archived_comments", kwargs={"pk": self.post.pk})
+        self.assertContains(detail, "3 older comments archived")
+        self.assertContains(detail, url)
+        self.assertNotContains(detail, "Comment 0")
+
+        first = self.client.get(url)
+        self.assertEqual(
+            [comment.body for comment in first.context["comments"]], ["Comment 0", "Comment 1"]
+        )
+        second = self.client.get(url, {"after": first.context["comments"].next_cursor})
+        self.assertEqual([comment.body for comment in second.context["comments"]], ["Comment 2"])
+
+        self.assertEqual(self.client.get(url, headers={"if-none-match": first["ETag"]}).status_code, 304)
+        ArchivedComment.objects.get(body="Comment 0").delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.archived_comment_count, 2)
+        self.assertEqual(self.client.get(url, headers={"if-none-match": first["ETag"]}).status_code, 200)
+
+
+    @override_settings(BLOG_DELETE_CHUNK_SIZE=2)
+    def test_post_delete_removes_comments_in_chunks(self):
+        """
+        Test that deleting posts deletes their comments in chunks, without
+        loading them.
+        """
+
+        archive_old(days=4, batch_size=10)
+        with CaptureQueriesContext(connection) as queries:
+            self.post.delete()
+        deletes = [query["sql"] for query in queries if query["sql"].startswith("DELETE")]
+        self.assertEqual(sum('"blog_comment"' in sql for sql in deletes), 2)
+        self.assertEqual(sum('"blog_archivedcomment"' in sql for sql in deletes), 1)
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(ArchivedComment.objects.exists())
+
+        other = Post.objects.create(title="Other", body="Body")
+        Comment.objects.create(author="Reader", body="Hi", post=other)
+        Post.objects.filter(pk=other.pk).delete()
+        self.assertFalse(Comment.objects.exists())
+
+
+    def test_command_needs_a_limit(self):
+        """
+        Test that the command fails without a limit and archives with one.
+        """
+
+        with self.assertRaises(CommandError):
+            call_command("archive_comments", stdout=StringIO())
+
+        out = StringIO()
+        call_command("archive_comments", "--older-than", "3", "--keep", "1", stdout=out)
+        self.assertIn("Archived 4 comments", out.getvalue())
+        self.assertEqual(Comment.objects.get().body, "Comment 4")
+
+
+    def test_command_rejects_negative_limits(self):
+        """
+        Test that the command refuses negative limits, given as options or
+        in the settings, before archiving anything.
+        """
+
+        for option in ("--keep", "--older-than"):
+            with self.subTest(option=option), self.assertRaisesMessage(CommandError, "negative"):
+                call_command("archive_comments", option, "-1", stdout=StringIO())
+        with self.settings(BLOG_COMMENT_ARCHIVE_KEEP=-1):
+            with self.assertRaisesMessage(CommandError, "negative"):
+                call_command("archive_comments", stdout=StringIO())
+        self.assertEqual(Comment.objects.count(), 5)
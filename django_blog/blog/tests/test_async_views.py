@@ -0,0 +1,117 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from blog.forms import CommentForm
+from blog.models import Category, Comment, PendingComment, Post
+
+
+@override_settings(ROOT_URLCONF="blog.tests.async_urls", BLOG_PAGE_SIZE=2)
+class AsyncViewTests(TestCase):
+    """Tests for the async versions of the read views"""
+
+    def setUp(self):
+        """
+        Set up three posts in a category and a comment on the newest post.
+        """
+
+        cache.clear()
+        self.category = Category.objects.create(name="Async")
+        self.posts = [
+            Post.objects.create(title=f"Post {i}", body=f"Body {i}") for i in range(3)
+        ]
+        self.category.posts.add(*self.posts)
+        self.post = self.posts[-1]
+        self.comment = Comment.objects.create(author="Reader", body="Async comment", post=self.post)
+        self.detail_url = reverse("blog_detail", kwargs={"pk": self.post.pk})
+
+
+    async def test_blog_index_paginates(self):
+        """
+        Test that the async blog_index view shows the newest posts and a next page link.
+        """
+
+        response = await self.async_client.get(reverse("blog_index"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "blog/index.html")
+        self.assertEqual(list(response.context["posts"]), [self.posts[2], self.posts[1]])
+        self.assertTrue(response.context["page"].has_next)
+
+
+    async def test_blog_category(self):
+        """
+        Test that the async blog_category view lists the category's posts and
+        redirects name based URLs.
+        """
+
+        url = reverse("blog_category", kwargs={"slug": self.category.slug})
+        response = await self.async_client.get(url)
+        self.assertEqual(response.context["category"], self.category)
+        self.assertIn(self.post, response.context["posts"])
+
+        response = await self.async_client.get(f"/category/{self.category.name}/")
+        self.assertRedirects(response, url, status_code=301, fetch_redirect_response=False)
+
+
+    async def test_blog_detail(self):
+        """
+        Test that the async blog_detail view renders the post, its categories and comments.
+        """
+
+        response = await self.async_client.get(self.detail_url)
+        self.assertEqual(response.context["post"], self.post)
+        self.assertIn(self.comment, response.context["comments"])
+        self.assertIsInstance(response.context["form"], CommentForm)
+        self.assertContains(response, "Async comment")
+        self.assertContains(response, self.category.name)
+
+
+    async def test_blog_detail_post_comment(self):
+        """
+        Test that a valid comment posted to the async blog_detail view is saved and counted.
+        """
+
+        data = {"author": "New Author", "body": "New Comment"}
+        response = await self.async_client.post(self.detail_url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(await Comment.objects.filter(author="New Author").aexists())
+        post = await Post.objects.aget(pk=self.post.pk)
+        self.assertEqual(post.comment_count, 2)
+
+
+    @override_settings(BLOG_COMMENT_QUEUE=True)
+    async def test_blog_detail_queues_comment(self):
+        """
+        Test that with the comment queue on the async view only stores the comment in the outbox.
+        """
+
+        data = {"author": "New Author", "body": "Queued"}
+        response = await self.async_client.post(self.detail_url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(await PendingComment.objects.filter(body="Queued").aexists())
+        self.assertFalse(await Comment.objects.filter(body="Queued").aexists())
+
+
+    @override_settings(BLOG_COMMENT_DUPLICATE_WINDOW=600)
+    async def test_blog_detail_rejects_duplicate_comment(self):
+        """
+        Test that the async view turns away a repeated comment with 429.
+        """
+
+        data = {"author": "New Author", "body": "Twice"}
+        await self.async_client.post(self.detail_url, data)
+        response = await self.async_client.post(self.detail_url, data)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(await Comment.objects.filter(body="Twice").acount(), 1)
+
+
+    async def test_blog_detail_not_modified(self):
+        """
+        Test that the async views answer a matching If-None-Match with 304.
+        """
+
+        response = await self.async_client.get(self.detail_url)
+        response = await self.async_client.get(
+            self.detail_url, headers={"if-none-match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,135 @@
+import json
+import os
+import statistics
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db.models import Count, F
+from django.test import TestCase
+
+from blog.benchmarks import compare, generate
+from blog.models import Category, Comment, Post, RelatedPost
+
+
+class GenerateTests(TestCase):
+    """Tests for the synthetic data generator"""
+
+    def test_generated_data_is_consistent_and_heavy_tailed(self):
+        """
+        Test that the generated posts have categories, correct comment counts
+        and that a few posts get far more comments than the median.
+        """
+
+        categories, posts, comments = generate(500, comments_per_post=5, seed=1, batch_size=100)
+
+        self.assertEqual((categories, posts), (5, 500))
+        self.assertEqual(Post.objects.count(), 500)
+        self.assertEqual(Comment.objects.count(), comments)
+        self.assertFalse(Post.objects.filter(categories=None).exists())
+        mismatched = Post.objects.annotate(counted=Count("comment")).exclude(
+            comment_count=F("counted")
+        )
+        self.assertFalse(mismatched.exists())
+
+        counts = list(Post.objects.values_list("comment_count", flat=True))
+        self.assertGreater(max(counts), 10 * statistics.median(counts))
+        self.assertTrue(Post.objects.exclude(body_html="").exists())
+
+
+    def test_same_seed_same_data(self):
+        """
+        Test that the generator is reproducible.
+        """
+
+        generate(20, seed=7)
+        first = list(Post.objects.order_by("pk").values_list("title", "comment_count"))
+        Post.objects.all().delete()
+        Category.objects.all().delete()
+        generate(20, seed=7)
+        second = list(Post.objects.order_by("pk").values_list("title", "comment_count"))
+        self.assertEqual(first, second)
+
+
+    def test_runs_again_on_the_same_blog(self):
+        """
+        Test that data can be generated into a blog that already has
+        generated data, and that the related posts are built.
+        """
+
+        generate(20, seed=7)
+        generate(20, seed=7)
+        slugs = list(Category.objects.values_list("slug", flat=True))
+        self.assertEqual(len(slugs), 10)
+        self.assertEqual(len(set(slugs)), 10)
+        self.assertTrue(RelatedPost.objects.exists())
+
+
+class BenchmarkCommandTests(TestCase):
+    """Tests for the benchmark_views command"""
+
+    def setUp(self):
+        """
+        Set up an existing post and a file for the results.
+        """
+
+        self.post = Post.objects.create(title="Keep me", body="Body")
+        handle, self.path = tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+
+    def test_writes_results_and_leaves_data(self):
+        """
+        Test that the results of every view are written and that the
+        generated data is rolled back.
+        """
+
+        call_command(
+            "benchmark_views", "--scales", "30", "--iterations", "2",
+            "--json", self.path, stdout=StringIO(),
+        )
+        with open(self.path) as file:
+            results = json.load(file)
+
+        scale = results["scales"][0]
+        self.assertEqual(scale["posts"], 30)
+        self.assertIn("detail_most_comments", scale["views"])
+        # Every request starts with a cold cache, including the category navigation
+        self.assertEqual(scale["views"]["index"]["queries"], 4)
+        self.assertGreater(scale["views"]["feed"]["bytes"], 0)
+        self.assertEqual(list(Post.objects.all()), [self.post])
+
+        # Comparing against itself finds no regression
+        call_command(
+            "benchmark_views", "--scales", "30", "--iterations", "2",
+            "--baseline", self.path, "--max-slowdown", "1000", stdout=StringIO(),
+        )
+
+
+    def test_compare_finds_regressions(self):
+        """
+        Test that more queries or a slower median count as regressions.
+        """
+
+        baseline = {"scales": [{"posts": 10, "views": {
+            "index": {"queries": 3, "p50_ms": 10.0},
+            "detail": {"queries": 4, "p50_ms": 10.0},
+        }}]}
+        results = {"scales": [{"posts": 10, "views": {
+            "index": {"queries": 4, "p50_ms": 10.0},
+            "detail": {"queries": 4, "p50_ms": 20.0},
+            "search": {"queries": 1, "p50_ms": 5.0},
+        }}]}
+
+        regressions = compare(results, baseline, 1.25)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn("index at 10 posts: 3 -> 4 queries", regressions)
+
+        with open(self.path, "w") as file:
+            json.dump(baseline, file)
+        with self.assertRaises(CommandError):
+            call_command(
+                "benchmark_views", "--scales", "10", "--iterations", "1",
+                "--baseline", self.path, "--max-slowdown", "0.000001", stdout=StringIO(),
+            )
@@ -0,0 +1,234 @@
+import re
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import Category, Comment, Post
+
+
+class FragmentCacheTests(TestCase):
+    """Tests for the cached fragments of the blog_detail view"""
+
+    def setUp(self):
+        """
+        Set up a post with a category and a comment, and render the
+        detail page once so that its fragments are cached.
+        """
+
+        cache.clear()
+        self.category = Category.objects.create(name="Python")
+        self.post = Post.objects.create(title="Cached", body="Original body")
+        self.post.categories.add(self.category)
+        self.comment = Comment.objects.create(author="Reader", body="First!", post=self.post)
+        self.url = reverse("blog_detail", kwargs={"pk": self.post.pk})
+        self.client.get(self.url)
+
+
+    def test_edited_post_body_is_rendered(self):
+        """
+        Test that saving the post replaces the cached body.
+        """
+
+        self.post.body = "Edited body"
+        self.post.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, "Edited body")
+        self.assertNotContains(response, "Original body")
+
+
+    def test_new_comment_is_rendered(self):
+        """
+        Test that a new comment replaces the cached comment list.
+        """
+
+        Comment.objects.create(author="Second", body="Me too", post=self.post)
+        self.assertContains(self.client.get(self.url), "Me too")
+
+
+    def test_edited_and_deleted_comments_are_rendered(self):
+        """
+        Test that editing or deleting a comment replaces the cached comment list.
+        """
+
+        self.comment.body = "Edited comment"
+        self.comment.save()
+        self.assertContains(self.client.get(self.url), "Edited comment")
+
+        self.comment.delete()
+        self.assertNotContains(self.client.get(self.url), "Edited comment")
+
+
+    def test_renamed_category_is_rendered(self):
+        """
+        Test that renaming a category replaces the cached category bar.
+        """
+
+        self.category.name = "Django"
+        self.category.save()
+        self.assertContains(self.client.get(self.url), "Django")
+
+
+    def test_removed_and_deleted_categories_are_not_rendered(self):
+        """
+        Test that removing the post from a category, from either side of the
+        relation, or deleting the category replaces the cached category bar
+        and the cached category navigation.
+        """
+
+        other = Category.objects.create(name="Testing")
+        with self.captureOnCommitCallbacks(execute=True):
+            other.posts.add(self.post)
+        self.assertContains(self.client.get(self.url), "Testing")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.categories.remove(self.category)
+        self.assertNotContains(self.client.get(self.url), "Python")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertNotContains(self.client.get(self.url), "Testing")
+
+
+class ConditionalPageTests(TestCase):
+    """Tests for the ETag, Last-Modified and page caching of the read views"""
+
+    def setUp(self):
+        """
+        Set up a post with a category and a comment.
+        """
+
+        cache.clear()
+        self.category = Category.objects.create(name="Python")
+        self.post = Post.objects.create(title="Cached", body="Original body")
+        self.post.categories.add(self.category)
+        Comment.objects.create(author="Reader", body="First!", post=self.post)
+        self.detail_url = reverse("blog_detail", kwargs={"pk": self.post.pk})
+
+
+    def test_matching_etag_returns_304(self):
+        """
+        Test that every read view answers a matching If-None-Match with 304.
+        """
+
+        urls = [
+            reverse("blog_index"),
+            reverse("blog_category", kwargs={"slug": self.category.slug}),
+            self.detail_url,
+        ]
+        for url in urls:
+            response = self.client.get(url)
+            self.assertIn("Last-Modified", response)
+            etag = response["ETag"]
+            self.assertFalse(etag.startswith("W/"))
+            response = self.client.get(url, headers={"if-none-match": etag})
+            self.assertEqual(response.status_code, 304)
+
+
+    def test_not_modified_response_skips_rendering(self):
+        """
+        Test that a 304 response only runs the validator query.
+        """
+
+        etag = self.client.get(self.detail_url)["ETag"]
+        with self.assertNumQueries(1):
+            self.client.get(self.detail_url, headers={"if-none-match": etag})
+
+
+    def test_etag_changes_with_post_and_comments(self):
+        """
+        Test that editing the post or adding a comment changes the ETag.
+        """
+
+        first = self.client.get(self.detail_url)["ETag"]
+        self.post.title = "Edited"
+        self.post.save()
+        second = self.client.get(self.detail_url)["ETag"]
+        Comment.objects.create(author="Second", body="Me too", post=self.post)
+        third = self.client.get(self.detail_url)["ETag"]
+        self.assertEqual(len({first, second, third}), 3)
+
+
+    def test_last_modified_follows_comments(self):
+        """
+        Test that a new comment answers an If-Modified-Since on the
+        listings and the API with 200.
+        """
+
+        urls = [
+            reverse("blog_index"),
+            reverse("blog_category", kwargs={"slug": self.category.slug}),
+            reverse("blog_api_posts"),
+            reverse("blog_api_post", kwargs={"pk": self.post.pk}),
+        ]
+        since = {url: self.client.get(url)["Last-Modified"] for url in urls}
+
+        # Last-Modified only has whole seconds, so the changes are later
+        later = timezone.now() + timedelta(seconds=2)
+        comment = Comment.objects.create(author="Second", body="Me too", post=self.post)
+        Comment.objects.filter(pk=comment.pk).update(created_on=later)
+        for url in urls:
+            response = self.client.get(url, headers={"if-modified-since": since[url]})
+            self.assertEqual(response.status_code, 200, url)
+
+
+    def test_last_modified_follows_categories(self):
+        """
+        Test that a changed category navigation answers an If-Modified-Since
+        with 200, and that its time comes from the categories, not from when
+        the navigation was cached.
+        """
+
+        url = reverse("blog_index")
+        since = self.client.get(url)["Last-Modified"]
+        cache.clear()
+        self.assertEqual(self.client.get(url)["Last-Modified"], since)
+
+        # Last-Modified only has whole seconds, so the change is later
+        Category.objects.create(name="Testing")
+        later = timezone.now() + timedelta(seconds=2)
+        Category.objects.filter(name="Testing").update(last_modified=later)
+        cache.clear()
+        response = self.client.get(url, headers={"if-modified-since": since})
+        self.assertEqual(response.status_code, 200)
+
+
+    def test_listing_is_served_from_page_cache(self):
+        """
+        Test that a repeated listing request is served from the page cache
+        until a post on the page changes.
+        """
+
+        url = reverse("blog_index")
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertContains(response, "Cached")
+
+        self.category.name = "Renamed"
+        self.category.save()
+        self.assertContains(self.client.get(url), "Renamed")
+
+
+    def test_page_with_csrf_token_is_cached(self):
+        """
+        Test that a repeated detail request is served from the page cache
+        with a CSRF token of the visitor's own, which the comment form
+        accepts.
+        """
+
+        self.client.get(self.detail_url)
+        client = Client(enforce_csrf_checks=True)
+        with self.assertNumQueries(1):
+            response = client.get(self.detail_url)
+        self.assertIsNone(response.context)
+        self.assertNotContains(response, "blog-csrf-token")
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode())
+
+        response = client.post(self.detail_url, {
+            "author": "Visitor", "body": "Cached form", "csrfmiddlewaretoken": token[1],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Comment.objects.filter(body="Cached form").exists())
@@ -0,0 +1,88 @@
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from blog.middleware import PIN_COOKIE, ReadReplicaMiddleware
+from blog.models import Post
+from blog.routers import ReadReplicaRouter, replica_reads
+
+
+class SQLiteSettingsTests(TestCase):
+    """Tests for the SQLite connection settings"""
+
+    def test_connection_pragmas(self):
+        """
+        Test that new connections are tuned by the init command.
+        """
+
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite only")
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("PRAGMA temp_store")
+            self.assertEqual(cursor.fetchone()[0], 2)
+        self.assertTrue(connection.settings_dict["CONN_HEALTH_CHECKS"])
+
+
+@override_settings(BLOG_READ_REPLICA="replica")
+class ReadReplicaTests(SimpleTestCase):
+    """Tests for ReadReplicaRouter and ReadReplicaMiddleware"""
+
+    def setUp(self):
+        """
+        Set up a middleware that remembers whether the view could read from the replica.
+        """
+
+        self.seen = []
+
+        def view(request):
+            self.seen.append(replica_reads.get())
+            return HttpResponse()
+
+        self.middleware = ReadReplicaMiddleware(view)
+        self.factory = RequestFactory()
+
+
+    def test_router(self):
+        """
+        Test that only reads made while replica reads are allowed go to the replica.
+        """
+
+        router = ReadReplicaRouter()
+        self.assertIsNone(router.db_for_read(Post))
+        token = replica_reads.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Post), "replica")
+            self.assertEqual(router.db_for_write(Post), "default")
+        finally:
+            replica_reads.reset(token)
+        self.assertFalse(router.allow_migrate("replica", "blog"))
+        self.assertTrue(router.allow_migrate("default", "blog"))
+
+
+    def test_blog_views_read_from_replica(self):
+        """
+        Test that GET requests to the blog views may use the replica and other requests don't.
+        """
+
+        self.middleware(self.factory.get("/"))
+        self.middleware(self.factory.get("/post/1/"))
+        self.middleware(self.factory.get("/admin/"))
+        self.middleware(self.factory.get("/no/such/page/"))
+        self.assertEqual(self.seen, [True, True, False, False])
+        self.assertFalse(replica_reads.get())
+
+
+    def test_form_pins_visitor_to_default(self):
+        """
+        Test that after a POST the visitor reads from the default database for a while.
+        """
+
+        response = self.middleware(self.factory.post("/post/1/"))
+        self.assertEqual(response.cookies[PIN_COOKIE]["max-age"], 10)
+
+        request = self.factory.get("/post/1/")
+        request.COOKIES[PIN_COOKIE] = "1"
+        self.middleware(request)
+        self.assertEqual(self.seen, [False, False])
@@ -0,0 +1,126 @@
+import json
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from blog.models import Category, Post
+
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+
+class FeedTests(TestCase):
+    """Tests for the Atom, RSS and JSON feeds"""
+
+    def setUp(self):
+        """
+        Set up three posts, two of them in a category.
+        """
+
+        cache.clear()
+        self.category = Category.objects.create(name="Feeds")
+        self.posts = [
+            Post.objects.create(title=f"Post {i} & co", body=f"Body {i}") for i in range(3)
+        ]
+        self.category.posts.add(self.posts[0], self.posts[2])
+
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+
+    def test_atom_feed(self):
+        """
+        Test that the Atom feed is valid XML listing the newest posts first.
+        """
+
+        response = self.client.get(reverse("blog_feed_atom"))
+        self.assertEqual(response["Content-Type"], "application/atom+xml; charset=utf-8")
+        root = ElementTree.fromstring(self.content(response))
+        titles = [entry.find(f"{ATOM}title").text for entry in root.iter(f"{ATOM}entry")]
+        self.assertEqual(titles, ["Post 2 & co", "Post 1 & co", "Post 0 & co"])
+
+
+    def test_rss_feed(self):
+        """
+        Test that the RSS feed is valid XML with the rendered body as description.
+        """
+
+        response = self.client.get(reverse("blog_feed_rss"))
+        root = ElementTree.fromstring(self.content(response))
+        items = root.findall("channel/item")
+        self.assertEqual(len(items), 3)
+        self.assertEqual(items[0].find("description").text, "<p>Body 2</p>")
+
+
+    def test_json_feed(self):
+        """
+        Test that the JSON feed is valid JSON with the posts' categories as tags.
+        """
+
+        response = self.client.get(reverse("blog_feed_json"))
+        data = json.loads(self.content(response))
+        self.assertEqual(data["version"], "https://jsonfeed.org/version/1.1")
+        self.assertEqual([item["title"] for item in data["items"]], [
+            "Post 2 & co", "Post 1 & co", "Post 0 & co",
+        ])
+        self.assertEqual(data["items"][0]["tags"], ["Feeds"])
+
+
+    def test_category_feed(self):
+        """
+        Test that a category feed contains only the category's posts and that
+        an unknown category returns 404.
+        """
+
+        url = reverse("blog_category_feed_json", kwargs={"slug": self.category.slug})
+        data = json.loads(self.content(self.client.get(url)))
+        self.assertEqual([item["title"] for item in data["items"]], ["Post 2 & co", "Post 0 & co"])
+
+        url = reverse("blog_category_feed_atom", kwargs={"slug": "missing"})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+    @override_settings(BLOG_FEED_LENGTH=2)
+    def test_feed_length(self):
+        """
+        Test that the feed contains at most BLOG_FEED_LENGTH posts.
+        """
+
+        data = json.loads(self.content(self.client.get(reverse("blog_feed_json"))))
+        self.assertEqual(len(data["items"]), 2)
+
+
+    def test_feed_not_modified(self):
+        """
+        Test that polling a feed that hasn't changed returns 304, and that a
+        new post changes the ETag.
+        """
+
+        url = reverse("blog_feed_rss")
+        response = self.client.get(url)
+        etag = response["ETag"]
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, headers={"if-modified-since": response["Last-Modified"]})
+        self.assertEqual(response.status_code, 304)
+
+        Post.objects.create(title="New", body="New body")
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+
+
+    def test_feed_posts_queried_once(self):
+        """
+        Test that the feed is streamed from the posts its ETag was built
+        from, without looking them up again.
+        """
+
+        url = reverse("blog_category_feed_atom", kwargs={"slug": self.category.slug})
+        # The category, the feed's rows, the posts and their categories
+        with self.assertNumQueries(4):
+            root = ElementTree.fromstring(self.content(self.client.get(url)))
+        self.assertEqual(len(root.findall(f"{ATOM}entry")), 2)
@@ -0,0 +1,198 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from blog.models import ArchivedComment, Category, Comment, Post
+
+
+class ImportExportTests(TestCase):
+    """Tests for the import_blog and export_blog commands"""
+
+    def setUp(self):
+        """
+        Set up a temporary file for the exported data.
+        """
+
+        handle, self.path = tempfile.mkstemp(suffix=".ndjson")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+
+    def write_records(self, records):
+        with open(self.path, "w") as file:
+            for record in records:
+                file.write(json.dumps(record) + "\n")
+
+
+    def import_blog(self, *args):
+        call_command("import_blog", self.path, *args, stderr=StringIO())
+
+
+    def test_import_keeps_ids_timestamps_and_relations(self):
+        """
+        Test that imported rows keep their ids, times and categories, and
+        that the derived post fields and comment counts are filled in.
+        """
+
+        self.write_records([
+            {"type": "category", "id": 7, "name": "Travel notes"},
+            {
+                "type": "post", "id": 3, "title": "Lisbon", "body": "*Sunny*",
+                "body_format": "markdown", "created_on": "2019-05-01T10:00:00+00:00",
+                "last_modified": "2019-05-02T10:00:00+00:00", "categories": [7],
+            },
+            {
+                "type": "comment", "id": 11, "post": 3, "author": "Ana",
+                "body": "Nice", "created_on": "2019-05-03T10:00:00+00:00",
+            },
+            {
+                "type": "comment", "id": 12, "post": 3, "author": "Rui",
+                "body": "Agreed", "created_on": "2019-05-04T10:00:00+00:00",
+            },
+        ])
+        # A batch size of one writes every row in its own transaction
+        self.import_blog("--batch-size", "1")
+
+        post = Post.objects.get(pk=3)
+        self.assertEqual(post.created_on, datetime(2019, 5, 1, 10, tzinfo=timezone.utc))
+        self.assertEqual(post.last_modified, datetime(2019, 5, 2, 10, tzinfo=timezone.utc))
+        self.assertEqual(post.body_html, "<p><em>Sunny</em></p>")
+        self.assertEqual(post.excerpt, "Sunny")
+        self.assertEqual(post.comment_count, 2)
+        self.assertEqual(list(post.categories.values_list("slug", flat=True)), ["travel-notes"])
+        self.assertEqual(Category.objects.get(pk=7).post_count, 1)
+        comment = Comment.objects.get(pk=12)
+        self.assertEqual(comment.created_on, datetime(2019, 5, 4, 10, tzinfo=timezone.utc))
+        self.assertTrue(Post._meta.get_field("last_modified").auto_now)
+
+
+    def test_comment_counts_recalculated_once(self):
+        """
+        Test that the comment count of a post whose comments span many
+        batches is recalculated once, after the last batch.
+        """
+
+        records = [{"type": "post", "id": 3, "title": "Lisbon", "body": "Sunny"}]
+        records += [
+            {"type": "comment", "id": number, "post": 3, "author": "Ana", "body": "Nice"}
+            for number in range(1, 6)
+        ]
+        records.append({
+            "type": "archived_comment", "id": 6, "post": 3, "author": "Rui", "body": "Old",
+        })
+        self.write_records(records)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.import_blog("--batch-size", "1")
+
+        recounts = [
+            query for query in queries.captured_queries
+            if query["sql"].startswith('UPDATE "blog_post"')
+        ]
+        self.assertEqual(len(recounts), 1)
+        post = Post.objects.get(pk=3)
+        self.assertEqual(post.comment_count, 5)
+        self.assertEqual(post.archived_comment_count, 1)
+
+
+    def test_export_then_import_round_trips(self):
+        """
+        Test that exporting and importing into an empty blog recreates it.
+        """
+
+        category = Category.objects.create(name="Django")
+        post = Post.objects.create(title="Models", body="Fields")
+        post.categories.add(category)
+        Comment.objects.create(author="Jo", body="Thanks", post=post)
+        ArchivedComment.objects.create(
+            id=99, author="Al", body="Old", post=post, created_on=post.created_on
+        )
+        Post.objects.filter(pk=post.pk).update_comment_counts()
+        Post.objects.create(title="Uncategorized", body="Nothing")
+
+        call_command("export_blog", self.path, stderr=StringIO())
+        with open(self.path) as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual([record["type"] for record in records], [
+            "category", "post", "post", "comment", "archived_comment",
+        ])
+
+        before = list(Post.objects.order_by("pk").values())
+        Category.objects.all().delete()
+        Post.objects.all().delete()
+        self.import_blog()
+
+        self.assertEqual(list(Post.objects.order_by("pk").values()), before)
+        self.assertEqual(list(Post.objects.get(pk=post.pk).categories.all()), [category])
+        self.assertEqual(Comment.objects.get().post_id, post.pk)
+        self.assertEqual(ArchivedComment.objects.get().pk, 99)
+
+
+    def test_existing_rows_fail_unless_skipped(self):
+        """
+        Test that rows with taken ids stop the import unless --skip-existing is given.
+        """
+
+        post = Post.objects.create(title="Original", body="Kept")
+        self.write_records([
+            {"type": "post", "id": post.pk, "title": "Imported", "body": "Dropped"},
+            {"type": "comment", "post": post.pk, "author": "Jo", "body": "Hi"},
+        ])
+
+        with self.assertRaises(CommandError):
+            self.import_blog()
+
+        self.import_blog("--skip-existing")
+        post.refresh_from_db()
+        self.assertEqual(post.title, "Original")
+        self.assertEqual(post.comment_count, 1)
+
+
+    def test_invalid_record_reports_line(self):
+        """
+        Test that a malformed line stops the import with its line number.
+        """
+
+        with open(self.path, "w") as file:
+            file.write('{"type": "category", "name": "Ok"}\n{"type": "post"}\n')
+
+        with self.assertRaisesMessage(CommandError, "Line 2"):
+            self.import_blog()
+
+
+    def test_skip_existing_links_new_posts_and_makes_unique_slugs(self):
+        """
+        Test that with --skip-existing the categories are linked to the new
+        posts, not to skipped ones, and that categories without a slug get
+        unique ones.
+        """
+
+        taken = Category.objects.create(name="Python")
+        post = Post.objects.create(title="Original", body="Kept")
+        self.write_records([
+            {"type": "category", "id": 50, "name": "Python"},
+            {"type": "category", "id": 51, "name": "Python!"},
+            {"type": "post", "id": post.pk, "title": "Imported", "body": "x", "categories": [50]},
+            {"type": "post", "title": "New", "body": "Body", "categories": [50, 51]},
+            {"type": "post", "title": "Newer", "body": "Body", "categories": [51]},
+        ])
+        self.import_blog("--skip-existing")
+
+        self.assertEqual(
+            list(Category.objects.order_by("pk").values_list("slug", flat=True)),
+            [taken.slug, "python-2", "python-3"],
+        )
+        self.assertFalse(post.categories.exists())
+        new = Post.objects.get(title="New")
+        self.assertEqual(sorted(new.categories.values_list("pk", flat=True)), [50, 51])
+        newer = Post.objects.get(title="Newer")
+        self.assertEqual(list(newer.categories.values_list("pk", flat=True)), [51])
+        self.assertFalse(Post.categories.through.objects.filter(post=None).exists())
+        self.assertEqual(Category.objects.get(pk=51).post_count, 2)
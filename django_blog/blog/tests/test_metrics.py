@@ -0,0 +1,179 @@
+import asyncio
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from blog import metrics
+from blog.models import Post
+
+
+class HistogramTests(SimpleTestCase):
+    """Tests for the histograms kept by the metrics recorder"""
+
+    def test_percentiles_within_bucket_error(self):
+        """
+        Test that the percentiles are close to the exact values.
+        """
+
+        histogram = metrics.Histogram()
+        for value in range(1, 1001):
+            histogram.add(value)
+
+        self.assertEqual(histogram.count, 1000)
+        for fraction, exact in ((0.5, 500), (0.95, 950), (0.99, 990)):
+            self.assertLessEqual(exact, histogram.percentile(fraction))
+            self.assertLess(histogram.percentile(fraction), exact * metrics.BUCKET_RATIO)
+
+
+    def test_merge_and_zeros(self):
+        """
+        Test that merged histograms count the values of both and that zeros are kept.
+        """
+
+        first, second = metrics.Histogram(), metrics.Histogram()
+        for _ in range(60):
+            first.add(0)
+        for _ in range(40):
+            second.add(10)
+        first.merge(second)
+
+        self.assertEqual(first.count, 100)
+        self.assertEqual(first.percentile(0.5), 0.0)
+        self.assertGreaterEqual(first.percentile(0.95), 10)
+
+
+@override_settings(
+    BLOG_METRICS=True, BLOG_METRICS_SAMPLE_RATE=1.0, BLOG_METRICS_FLUSH_INTERVAL=0
+)
+class PerformanceMiddlewareTests(TestCase):
+    """Tests for PerformanceMiddleware and the metrics reports"""
+
+    def setUp(self):
+        """
+        Set up a post and empty the recorded metrics.
+        """
+
+        cache.clear()
+        metrics.recorder.windows.clear()
+        metrics.recorder.flushed = 0.0
+        self.post = Post.objects.create(title="Measured", body="Body")
+
+
+    def test_records_measured_views(self):
+        """
+        Test that the time, queries, template time and size of a view are recorded.
+        """
+
+        response = self.client.get(reverse("blog_index"))
+        self.client.get(reverse("blog_search"), {"q": "measured"})
+
+        rows = metrics.report()
+        self.assertEqual(list(rows), ["blog_index"])
+        row = rows["blog_index"]
+        self.assertEqual(row["requests"], 1)
+        self.assertGreaterEqual(row["queries"]["p50"], 2)
+        self.assertGreater(row["query_ms"]["p50"], 0)
+        self.assertGreater(row["template_ms"]["p50"], 0)
+        self.assertGreaterEqual(row["wall_ms"]["p50"], row["template_ms"]["p50"] / metrics.BUCKET_RATIO)
+        self.assertGreaterEqual(row["bytes"]["p50"], len(response.content))
+
+
+    @override_settings(BLOG_METRICS_SAMPLE_RATE=0.0)
+    def test_sampled_out_requests_not_recorded(self):
+        """
+        Test that no request is measured with a sample rate of zero.
+        """
+
+        self.client.get(reverse("blog_index"))
+        self.assertEqual(metrics.report(), {})
+
+
+    @override_settings(ROOT_URLCONF="blog.tests.async_urls")
+    async def test_records_async_views(self):
+        """
+        Test that queries run by the async views are counted.
+        """
+
+        await self.async_client.get(reverse("blog_detail", kwargs={"pk": self.post.pk}))
+        row = metrics.report()["blog_detail"]
+        self.assertEqual(row["requests"], 1)
+        self.assertGreaterEqual(row["queries"]["p50"], 2)
+
+
+    @override_settings(ROOT_URLCONF="blog.tests.async_urls")
+    async def test_async_requests_flush_off_the_event_loop(self):
+        """
+        Test that the histograms of async requests are copied to the cache
+        outside the event loop.
+        """
+
+        in_event_loop = []
+        flush = metrics.recorder.flush
+
+        def recording_flush(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                in_event_loop.append(True)
+            except RuntimeError:
+                in_event_loop.append(False)
+            return flush(*args, **kwargs)
+
+        with mock.patch.object(metrics.recorder, "flush", recording_flush):
+            await self.async_client.get(reverse("blog_detail", kwargs={"pk": self.post.pk}))
+        self.assertEqual(in_event_loop, [False])
+        self.assertEqual(metrics.report()["blog_detail"]["requests"], 1)
+
+
+    def test_old_windows_roll_out(self):
+        """
+        Test that values older than the kept windows are dropped.
+        """
+
+        metrics.recorder.record("blog_index", {"wall_ms": 5}, now=0)
+        later = metrics.window_seconds() * metrics.window_count()
+        metrics.recorder.record("blog_index", {"wall_ms": 7}, now=later)
+
+        self.assertEqual(list(metrics.recorder.windows), [later // metrics.window_seconds()])
+        self.assertEqual(metrics.report(now=later)["blog_index"]["requests"], 1)
+
+
+    def test_processes_report_under_their_own_keys(self):
+        """
+        Test that the histograms of every process are reported, and that a
+        process whose key was taken over after expiring claims another.
+        """
+
+        recorders = [metrics.Recorder() for pid in range(3)]
+        for pid, recorder in enumerate(recorders):
+            with mock.patch("blog.metrics.os.getpid", return_value=pid):
+                recorder.record("blog_index", {"wall_ms": 5}, now=0)
+        self.assertEqual([recorder.slot for recorder in recorders], [0, 1, 2])
+        self.assertEqual(metrics.report(now=0)["blog_index"]["requests"], 3)
+
+        cache.delete(metrics.PROCESS_KEY % 0)
+        newcomer = metrics.Recorder()
+        with mock.patch("blog.metrics.os.getpid", return_value=3):
+            newcomer.record("blog_index", {"wall_ms": 5}, now=0)
+        with mock.patch("blog.metrics.os.getpid", return_value=0):
+            recorders[0].flush(now=0)
+        self.assertEqual((newcomer.slot, recorders[0].slot), (0, 3))
+        self.assertEqual(metrics.report(now=0)["blog_index"]["requests"], 4)
+
+
+    def test_metrics_view_for_staff_only(self):
+        """
+        Test that the report view needs a staff user and returns the report as JSON.
+        """
+
+        self.client.get(reverse("blog_index"))
+        url = reverse("blog_metrics")
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        staff = User.objects.create_user("staff", password="secret", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["blog_index"]["requests"], 1)
@@ -1,4 +1,9 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from blog.models import Category, Post, Comment
@@ -28,6 +33,75 @@ class CategoryTest(TestCase):
         self.assertEqual(str(Category._meta.verbose_name_plural), "categories")
 
 
+    def test_category_slug_is_unique(self):
+        """
+        Tests that categories with the same name get different slugs.
+        """
+
+        first = self.create_category(name="Django Tips")
+        second = self.create_category(name="Django Tips")
+        self.assertEqual(first.slug, "django-tips")
+        self.assertEqual(second.slug, "django-tips-2")
+
+
+    def test_category_post_count(self):
+        """
+        Tests that the post count follows posts being added, removed,
+        cleared and deleted, from either side of the relation.
+        """
+
+        category = self.create_category()
+        posts = [Post.objects.create(title=f"Post {i}", body="Body") for i in range(3)]
+
+        def count():
+            return Category.objects.get(pk=category.pk).post_count
+
+        category.posts.add(*posts)
+        self.assertEqual(count(), 3)
+        posts[0].categories.remove(category)
+        self.assertEqual(count(), 2)
+        posts[1].delete()
+        self.assertEqual(count(), 1)
+        posts[2].categories.clear()
+        self.assertEqual(count(), 0)
+
+        posts[0].categories.add(category)
+        category.name = "Renamed"
+        category.post_count = 0
+        category.save()
+        self.assertEqual(count(), 1)
+        category.posts.clear()
+        self.assertEqual(count(), 0)
+
+
+    def test_category_post_count_kept_without_counting(self):
+        """
+        Tests that adding and removing posts changes the stored count
+        without counting the posts, and that removing posts that aren't
+        in the category leaves it alone.
+        """
+
+        category = self.create_category()
+        other = self.create_category(name="Other")
+        posts = [Post.objects.create(title=f"Post {i}", body="Body") for i in range(3)]
+
+        def count():
+            return Category.objects.get(pk=category.pk).post_count
+
+        with CaptureQueriesContext(connection) as queries:
+            category.posts.add(*posts[:2])
+            posts[2].categories.add(category, other)
+        updates = [q["sql"] for q in queries if q["sql"].startswith('UPDATE "blog_category"')]
+        self.assertEqual(len(updates), 2)
+        self.assertFalse([sql for sql in updates if "COUNT(" in sql])
+        self.assertEqual(count(), 3)
+
+        posts[0].categories.remove(category, other)
+        category.posts.remove(posts[0], posts[1])
+        self.assertEqual(count(), 1)
+        self.assertEqual(Category.objects.get(pk=other.pk).post_count, 1)
+
+
 class PostTest(TestCase):
     """Tests for the Post model"""
 
@@ -63,6 +137,64 @@ class PostTest(TestCase):
         self.assertIn(category2, post.categories.all())
 
 
+    def test_post_excerpt_follows_body(self):
+        """
+        Tests that the stored excerpt is the beginning of the body and is
+        updated when the body changes.
+        """
+
+        post = self.create_post(body="a" * 1000)
+        self.assertEqual(post.excerpt, "a" * Post.EXCERPT_LENGTH)
+        post.body = "short body"
+        post.save(update_fields=["body"])
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, "short body")
+
+
+    def test_post_body_html_is_rendered_on_save(self):
+        """
+        Tests that plain text and Markdown bodies are stored as HTML and that
+        Markdown is sanitized.
+        """
+
+        post = self.create_post(body="first line\nsecond <line>")
+        self.assertEqual(post.body_html, "<p>first line<br>second &lt;line&gt;</p>")
+
+        post.body_format = "markdown"
+        post.body = "# Title\n\nSome **bold** text <script>alert(1)</script>"
+        post.save()
+        self.assertIn("<h1>Title</h1>", post.body_html)
+        self.assertIn("<strong>bold</strong>", post.body_html)
+        self.assertNotIn("<script>", post.body_html)
+        self.assertTrue(post.excerpt.startswith("Title"))
+
+
+    def test_post_body_html_is_not_rendered_when_body_is_unchanged(self):
+        """
+        Tests that saving a post without changing the body keeps the stored HTML.
+        """
+
+        post = self.create_post()
+        Post.objects.filter(pk=post.pk).update(body_html="<p>stored</p>")
+        post = Post.objects.get(pk=post.pk)
+        post.title = "new title"
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.body_html, "<p>stored</p>")
+
+
+    def test_render_posts_command(self):
+        """
+        Tests that the render_posts command renders the stored HTML again.
+        """
+
+        post = self.create_post()
+        Post.objects.filter(pk=post.pk).update(body_html="<p>outdated</p>")
+        call_command("render_posts", stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.body_html, "<p>test body</p>")
+
+
 class CommentTest(TestCase):
     """Tests for the Comment model"""
 
@@ -105,6 +237,23 @@ class CommentTest(TestCase):
         self.assertEqual(Comment.objects.filter(id=comment.id).count(), 0)
 
 
+    def test_comment_count_follows_comments(self):
+        """
+        Tests that the post's comment_count is updated when comments are
+        created and deleted.
+        """
+
+        post = Post.objects.create(title="test post", body="test body")
+        first = self.create_comment(post=post)
+        self.create_comment(post=post)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+
+        first.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+
     def test_comment_creation(self):
         """
         Creates a Comment object and tests whether the created 
@@ -0,0 +1,147 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import Comment, PendingComment, Post, PostQuerySet
+from blog.outbox import drain_batch, publish
+
+
+@override_settings(BLOG_COMMENT_QUEUE=True)
+class CommentQueueTests(TestCase):
+    """Tests for the comment outbox and the drain_comments command"""
+
+    def setUp(self):
+        """
+        Set up two posts, one of them with an existing comment.
+        """
+
+        self.post = Post.objects.create(title="Busy post", body="Body")
+        self.other = Post.objects.create(title="Quiet post", body="Body")
+        Comment.objects.create(author="Early", body="First", post=self.post)
+        self.post.refresh_from_db()
+
+
+    def queue(self, post, body, minutes_ago=0):
+        return PendingComment.objects.create(
+            author="Reader", body=body, post=post,
+            received_on=timezone.now() - timedelta(minutes=minutes_ago),
+        )
+
+
+    def test_post_comment_goes_to_outbox(self):
+        """
+        Test that a posted comment is only stored in the outbox and the user is redirected.
+        """
+
+        url = reverse("blog_detail", kwargs={"pk": self.post.pk})
+        response = self.client.post(url, {"author": "New", "body": "Queued"})
+
+        self.assertRedirects(response, url)
+        self.assertEqual(PendingComment.objects.get().body, "Queued")
+        self.assertFalse(Comment.objects.filter(body="Queued").exists())
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comment_count, 1)
+
+
+    def test_drain_keeps_order_and_times(self):
+        """
+        Test that drained comments keep the order and the time they were received in.
+        """
+
+        queued = [self.queue(self.post, f"Comment {i}", minutes_ago=10 - i) for i in range(3)]
+        self.queue(self.other, "Elsewhere")
+
+        call_command("drain_comments", "--batch-size", "2", stdout=StringIO())
+
+        comments = Comment.objects.filter(post=self.post).order_by("created_on", "id")
+        self.assertEqual(
+            [comment.body for comment in comments], ["Comment 0", "Comment 1", "Comment 2", "First"]
+        )
+        self.assertEqual(comments[0].created_on, queued[0].received_on)
+        self.assertFalse(PendingComment.objects.exists())
+
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.comment_count, 4)
+        self.assertGreater(post.last_modified, self.post.last_modified)
+        self.assertEqual(Post.objects.get(pk=self.other.pk).comment_count, 1)
+
+
+    def test_drain_batch_takes_oldest_first(self):
+        """
+        Test that a batch moves the comments that were queued first.
+        """
+
+        for i in range(3):
+            self.queue(self.post, f"Comment {i}")
+
+        self.assertEqual(drain_batch(2), 2)
+        self.assertEqual(
+            list(PendingComment.objects.values_list("body", flat=True)), ["Comment 2"]
+        )
+        self.assertEqual(drain_batch(2), 1)
+        self.assertEqual(drain_batch(2), 0)
+
+
+    def test_failed_drain_keeps_comments_queued(self):
+        """
+        Test that a drain that fails part way leaves the outbox untouched and
+        writes nothing, so the comments are moved by the next drain.
+        """
+
+        self.queue(self.post, "Survivor")
+
+        with mock.patch.object(
+            PostQuerySet, "update_comment_counts", side_effect=DatabaseError("disk full")
+        ):
+            with self.assertRaises(DatabaseError):
+                drain_batch(10)
+
+        self.assertEqual(PendingComment.objects.count(), 1)
+        self.assertFalse(Comment.objects.filter(body="Survivor").exists())
+
+        self.assertEqual(drain_batch(10), 1)
+        self.assertTrue(Comment.objects.filter(body="Survivor").exists())
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comment_count, 2)
+
+
+    def test_deleting_post_drops_its_queued_comments(self):
+        """
+        Test that queued comments of a deleted post are removed with it.
+        """
+
+        self.queue(self.other, "Orphan")
+        self.other.delete()
+
+        self.assertEqual(drain_batch(10), 0)
+
+
+    def test_publish_leaves_timestamps_of_others_alone(self):
+        """
+        Test that comments and posts saved while comments are published get
+        their timestamps as usual.
+        """
+
+        pending = [self.queue(self.post, "Queued", minutes_ago=30)]
+        insert = Comment.objects.bulk_create
+        saved = []
+
+        def insert_and_save_others(*args, **kwargs):
+            # What another thread could do while the comments are inserted
+            created = insert(*args, **kwargs)
+            saved.append(Comment.objects.create(author="Other", body="Meanwhile", post=self.other))
+            self.other.save()
+            return created
+
+        before = Post.objects.get(pk=self.other.pk).last_modified
+        with mock.patch.object(Comment.objects, "bulk_create", side_effect=insert_and_save_others):
+            publish(pending)
+
+        self.assertIsNotNone(saved[0].created_on)
+        self.assertGreater(Post.objects.get(pk=self.other.pk).last_modified, before)
+        published = Comment.objects.get(body="Queued")
+        self.assertEqual(published.created_on, pending[0].received_on)
@@ -0,0 +1,114 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from blog.cache import category_nav
+from blog.models import Category, Comment, Post
+
+
+class QueryCountTests(TestCase):
+    """
+    Regression tests for the number of queries run by the blog views.
+    The counts must not depend on how many posts, categories or
+    comments exist. The category navigation is served from the cache.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def create_posts(self, count, categories_per_post=3, comments_per_post=3, category=None):
+        category = category or Category.objects.create(name="Shared")
+        for i in range(count):
+            post = Post.objects.create(title=f"Post {i}", body=f"Body {i}")
+            extra = [
+                Category.objects.create(name=f"Category {i}-{j}")
+                for j in range(categories_per_post - 1)
+            ]
+            post.categories.add(category, *extra)
+            for j in range(comments_per_post):
+                Comment.objects.create(author=f"Author {j}", body=f"Comment {j}", post=post)
+        category_nav()
+        return category
+
+
+    def test_blog_index_query_count(self):
+        """
+        Test that blog_index uses the same number of queries for one and many posts.
+        """
+
+        self.create_posts(1)
+        with self.assertNumQueries(3):
+            self.client.get(reverse("blog_index"))
+
+        self.create_posts(9, categories_per_post=5)
+        with self.assertNumQueries(3):
+            self.client.get(reverse("blog_index"))
+
+
+    def test_blog_category_query_count(self):
+        """
+        Test that blog_category uses the same number of queries for one and many posts.
+        """
+
+        category = self.create_posts(1)
+        url = reverse("blog_category", kwargs={"slug": category.slug})
+        with self.assertNumQueries(5):
+            self.client.get(url)
+
+        self.create_posts(9, categories_per_post=5, category=category)
+        with self.assertNumQueries(5):
+            self.client.get(url)
+
+
+    def test_blog_detail_query_count(self):
+        """
+        Test that blog_detail uses the same number of queries for few and many
+        categories, comments and related posts.
+        """
+
+        self.create_posts(1, categories_per_post=1, comments_per_post=1)
+        post = Post.objects.get()
+        url = reverse("blog_detail", kwargs={"pk": post.pk})
+        with self.assertNumQueries(5):
+            self.client.get(url)
+
+        post.categories.add(*[Category.objects.create(name=f"Extra {i}") for i in range(5)])
+        for i in range(20):
+            Comment.objects.create(author="Reader", body=f"Extra {i}", post=post)
+        self.create_posts(5, categories_per_post=2, category=Category.objects.get(name="Extra 0"))
+        with self.assertNumQueries(5):
+            self.client.get(url)
+
+
+    # The page cache would serve the whole page
+    @override_settings(BLOG_PAGE_CACHE=False)
+    def test_blog_detail_cached_fragments_query_count(self):
+        """
+        Test that blog_detail skips the category and comment queries when
+        the fragments are cached. The related posts aren't cached.
+        """
+
+        self.create_posts(1)
+        url = reverse("blog_detail", kwargs={"pk": Post.objects.get().pk})
+        self.client.get(url)
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+
+    def test_category_nav_query_count(self):
+        """
+        Test that the category navigation costs one query when it isn't cached
+        and none when it is.
+        """
+
+        self.create_posts(3)
+        url = reverse("blog_index")
+        cache.clear()
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertContains(response, "Shared (3)")
+
+        cache.clear()
+        category_nav()
+        with self.assertNumQueries(3):
+            self.client.get(url)
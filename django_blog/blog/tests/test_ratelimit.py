@@ -0,0 +1,122 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blog.models import Comment, Post
+from blog.ratelimit import client_ip, take_tokens
+
+
+@override_settings(
+    BLOG_COMMENT_RATE_PER_IP=(2, 60),
+    BLOG_COMMENT_RATE_PER_POST=(3, 60),
+    BLOG_COMMENT_DUPLICATE_WINDOW=600,
+)
+class CommentRateLimitTests(TestCase):
+    """Tests for the rate limiting and duplicate detection of comments"""
+
+    def setUp(self):
+        """
+        Set up a post and clear the buckets kept in the cache.
+        """
+
+        cache.clear()
+        self.post = Post.objects.create(title="Popular", body="Body")
+        self.url = reverse("blog_detail", kwargs={"pk": self.post.pk})
+
+
+    def comment(self, body, author="Reader", ip="10.0.0.1"):
+        return self.client.post(
+            self.url, {"author": author, "body": body}, REMOTE_ADDR=ip
+        )
+
+
+    def test_too_many_comments_from_one_address(self):
+        """
+        Test that an address is turned away with 429 once its bucket is empty,
+        without writing anything to the database.
+        """
+
+        self.assertEqual(self.comment("One").status_code, 302)
+        self.assertEqual(self.comment("Two").status_code, 302)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.comment("Three")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+        self.assertContains(response, "posting comments too quickly", status_code=429)
+        self.assertContains(response, "Three", status_code=429)
+        self.assertTrue(all(query["sql"].startswith("SELECT") for query in queries))
+        self.assertEqual(Comment.objects.count(), 2)
+
+        self.assertEqual(self.comment("Three", ip="10.0.0.2").status_code, 302)
+
+
+    def test_too_many_comments_on_one_post(self):
+        """
+        Test that a post only takes so many comments, whatever the address.
+        """
+
+        for number in range(3):
+            self.assertEqual(self.comment(f"Comment {number}", ip=f"10.0.1.{number}").status_code, 302)
+
+        self.assertEqual(self.comment("Too many", ip="10.0.1.9").status_code, 429)
+
+        other = Post.objects.create(title="Quiet", body="Body")
+        response = self.client.post(
+            reverse("blog_detail", kwargs={"pk": other.pk}),
+            {"author": "Reader", "body": "Too many"}, REMOTE_ADDR="10.0.1.9",
+        )
+        self.assertEqual(response.status_code, 302)
+
+
+    def test_duplicate_comment_rejected(self):
+        """
+        Test that the same comment is only accepted once within the window.
+        """
+
+        self.assertEqual(self.comment("Buy now", ip="10.0.2.1").status_code, 302)
+        response = self.comment(" Buy now ", ip="10.0.2.2")
+        self.assertEqual(response.status_code, 429)
+        self.assertContains(response, "already been posted", status_code=429)
+        self.assertEqual(self.comment("Buy now", author="Other", ip="10.0.2.3").status_code, 302)
+        self.assertEqual(Comment.objects.count(), 2)
+
+
+    def test_invalid_comment_takes_no_token(self):
+        """
+        Test that invalid forms are not counted.
+        """
+
+        for _ in range(3):
+            self.assertEqual(self.comment("").status_code, 200)
+        self.assertEqual(self.comment("Valid").status_code, 302)
+
+
+    def test_buckets_refill_over_time(self):
+        """
+        Test that tokens come back at the configured rate and that no token
+        is taken unless every bucket has one.
+        """
+
+        rates = {"ip": (2, 60), "post": (10, 60)}
+        states, wait = take_tokens({"ip": (0.5, 100.0)}, rates, 100.0)
+        self.assertIsNone(states)
+        self.assertEqual(wait, 15)
+
+        states, wait = take_tokens({"ip": (0.5, 100.0)}, rates, 115.0)
+        self.assertEqual(wait, 0)
+        self.assertEqual(states, {"ip": (0.0, 115.0), "post": (9, 115.0)})
+
+
+    @override_settings(BLOG_CLIENT_IP_HEADER="HTTP_X_FORWARDED_FOR")
+    def test_client_ip_from_proxy_header(self):
+        """
+        Test that the address added by the proxy is used when configured.
+        """
+
+        request = RequestFactory().post(
+            "/", REMOTE_ADDR="127.0.0.1", HTTP_X_FORWARDED_FOR="1.2.3.4, 5.6.7.8"
+        )
+        self.assertEqual(client_ip(request), "5.6.7.8")
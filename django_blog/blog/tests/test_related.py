@@ -0,0 +1,219 @@
+import random
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import Category, Post, RelatedPost
+from blog.related import rebuild_related
+
+
+@override_settings(BLOG_RELATED_POSTS=2)
+class RelatedPostTests(TestCase):
+    """Tests for the precomputed related posts"""
+
+    def setUp(self):
+        """
+        Set up three categories and four posts, the newest last.
+        """
+
+        cache.clear()
+        self.python, self.django, self.travel = [
+            Category.objects.create(name=name) for name in ("Python", "Django", "Travel")
+        ]
+        self.first = Post.objects.create(title="First", body="Body")
+        self.second = Post.objects.create(title="Second", body="Body")
+        self.third = Post.objects.create(title="Third", body="Body")
+        self.trip = Post.objects.create(title="Trip", body="Body")
+        self.first.categories.add(self.python, self.django)
+        self.second.categories.add(self.python, self.django)
+        self.third.categories.add(self.python)
+        self.trip.categories.add(self.travel)
+
+
+    def related(self, post):
+        rows = RelatedPost.objects.filter(post=post).order_by("position")
+        return list(rows.values_list("related__title", flat=True))
+
+
+    def assertUpToDate(self):
+        # What the signal handlers kept up to date must match a rebuild
+        total, changed = rebuild_related()
+        self.assertEqual(total, Post.objects.count())
+        self.assertEqual(changed, 0)
+
+
+    def test_ranked_by_shared_categories_then_newest(self):
+        """
+        Test that posts sharing more categories come first, then newer ones,
+        and only the configured number is kept.
+        """
+
+        self.assertEqual(self.related(self.first), ["Second", "Third"])
+        self.assertEqual(self.related(self.third), ["Second", "First"])
+        self.assertEqual(self.related(self.trip), [])
+        self.assertUpToDate()
+
+
+    def test_maintained_when_categories_change(self):
+        """
+        Test that adding and removing categories, on either side, updates
+        the lists of the other posts as well.
+        """
+
+        self.second.categories.remove(self.django)
+        self.assertEqual(self.related(self.first), ["Third", "Second"])
+        self.assertUpToDate()
+
+        self.trip.categories.add(self.python, self.django)
+        self.assertEqual(self.related(self.first), ["Trip", "Third"])
+        self.assertEqual(self.related(self.trip), ["First", "Third"])
+        self.assertUpToDate()
+
+        self.django.posts.clear()
+        self.assertEqual(self.related(self.first), ["Trip", "Third"])
+        self.python.posts.remove(self.trip)
+        self.assertEqual(self.related(self.trip), [])
+        self.assertEqual(self.related(self.first), ["Third", "Second"])
+        self.assertUpToDate()
+
+
+    @override_settings(BLOG_RELATED_CANDIDATES=1)
+    def test_candidates_are_the_posts_next_to_a_post(self):
+        """
+        Test that only the posts next to a post in its categories are
+        candidates, and that a new post changes the candidates of the posts
+        it is placed next to.
+        """
+
+        # The posts were set up with the default number of candidates
+        rebuild_related()
+        self.assertEqual(self.related(self.first), ["Second"])
+        self.assertEqual(self.related(self.third), ["Second"])
+
+        self.trip.categories.add(self.python)
+        self.assertEqual(self.related(self.first), ["Second"])
+        self.assertEqual(self.related(self.second), ["First", "Third"])
+        self.assertEqual(self.related(self.third), ["Trip", "Second"])
+        self.assertEqual(self.related(self.trip), ["Third"])
+        self.assertUpToDate()
+
+
+    @override_settings(BLOG_RELATED_CANDIDATES=2)
+    def test_new_post_only_changes_posts_next_to_it(self):
+        """
+        Test that adding a post to a big category ranks and changes only the
+        lists of the posts next to it.
+        """
+
+        posts = [Post.objects.create(title=f"Travel {i}", body="Body") for i in range(20)]
+        self.travel.posts.add(*posts)
+        before = dict(Post.objects.values_list("pk", "last_modified"))
+
+        new = Post.objects.create(title="Newest", body="Body")
+        with CaptureQueriesContext(connection) as queries:
+            new.categories.add(self.travel)
+
+        changed = {
+            pk for pk, last_modified in Post.objects.values_list("pk", "last_modified")
+            if before.get(pk) != last_modified
+        }
+        self.assertEqual(changed, {new.pk, posts[-1].pk, posts[-2].pk})
+        self.assertLess(len(queries), 20)
+        self.assertUpToDate()
+
+
+    @override_settings(BLOG_RELATED_CANDIDATES=2)
+    def test_random_changes_match_a_rebuild(self):
+        """
+        Test that the lists kept up to date through any sequence of changes
+        are the ones a rebuild ranks.
+        """
+
+        rebuild_related()
+        rng = random.Random(7)
+        categories = [self.python, self.django, self.travel]
+        posts = [self.first, self.second, self.third, self.trip]
+        for step in range(40):
+            action = rng.choice(["add", "remove", "create", "delete"])
+            post = rng.choice(posts)
+            if action == "add":
+                post.categories.add(*rng.sample(categories, 2))
+            elif action == "remove":
+                rng.choice(categories).posts.remove(post)
+            elif action == "create":
+                posts.append(Post.objects.create(title=f"Post {step}", body="Body"))
+                posts[-1].categories.add(rng.choice(categories))
+            elif len(posts) > 2:
+                posts.remove(post)
+                post.delete()
+            with self.subTest(step=step, action=action):
+                self.assertUpToDate()
+
+
+    def test_deletes_refill_the_lists(self):
+        """
+        Test that deleting a post or a category ranks the affected lists again.
+        """
+
+        self.second.delete()
+        self.assertEqual(self.related(self.first), ["Third"])
+        self.assertUpToDate()
+
+        self.python.delete()
+        self.assertEqual(self.related(self.first), [])
+        self.assertEqual(self.related(self.third), [])
+        self.assertUpToDate()
+
+
+    def test_detail_page_shows_related_posts(self):
+        """
+        Test that the post page links the related posts and changes with them.
+        """
+
+        url = reverse("blog_detail", kwargs={"pk": self.first.pk})
+        response = self.client.get(url)
+        self.assertContains(response, reverse("blog_detail", kwargs={"pk": self.second.pk}))
+        self.assertNotContains(response, "Trip")
+
+        self.trip.categories.add(self.python, self.django)
+        response = self.client.get(url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Trip")
+
+        # Renaming a related post changes the page, whichever validator is
+        # sent. Last-Modified only has whole seconds, so the rename is later.
+        Post.objects.filter(pk=self.trip.pk).update(
+            title="Renamed trip", last_modified=timezone.now() + timedelta(seconds=2)
+        )
+        for headers in (
+            {"if-none-match": response["ETag"]},
+            {"if-modified-since": response["Last-Modified"]},
+        ):
+            renamed = self.client.get(url, headers=headers)
+            self.assertEqual(renamed.status_code, 200)
+            self.assertContains(renamed, "Renamed trip")
+
+
+    def test_rebuild_command(self):
+        """
+        Test that the command fills in the related posts of categories written
+        in bulk, without signals.
+        """
+
+        RelatedPost.objects.all().delete()
+        Post.categories.through.objects.bulk_create([
+            Post.categories.through(post=self.trip, category=self.python),
+        ])
+
+        out = StringIO()
+        call_command("rebuild_related_posts", "--batch-size", "3", stdout=out)
+        self.assertIn("Ranked the related posts of 4 posts, 4 changed", out.getvalue())
+        self.assertEqual(self.related(self.first), ["Second", "Trip"])
+        self.assertEqual(self.related(self.trip), ["Third", "Second"])
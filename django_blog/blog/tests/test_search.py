@@ -0,0 +1,123 @@
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.signals import post_migrate
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from blog.models import Post
+from blog.search import fts_available
+
+
+class SearchViewTests(TestCase):
+    """Tests for the blog_search view and the full-text search index"""
+
+    def setUp(self):
+        """
+        Set up posts that match the search words in the title or the body.
+        """
+
+        self.in_title = Post.objects.create(title="Python tips", body="Short post")
+        self.in_body = Post.objects.create(
+            title="Weekly notes", body="This week I learned some python <tricks>."
+        )
+        self.other = Post.objects.create(title="Cooking", body="Pasta recipe")
+
+
+    def search(self, query, **params):
+        return self.client.get(reverse("blog_search"), {"q": query, **params})
+
+
+    def test_search_ranks_title_matches_first(self):
+        """
+        Test that matching posts are returned, title matches ranked first.
+        """
+
+        response = self.search("python")
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "blog/search.html")
+        self.assertEqual(response.context["posts"], [self.in_title, self.in_body])
+
+
+    def test_search_highlights_and_escapes_matches(self):
+        """
+        Test that the matched words are highlighted and the post text is escaped.
+        """
+
+        response = self.search("python")
+        self.assertContains(response, "<mark>Python</mark> tips")
+        self.assertContains(response, "<mark>python</mark> &lt;tricks&gt;")
+
+
+    def test_search_index_follows_post_changes(self):
+        """
+        Test that updated and deleted posts are reflected in the results.
+        """
+
+        self.other.body = "Pasta with python sauce"
+        self.other.save()
+        self.assertIn(self.other, self.search("python").context["posts"])
+
+        self.in_title.delete()
+        self.assertNotIn(self.in_title, self.search("python").context["posts"])
+
+
+    def test_search_ignores_query_syntax(self):
+        """
+        Test that FTS5 operators in the query are treated as plain words.
+        """
+
+        response = self.search('python" OR (NEAR')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["posts"], [])
+        self.assertEqual(self.search("").context["posts"], [])
+
+
+    @override_settings(BLOG_PAGE_SIZE=1)
+    def test_search_pagination(self):
+        """
+        Test that the results are split into numbered pages.
+        """
+
+        first = self.search("python")
+        second = self.search("python", page=2)
+        self.assertEqual(first.context["posts"], [self.in_title])
+        self.assertTrue(first.context["has_next"])
+        self.assertEqual(second.context["posts"], [self.in_body])
+        self.assertFalse(second.context["has_next"])
+
+
+    def test_rebuild_search_index_command(self):
+        """
+        Test that the command reindexes posts written behind the triggers' back.
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO blog_post_fts(blog_post_fts) VALUES ('delete-all')")
+        self.assertEqual(self.search("python").context["posts"], [])
+
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(len(self.search("python").context["posts"]), 2)
+
+
+    def test_triggers_reinstalled_after_migrate(self):
+        """
+        Test that the triggers dropped by a table rebuild are installed
+        again after migrate, and the posts changed meanwhile are indexed.
+        """
+
+        self.assertTrue(fts_available())
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER blog_post_fts_update")
+        Post.objects.filter(pk=self.other.pk).update(body="Python pasta")
+        self.assertEqual(len(self.search("python").context["posts"]), 2)
+
+        post_migrate.send(
+            sender=apps.get_app_config("blog"), app_config=apps.get_app_config("blog"),
+            verbosity=0, interactive=False, using=connection.alias,
+        )
+        self.assertEqual(len(self.search("python").context["posts"]), 3)
+        Post.objects.filter(pk=self.in_title.pk).update(title="Tips")
+        self.assertEqual(len(self.search("python").context["posts"]), 2)
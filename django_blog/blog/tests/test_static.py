@@ -0,0 +1,119 @@
+import gzip
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+import brotli
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from blog.models import Post
+
+
+class ResponseCompressionTests(TestCase):
+    """Tests for the compression of the pages"""
+
+    def setUp(self):
+        """
+        Set up a post long enough to be worth compressing.
+        """
+
+        Post.objects.create(title="Compressed", body="Some words to repeat. " * 100)
+
+
+    def test_pages_are_gzipped_for_clients_that_accept_it(self):
+        """
+        Test that pages are gzipped when the client accepts gzip, and that
+        the compressed response still validates the conditional request.
+        """
+
+        plain = self.client.get(reverse("blog_index"))
+        self.assertFalse(plain.has_header("Content-Encoding"))
+
+        response = self.client.get(reverse("blog_index"), headers={"accept-encoding": "gzip, br"})
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        response = self.client.get(
+            reverse("blog_index"),
+            headers={"accept-encoding": "gzip", "if-none-match": response["ETag"]},
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class StaticFilesTests(TestCase):
+    """Tests for the collected static files and how they are served"""
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Collect the static files into a temporary directory.
+        """
+
+        super().setUpClass()
+        cls.static_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.static_root)
+        cls.enterClassContext(override_settings(STATIC_ROOT=cls.static_root))
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+
+    def test_collected_files_are_hashed_and_compressed(self):
+        """
+        Test that collectstatic writes a manifest of hashed names and
+        compressed copies of the text files.
+        """
+
+        with open(Path(self.static_root, "staticfiles.json")) as file:
+            manifest = json.load(file)["paths"]
+        hashed = manifest["admin/css/base.css"]
+        self.assertNotEqual(hashed, "admin/css/base.css")
+        self.assertEqual(static("admin/css/base.css"), "/static/" + hashed)
+
+        path = Path(self.static_root, hashed)
+        with open(path, "rb") as file:
+            content = file.read()
+        with open(f"{path}.gz", "rb") as file:
+            self.assertEqual(gzip.decompress(file.read()), content)
+        with open(f"{path}.br", "rb") as file:
+            self.assertEqual(brotli.decompress(file.read()), content)
+
+
+    def test_hashed_files_are_cached_for_years(self):
+        """
+        Test that a hashed file is served compressed with far-future cache
+        headers, and a file without a hash only briefly.
+        """
+
+        url = static("admin/css/base.css")
+        response = self.client.get(url, headers={"accept-encoding": "gzip, br"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(response["Cache-Control"], "max-age=315360000, public, immutable")
+
+        response = self.client.get("/static/admin/css/base.css")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["Cache-Control"], "max-age=60, public")
+
+
+    async def test_served_to_async_views(self):
+        """
+        Test that static files are served when the middleware runs
+        asynchronously, and other requests get through to the views.
+        """
+
+        response = await self.async_client.get(
+            static("admin/css/base.css"), headers={"accept-encoding": "gzip"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        content = b"".join(response.streaming_content)
+        self.assertIn(b"body", gzip.decompress(content))
+
+        response = await self.async_client.get("/static/missing.css")
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from blog.models import Category, Comment, Post
+from blog.static_site import build_site
+
+
+@override_settings(BLOG_PAGE_SIZE=2, BLOG_COMMENTS_PAGE_SIZE=2)
+class StaticSiteTests(TestCase):
+    """Tests for the build_static_site command"""
+
+    def setUp(self):
+        """
+        Set up three posts in a category, three comments on the newest post
+        and an empty output directory.
+        """
+
+        cache.clear()
+        self.category = Category.objects.create(name="Static")
+        self.posts = [Post.objects.create(title=f"Post {i}", body=f"Body {i}") for i in range(3)]
+        self.category.posts.add(*self.posts)
+        self.post = self.posts[-1]
+        for i in range(3):
+            Comment.objects.create(author="Reader", body=f"Comment {i}", post=self.post)
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+
+
+    def read(self, path):
+        with open(os.path.join(self.output, path, "index.html")) as file:
+            return file.read()
+
+
+    def test_build_renders_every_page(self):
+        """
+        Test that all pages are written, linking to each other's files.
+        """
+
+        call_command("build_static_site", self.output, "--workers", "1", stdout=StringIO())
+
+        front = self.read("")
+        self.assertIn("Post 2", front)
+        self.assertIn('href="/page/2/"', front)
+        second = self.read("page/2")
+        self.assertIn("Post 0", second)
+        self.assertIn('href="/"', second)
+        self.assertIn('href="/category/static/page/2/"', self.read("category/static"))
+
+        detail = self.read(f"post/{self.post.pk}")
+        self.assertIn("Comment 1", detail)
+        self.assertIn(f'href="/post/{self.post.pk}/page/2/#comments"', detail)
+        self.assertNotIn("<form method=\"post\">", detail)
+        self.assertIn("Comment 2", self.read(f"post/{self.post.pk}/page/2"))
+
+
+    def test_static_pages_stay_out_of_the_caches(self):
+        """
+        Test that the site still serves its own links after a build.
+        """
+
+        self.client.get("/")
+        self.client.get(f"/post/{self.post.pk}/")
+        build_site(self.output)
+
+        self.assertContains(self.client.get("/"), "?after=")
+        response = self.client.get(f"/post/{self.post.pk}/")
+        self.assertContains(response, "?comments=")
+        self.assertContains(response, "<form method=\"post\">")
+
+
+    def test_rebuild_only_renders_changed_posts(self):
+        """
+        Test that a second build only renders new and changed posts and
+        removes the pages of deleted posts, unless the category navigation
+        has changed.
+        """
+
+        self.assertEqual(build_site(self.output), (3, 0))
+        self.assertEqual(build_site(self.output), (0, 0))
+
+        Comment.objects.create(author="Late", body="Comment 3", post=self.posts[0])
+        self.assertEqual(build_site(self.output), (1, 0))
+        self.assertIn("Comment 3", self.read(f"post/{self.posts[0].pk}"))
+
+        new = Post.objects.create(title="Post 3", body="Body 3")
+        deleted = self.posts[1]
+        deleted.delete()
+
+        # The category lost a post, which changes the navigation on every page
+        self.assertEqual(build_site(self.output), (3, 1))
+        self.assertIn("Post 3", self.read(f"post/{new.pk}"))
+        self.assertFalse(os.path.exists(os.path.join(self.output, "post", str(deleted.pk))))
+
+        # The category now fits on one page
+        self.assertFalse(os.path.exists(os.path.join(self.output, "category/static/page/2/index.html")))
+
+        self.assertEqual(build_site(self.output, full=True), (3, 0))
+
+
+    def test_rebuild_renders_posts_showing_a_renamed_post(self):
+        """
+        Test that renaming a post renders again the pages that show it
+        among their related posts.
+        """
+
+        build_site(self.output)
+        self.assertIn("Post 0", self.read(f"post/{self.post.pk}"))
+
+        renamed = Post.objects.get(pk=self.posts[0].pk)
+        renamed.title = "Renamed post"
+        renamed.save()
+        self.assertEqual(build_site(self.output), (3, 0))
+        page = self.read(f"post/{self.post.pk}")
+        self.assertIn("Renamed post", page)
+        self.assertNotIn("Post 0", page)
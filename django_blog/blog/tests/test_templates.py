@@ -0,0 +1,151 @@
+import re
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template import engines
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from blog import metrics
+from blog.benchmarks import template_engines
+from blog.models import Category, Comment, Post, RelatedPost
+
+
+def normalized(html):
+    # The CSRF token changes with every response
+    html = re.sub(r'name="csrfmiddlewaretoken" value="[^"]*"', 'name="csrfmiddlewaretoken"', html)
+    return re.sub(r">\s+<", "><", re.sub(r"\s+", " ", html)).strip()
+
+
+class TemplateLoaderTests(SimpleTestCase):
+    """Tests for the template engine configuration"""
+
+    def test_django_templates_are_cached(self):
+        """
+        Test that the Django templates are loaded through the cached loader.
+        """
+
+        loaders = engines["metrics"].engine.template_loaders
+        self.assertEqual(
+            [type(loader).__module__ for loader in loaders], ["django.template.loaders.cached"]
+        )
+        template = engines["metrics"].get_template("blog/index.html")
+        self.assertIs(
+            engines["metrics"].get_template("blog/index.html").template, template.template
+        )
+
+
+@override_settings(BLOG_PAGE_CACHE=False, BLOG_RELATED_POSTS=2)
+class Jinja2TemplateTests(TestCase):
+    """Tests for the Jinja2 versions of the blog pages"""
+
+    def setUp(self):
+        """
+        Set up two posts in a category, one in Markdown with comments.
+        """
+
+        cache.clear()
+        self.category = Category.objects.create(name="Python & Django")
+        self.post = Post.objects.create(
+            title="Templates <fast>", body="# Title\n\nSome *text*", body_format="markdown"
+        )
+        self.other = Post.objects.create(title="Other", body="First line\nsecond line")
+        self.post.categories.add(self.category)
+        self.other.categories.add(self.category)
+        for i in range(3):
+            Comment.objects.create(author="Reader", body=f"Comment <{i}>\nline", post=self.post)
+        self.assertTrue(RelatedPost.objects.filter(post=self.post).exists())
+        self.engines = template_engines()
+
+
+    def render(self, engine, path):
+        cache.clear()
+        with override_settings(TEMPLATES=self.engines[engine]):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+
+    def test_same_html_as_django_templates(self):
+        """
+        Test that the index, category and post pages render the same HTML
+        with both engines.
+        """
+
+        paths = [
+            reverse("blog_index"),
+            reverse("blog_category", kwargs={"slug": self.category.slug}),
+            reverse("blog_detail", kwargs={"pk": self.post.pk}),
+            reverse("blog_detail", kwargs={"pk": self.other.pk}),
+            reverse("blog_index") + "?q=templates",
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                django_html = self.render("django", path)
+                jinja2_html = self.render("jinja2", path)
+                self.assertEqual(normalized(jinja2_html), normalized(django_html))
+                self.assertNotIn("&amp;lt;", jinja2_html)
+
+
+    @override_settings(BLOG_PAGE_SIZE=1)
+    def test_next_page_link(self):
+        """
+        Test that the listings link the next page like the Django templates.
+        """
+
+        path = reverse("blog_index")
+        django_html = self.render("django", path)
+        self.assertIn("?after=", django_html)
+        self.assertEqual(normalized(self.render("jinja2", path)), normalized(django_html))
+
+
+    def test_fragments_shared_between_engines(self):
+        """
+        Test that the fragments cached by one engine are used by the other
+        and dropped when the post changes.
+        """
+
+        path = reverse("blog_detail", kwargs={"pk": self.post.pk})
+        with override_settings(TEMPLATES=self.engines["jinja2"]):
+            self.client.get(path)
+            Comment.objects.filter(post=self.post).update(body="Changed behind its back")
+            self.assertNotContains(self.client.get(path), "Changed behind its back")
+        with override_settings(TEMPLATES=self.engines["django"]):
+            self.assertNotContains(self.client.get(path), "Changed behind its back")
+
+            post = Post.objects.get(pk=self.post.pk)
+            post.save()
+            self.assertContains(self.client.get(path), "Changed behind its back")
+
+
+    def test_render_time_is_measured(self):
+        """
+        Test that rendering a Jinja2 template adds to the template time of
+        the request metrics.
+        """
+
+        measured = metrics.RequestMetrics()
+        token = metrics.current.set(measured)
+        try:
+            with override_settings(TEMPLATES=self.engines["jinja2"]):
+                engines["jinja"].from_string('{{ url("blog_index") }}').render()
+        finally:
+            metrics.current.reset(token)
+        self.assertGreater(measured.template_ms, 0)
+
+
+    def test_benchmark_command(self):
+        """
+        Test that the benchmark renders the pages with both engines and
+        leaves the data as it was.
+        """
+
+        out = StringIO()
+        call_command(
+            "benchmark_templates", "--posts", "20", "--iterations", "1", "--page-size", "5",
+            stdout=out,
+        )
+        self.assertIn("jinja2", out.getvalue())
+        self.assertEqual(out.getvalue().count("render p50"), 8)
+        self.assertEqual(Post.objects.count(), 2)
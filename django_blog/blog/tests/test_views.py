@@ -1,4 +1,5 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from blog.models import Post, Comment, Category
 from blog.forms import CommentForm
@@ -44,6 +45,81 @@ class BlogIndexViewTests(TestCase):
         self.assertIn(self.post2, response.context["posts"])
 
 
+    def test_blog_index_view_defers_body(self):
+        """
+        Test that the blog_index view shows the excerpt without loading the post body.
+        """
+
+        response = self.client.get(reverse("blog_index"))
+        for post in response.context["posts"]:
+            self.assertIn("body", post.get_deferred_fields())
+        self.assertContains(response, self.post1.excerpt)
+
+
+@override_settings(BLOG_PAGE_SIZE=2)
+class BlogIndexPaginationTests(TestCase):
+    """Tests for the cursor pagination of the blog_index view"""
+
+    def setUp(self):
+        """
+        Set up five posts, which makes three pages of two posts.
+        """
+
+        self.posts = [
+            Post.objects.create(title=f"Post {i}", body=f"Body {i}") for i in range(5)
+        ]
+
+
+    def test_first_page_has_newest_posts(self):
+        """
+        Test that the first page contains the newest posts and links to the next page.
+        """
+
+        response = self.client.get(reverse("blog_index"))
+        page = response.context["page"]
+        self.assertEqual(list(response.context["posts"]), [self.posts[4], self.posts[3]])
+        self.assertTrue(page.has_next)
+        self.assertFalse(page.has_previous)
+
+
+    def test_following_next_cursors_visits_every_post_once(self):
+        """
+        Test that walking the next cursors returns every post exactly once, newest first.
+        """
+
+        seen = []
+        url = reverse("blog_index")
+        response = self.client.get(url)
+        seen.extend(response.context["posts"])
+        while response.context["page"].has_next:
+            response = self.client.get(url, {"after": response.context["page"].next_cursor})
+            seen.extend(response.context["posts"])
+        self.assertEqual(seen, self.posts[::-1])
+        self.assertTrue(response.context["page"].has_previous)
+
+
+    def test_previous_cursor_returns_previous_page(self):
+        """
+        Test that the previous cursor of the second page leads back to the first page.
+        """
+
+        url = reverse("blog_index")
+        first = self.client.get(url)
+        second = self.client.get(url, {"after": first.context["page"].next_cursor})
+        back = self.client.get(url, {"before": second.context["page"].previous_cursor})
+        self.assertEqual(list(back.context["posts"]), list(first.context["posts"]))
+        self.assertFalse(back.context["page"].has_previous)
+
+
+    def test_invalid_cursor_returns_404(self):
+        """
+        Test that a malformed cursor returns a 404 status code.
+        """
+
+        response = self.client.get(reverse("blog_index"), {"after": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+
 class BlogCategoryViewTests(TestCase):
     """Tests for the blog_category view"""
 
@@ -63,7 +139,7 @@ class BlogCategoryViewTests(TestCase):
         Test that the blog_category view returns a 200 status code for a valid category.
         """
 
-        response = self.client.get(reverse("blog_category", kwargs={"category": self.category.name}))
+        response = self.client.get(reverse("blog_category", kwargs={"slug": self.category.slug}))
         self.assertEqual(response.status_code, 200)
 
 
@@ -72,7 +148,7 @@ class BlogCategoryViewTests(TestCase):
         Test that the blog_category view uses the correct template.
         """
 
-        response = self.client.get(reverse("blog_category", kwargs={"category": self.category.name}))
+        response = self.client.get(reverse("blog_category", kwargs={"slug": self.category.slug}))
         self.assertTemplateUsed(response, "blog/category.html")
 
 
@@ -81,9 +157,32 @@ class BlogCategoryViewTests(TestCase):
         Test that the blog_category view provides the correct context data.
         """
 
-        response = self.client.get(reverse("blog_category", kwargs={"category": self.category.name}))
+        response = self.client.get(reverse("blog_category", kwargs={"slug": self.category.slug}))
         self.assertIn(self.post1, response.context["posts"])
         self.assertNotIn(self.post2, response.context["posts"])
+        self.assertEqual(response.context["category"], self.category)
+
+
+    def test_blog_category_view_redirects_name_urls(self):
+        """
+        Test that the old name based URL redirects permanently to the slug URL.
+        """
+
+        response = self.client.get(f"/category/{self.category.name}/")
+        self.assertRedirects(
+            response,
+            reverse("blog_category", kwargs={"slug": self.category.slug}),
+            status_code=301,
+        )
+
+
+    def test_blog_category_view_does_not_match_partial_names(self):
+        """
+        Test that a part of a category name does not match the category.
+        """
+
+        response = self.client.get(reverse("blog_category", kwargs={"slug": "test"}))
+        self.assertEqual(response.status_code, 404)
 
 
 class BlogDetailViewTests(TestCase):
@@ -94,6 +193,7 @@ class BlogDetailViewTests(TestCase):
         Set up a test post and comments for testing the blog_detail view.
         """
 
+        cache.clear()
         self.post = Post.objects.create(title="Test Post", body="Test Body")
         self.comment = Comment.objects.create(
             author="Test Author", body="Test Comment", post=self.post
@@ -178,3 +278,59 @@ class BlogDetailViewTests(TestCase):
         response = self.client.post(self.url, data)
         self.assertEqual(response.status_code, 200)  # re-renders the page
         self.assertFalse(Comment.objects.filter(body="Invalid Comment").exists())
+
+
+@override_settings(BLOG_COMMENTS_PAGE_SIZE=2)
+class BlogCommentPaginationTests(TestCase):
+    """Tests for the paginated comments of the blog_detail and blog_comments views"""
+
+    def setUp(self):
+        """
+        Set up a post with three comments, which makes two pages of comments.
+        """
+
+        cache.clear()
+        self.post = Post.objects.create(title="Test Post", body="Test Body")
+        self.comments = [
+            Comment.objects.create(author=f"Author {i}", body=f"Comment {i}", post=self.post)
+            for i in range(3)
+        ]
+        self.url = reverse("blog_detail", kwargs={"pk": self.post.pk})
+
+
+    def test_blog_detail_shows_first_page_of_comments(self):
+        """
+        Test that the detail page shows the oldest comments and links to the next page.
+        """
+
+        response = self.client.get(self.url)
+        self.assertEqual(list(response.context["comments"]), self.comments[:2])
+        next_cursor = response.context["comments"].next_cursor
+        self.assertContains(response, f"?comments={next_cursor}")
+
+        response = self.client.get(self.url, {"comments": next_cursor})
+        self.assertEqual(list(response.context["comments"]), self.comments[2:])
+        self.assertNotContains(response, "More comments")
+
+
+    def test_blog_comments_returns_json_pages(self):
+        """
+        Test that the blog_comments view returns the comments page by page as JSON.
+        """
+
+        url = reverse("blog_comments", kwargs={"pk": self.post.pk})
+        data = self.client.get(url).json()
+        self.assertEqual([c["body"] for c in data["comments"]], ["Comment 0", "Comment 1"])
+
+        data = self.client.get(url, {"after": data["next"]}).json()
+        self.assertEqual([c["body"] for c in data["comments"]], ["Comment 2"])
+        self.assertIsNone(data["next"])
+
+
+    def test_blog_comments_unknown_post_returns_404(self):
+        """
+        Test that the blog_comments view returns 404 for a post that doesn't exist.
+        """
+
+        response = self.client.get(reverse("blog_comments", kwargs={"pk": self.post.pk + 1}))
+        self.assertEqual(response.status_code, 404)
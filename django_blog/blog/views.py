@@ -1,77 +1,379 @@
-from django.http import HttpResponseRedirect
-from django.shortcuts import render
-from blog.models import Post, Comment
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import OuterRef, Subquery
+from django.http import Http404, HttpResponseRedirect, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.functional import SimpleLazyObject
+from blog import metrics
+from blog.models import ArchivedComment, Category, Post, Comment, RelatedPost
+from blog.cache import EPOCH, category_nav, conditional_page, fragment_timeout
 from blog.forms import CommentForm
+from blog.outbox import save_comment
+from blog.ratelimit import check_comment
+from blog.pagination import (
+    CursorPaginator,
+    decode_cursor,
+    get_comments_page_size,
+    get_page_size,
+    paginate,
+)
+from blog.related import related_posts
+from blog.search import search_posts
 
 
+def listing_queryset(queryset):
+    """
+    Prepares a queryset of posts for the listing pages. The categories
+    of all the posts on a page are loaded with a single extra query
+    instead of one query per post. The body and its rendered HTML are
+    not loaded at all, the listings only show the stored excerpt.
+    """
+
+    return queryset.defer("body", "body_html").prefetch_related("categories")
+
+
+def page_rows(request, queryset):
+    """
+    Returns a queryset of the ids, modification times, comment counts
+    and newest comment times of the posts on the requested listing
+    page. This is all that is needed to tell whether the page has
+    changed. A new comment doesn't bump last_modified of its post.
+    """
+
+    newest_comment = (
+        Comment.objects.filter(post=OuterRef("pk"))
+        .order_by("-created_on")
+        .values("created_on")[:1]
+    )
+    return (
+        CursorPaginator(queryset)
+        .page_queryset(after=request.GET.get("after"), before=request.GET.get("before"))
+        .annotate(latest_on=Subquery(newest_comment))
+        .values_list("id", "last_modified", "comment_count", "latest_on")
+    )
+
+
+def rows_modified(rows):
+    """
+    Returns the last modification time of the rows returned by
+    page_rows, new comments included.
+    """
+
+    return max((max(row[1], row[3] or EPOCH) for row in rows), default=EPOCH)
+
+
+def listing_version(rows, nav, *extra):
+    """
+    Returns the ETag version and the last modification time of a
+    listing page from the rows returned by page_rows and the category
+    navigation shown on every page.
+    """
+
+    return (extra, rows, nav["version"]), max(rows_modified(rows), nav["last_modified"])
+
+
+def index_validators(request):
+    return listing_version(list(page_rows(request, Post.objects.all())), category_nav())
+
+
+def category_validators(request, slug):
+    category = Category.objects.filter(slug=slug).values("pk", "name").first()
+    if category is None:
+        return None
+    rows = page_rows(request, Post.objects.filter(categories=category["pk"]))
+    return listing_version(list(rows), category_nav(), category["name"])
+
+
+def newest_related():
+    """
+    Returns a subquery of the newest last_modified of the related posts
+    of the post in the outer query.
+    """
+
+    return Subquery(
+        RelatedPost.objects.filter(post=OuterRef("pk"))
+        .order_by("-related__last_modified")
+        .values("related__last_modified")[:1]
+    )
+
+
+def post_validator_queryset(pk):
+    """
+    Returns a queryset of last_modified and comment_count of the post,
+    the time of its newest comment, found through the comment index,
+    and the newest last_modified of its related posts, whose titles
+    the page shows.
+    """
+
+    newest_comment = (
+        Comment.objects.filter(post=OuterRef("pk"))
+        .order_by("-created_on")
+        .values("created_on")[:1]
+    )
+    return (
+        Post.objects.filter(pk=pk)
+        .annotate(latest_on=Subquery(newest_comment), related_on=newest_related())
+        .values("last_modified", "comment_count", "latest_on", "related_on")
+    )
+
+
+def post_version(request, pk, post, nav):
+    """
+    Returns the ETag version and the last modification time of a post
+    page. Editing or deleting comments bumps last_modified of the post
+    and new comments change comment_count. Editing a related post
+    bumps its own last_modified. The category navigation is part of
+    the page as well.
+    """
+
+    if post is None:
+        return None
+    version = (
+        pk, post["last_modified"], post["comment_count"], post["related_on"],
+        request.GET.get("comments"), nav["version"],
+    )
+    last_modified = max(
+        post["last_modified"], post["latest_on"] or EPOCH, post["related_on"] or EPOCH
+    )
+    return version, max(last_modified, nav["last_modified"])
+
+
+def detail_validators(request, pk):
+    return post_version(request, pk, post_validator_queryset(pk).first(), category_nav())
+
+
+def archived_validators(request, pk):
+    post = Post.objects.filter(pk=pk).values("last_modified", "archived_comment_count").first()
+    if post is None:
+        return None
+    nav = category_nav()
+    version = (
+        pk, post["last_modified"], post["archived_comment_count"], request.GET.get("after"),
+        nav["version"],
+    )
+    return version, max(post["last_modified"], nav["last_modified"])
+
+
+def comment_page(request, context, rejected=None):
+    """
+    Renders the post page. A rejected comment is shown again with the
+    reason, in a 429 response that tells the client when to retry.
+    """
+
+    if rejected is None:
+        return render(request, "blog/detail.html", context)
+    response = render(request, "blog/detail.html", context, status=429)
+    response.headers["Retry-After"] = str(rejected[1])
+    return response
+
+
+def comments_paginator(post):
+    """
+    Returns a paginator over the comments of the post, oldest first.
+    """
+
+    return CursorPaginator(
+        Comment.objects.filter(post=post),
+        page_size=get_comments_page_size(),
+        descending=False,
+    )
+
+
+@conditional_page(index_validators)
 def blog_index(request):
     """
     Display a list of all posts. Obtains a queryset containing 
     all the posts in the database, arranges the objects 
-    according to the argument given. Define a context dictionary 
-    and render a template named index.html.
+    according to the argument given. Only one page of posts is
+    fetched, continuing from the cursor given in the query string.
+    Define a context dictionary and render a template named index.html.
     """
 
-    posts = Post.objects.all().order_by("-created_on")
+    page = paginate(request, listing_queryset(Post.objects.all()))
     context = {
-        "posts": posts,
+        "posts": page.object_list,
+        "page": page,
     }
 
     return render(request, "blog/index.html", context)
 
-def blog_category(request, category):
+@conditional_page(category_validators)
+def blog_category(request, slug):
     """
-    Display posts in the given category. Filter returns
-    posts whose categories contain the corresponding category name.
+    Display posts in the given category. The category is looked up
+    by its unique slug and the posts are filtered by the category's
+    primary key, which are both indexed lookups. Links that still
+    use the category name are redirected permanently to the slug URL.
+    The posts are paginated the same way as in blog_index.
     Add posts and the category to the context dictionary and render 
     a template named category.html.
     """
 
-    posts = Post.objects.filter(
-        categories__name__contains=category
-    ).order_by("-created_on")
+    category = Category.objects.filter(slug=slug).first()
+    if category is None:
+        category = Category.objects.filter(name=slug).order_by("pk").first()
+        if category is None:
+            raise Http404("No category found.")
+        return redirect("blog_category", slug=category.slug, permanent=True)
+
+    page = paginate(request, listing_queryset(Post.objects.filter(
+        categories=category
+    )))
     context = {
         "category": category,
-        "posts": posts,
+        "posts": page.object_list,
+        "page": page,
     }
 
     return render(request, "blog/category.html", context)
 
 
+@conditional_page(detail_validators)
 def blog_detail(request, pk):
     """
     Displays the full post. Requesting a single post with the specific 
-    primary key that is provided. Retrieves all the comments assigned
-    to the given post. If there is none comments, then the QuerySet is
-    empty. Add post and comments to the context dictionary and render
+    primary key that is provided, or returns 404 when it doesn't exist.
+    Retrieves one page of the comments assigned to the given post,
+    continuing from the cursor given in the `comments` parameter.
+    Add post and comments to the context dictionary and render
     a template named detail.html.
 
+    The body is shown from its stored HTML, the raw body isn't loaded.
+    The category bar and the comment list are cached as rendered
+    fragments. They are keyed by last_modified and comment_count of
+    the post, so the categories and the comments are only queried
+    when a fragment has changed. The related posts are precomputed
+    and read with a single indexed lookup.
+
     Makes an instance of comment form, checks if it receives a POST request.
     If receives, updates form with the data of the POST request, 
     validates the form with .is_valid. After that saves the form and redirects
-    the user to the path_info.
+    the user to the path_info. With BLOG_COMMENT_QUEUE on the comment is
+    only put in the outbox, and shows up once drain_comments has run.
+    Comments sent too quickly from one address or to one post, and
+    repeated comments, are turned away with a 429 response before
+    anything is written.
     """
 
-    post = Post.objects.get(pk=pk)
+    post = get_object_or_404(Post.objects.defer("body"), pk=pk)
     form = CommentForm()
+    rejected = None
 
     if request.method == "POST":
         form = CommentForm(request.POST)
         if form.is_valid():
-            comment = Comment(
-                author=form.cleaned_data["author"],
-                body=form.cleaned_data["body"],
-                post=post,
-            )
-            comment.save()
+            rejected = check_comment(request, pk, form.cleaned_data)
+            if rejected is None:
+                save_comment(post, form.cleaned_data)
 
-            return HttpResponseRedirect(request.path_info)
+                return HttpResponseRedirect(request.path_info)
+            form.add_error(None, rejected[0])
 
-    comments = Comment.objects.filter(post=post)
+    cursor = request.GET.get("comments", "")
+    if cursor:
+        decode_cursor(cursor)
+    paginator = comments_paginator(post)
+    # Only queried when the comment list fragment isn't cached
+    comments = SimpleLazyObject(lambda: paginator.get_page(after=cursor or None))
     context = {
         "post": post,
+        "categories": post.categories.all(),
+        "related_posts": related_posts(pk),
         "comments": comments,
-        "form": CommentForm(),
+        "comments_cursor": cursor,
+        "cache_timeout": fragment_timeout(),
+        "form": form if rejected else CommentForm(),
+    }
+
+    return comment_page(request, context, rejected)
+
+
+@conditional_page(archived_validators)
+def blog_archived_comments(request, pk):
+    """
+    Displays the archived comments of a post, which the post's page
+    only links to. They are read from the archive table only when this
+    page is requested, oldest first and one page at a time, continuing
+    from the cursor given in the `after` parameter.
+    Add post and comments to the context dictionary and render
+    a template named archived_comments.html.
+    """
+
+    post = get_object_or_404(Post.objects.only("title", "archived_comment_count"), pk=pk)
+    paginator = CursorPaginator(
+        ArchivedComment.objects.filter(post=post),
+        page_size=get_comments_page_size(),
+        descending=False,
+    )
+    context = {
+        "post": post,
+        "comments": paginator.get_page(after=request.GET.get("after")),
     }
 
-    return render(request, "blog/detail.html", context)
\ No newline at end of file
+    return render(request, "blog/archived_comments.html", context)
+
+
+def blog_comments(request, pk):
+    """
+    Returns a page of the post's comments as JSON, continuing from the
+    cursor given in the `after` parameter. The response contains the
+    comments and the cursor of the next page, which is null on the
+    last page.
+    """
+
+    post = get_object_or_404(Post.objects.only("pk"), pk=pk)
+    page = comments_paginator(post).get_page(after=request.GET.get("after"))
+    data = {
+        "comments": [
+            {
+                "id": comment.pk,
+                "author": comment.author,
+                "body": comment.body,
+                "created_on": comment.created_on.isoformat(),
+            }
+            for comment in page
+        ],
+        "next": page.next_cursor,
+    }
+
+    return JsonResponse(data)
+
+
+def blog_search(request):
+    """
+    Display the posts that match the search query given in the `q`
+    parameter. The posts are ranked by the full-text search index,
+    matches in the title first, and shown with the matching words
+    highlighted. The results are split into numbered pages.
+    Add the query, the posts and the page number to the context
+    dictionary and render a template named search.html.
+    """
+
+    query = request.GET.get("q", "").strip()
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        raise Http404("Invalid page number.")
+
+    posts, has_next = search_posts(query, page, get_page_size())
+    context = {
+        "query": query,
+        "posts": posts,
+        "page_number": page,
+        "has_next": has_next,
+    }
+
+    return render(request, "blog/search.html", context)
+
+
+@staff_member_required
+def blog_metrics(request):
+    """
+    Returns the request metrics recorded by PerformanceMiddleware as
+    JSON: per view the number of measured requests and the p50, p95
+    and p99 of each metric, over the windows still kept. Only shown to
+    staff users.
+    """
+
+    # Include what this process recorded since its last flush
+    metrics.recorder.flush()
+    return JsonResponse(metrics.report())
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -23,9 +24,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-(jfh@9hkq=t&l^78rv_g$oe#glxcej=-j5^zf1f!m!&$69lnph'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# Set BLOG_DEBUG=0 and the host names in BLOG_ALLOWED_HOSTS there
+DEBUG = os.environ.get('BLOG_DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.environ.get('BLOG_ALLOWED_HOSTS', '').split(',') if host]
 
 
 # Application definition
@@ -41,7 +43,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'blog.middleware.PerformanceMiddleware',
+    'blog.middleware.ReadReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'blog.middleware.StaticFilesMiddleware',
+    'django.middleware.gzip.GZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,31 +60,142 @@ ROOT_URLCONF = 'personal_blog.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django templates that report their render time to the metrics
+        'BACKEND': 'blog.metrics.TimedDjangoTemplates',
         'DIRS': [
             BASE_DIR / 'templates/',
         ],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'blog.context_processors.category_nav',
+            ],
+            # Templates are parsed once per process and kept compiled.
+            # With DEBUG on, the autoreloader clears the cache when a
+            # template file changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
         },
     },
 ]
 
+# Jinja2 versions of the index, category and post pages, in
+# blog/jinja2/. Used before the Django templates with
+# BLOG_TEMPLATE_ENGINE=jinja2, which needs the Jinja2 package. Compiled
+# templates are kept in memory, and only checked for changes with
+# DEBUG on
+
+BLOG_JINJA2_TEMPLATES = {
+    'BACKEND': 'blog.jinja.TimedJinja2',
+    'DIRS': [],
+    'APP_DIRS': True,
+    'OPTIONS': {
+        'environment': 'blog.jinja.environment',
+        'context_processors': [
+            'blog.context_processors.category_nav',
+        ],
+        'auto_reload': DEBUG,
+        'cache_size': 400,
+    },
+}
+
+BLOG_TEMPLATE_ENGINE = os.environ.get('BLOG_TEMPLATE_ENGINE', 'django')
+
+if BLOG_TEMPLATE_ENGINE == 'jinja2':
+    TEMPLATES = [BLOG_JINJA2_TEMPLATES, *TEMPLATES]
+
 WSGI_APPLICATION = 'personal_blog.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# Configured through the environment. BLOG_DB_ENGINE is 'sqlite'
+# (the default) or 'postgresql'.
+
+BLOG_DB_ENGINE = os.environ.get('BLOG_DB_ENGINE', 'sqlite')
+
+if BLOG_DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('BLOG_DB_NAME', 'personal_blog'),
+            'USER': os.environ.get('BLOG_DB_USER', ''),
+            'PASSWORD': os.environ.get('BLOG_DB_PASSWORD', ''),
+            'HOST': os.environ.get('BLOG_DB_HOST', ''),
+            'PORT': os.environ.get('BLOG_DB_PORT', ''),
+            'OPTIONS': {},
+        }
+    }
+    # psycopg's connection pool, instead of persistent connections
+    if os.environ.get('BLOG_DB_POOL') == '1':
+        DATABASES['default']['OPTIONS']['pool'] = True
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('BLOG_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Seconds a connection waits for the write lock
+                'timeout': 5,
+                # Take the write lock when a transaction starts, so
+                # transactions don't fail upgrading a read lock
+                'transaction_mode': 'IMMEDIATE',
+                # Run on every new connection. WAL lets readers go on
+                # while a write is in progress, with NORMAL sync it
+                # stays safe against crashes of the application.
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA mmap_size=134217728;'
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
+    }
+
+# Keep connections open between requests. Under ASGI persistent
+# connections don't work well, since every request may run in another
+# thread, so they are off there unless BLOG_DB_CONN_MAX_AGE is set.
+# With BLOG_DB_POOL the pool keeps the connections instead.
+
+DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get(
+    'BLOG_DB_CONN_MAX_AGE',
+    0 if os.environ.get('BLOG_ASYNC_VIEWS') == '1' or os.environ.get('BLOG_DB_POOL') == '1' else 60,
+))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Optional read replica, used by the read-only blog views. Set
+# BLOG_DB_REPLICA_HOST (PostgreSQL) or BLOG_DB_REPLICA_NAME to the
+# replica, the other settings are taken from the default database.
+
+if os.environ.get('BLOG_DB_REPLICA_HOST') or os.environ.get('BLOG_DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ.get('BLOG_DB_REPLICA_HOST', DATABASES['default'].get('HOST', '')),
+        'NAME': os.environ.get('BLOG_DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    BLOG_READ_REPLICA = 'replica'
+
+DATABASE_ROUTERS = ['blog.routers.ReadReplicaRouter']
 
-DATABASES = {
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The local-memory cache is per process. In production any shared
+# backend (Redis, Memcached, database) can be configured here.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'personal-blog',
     }
 }
 
@@ -119,6 +236,123 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# collectstatic gives the files names with a hash of their content and
+# writes gzip and Brotli compressed copies of them, which
+# blog.middleware.StaticFilesMiddleware serves with far-future cache
+# headers. The pages themselves are gzipped per request by
+# GZipMiddleware, for clients that accept it
+
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'blog.storage.StaticFilesStorage',
+    },
+}
+
+# Blog
+# Number of posts shown per page on the listing pages
+
+BLOG_PAGE_SIZE = 10
+
+# Number of comments shown per page on a post's page
+
+BLOG_COMMENTS_PAGE_SIZE = 50
+
+# Number of newest posts included in the feeds
+
+BLOG_FEED_LENGTH = 50
+
+# Seconds the rendered post fragments are kept in the cache
+
+BLOG_FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+# Cache whole pages for anonymous readers, keyed by their ETag
+
+BLOG_PAGE_CACHE = True
+
+BLOG_PAGE_CACHE_TIMEOUT = 60 * 10
+
+# Serve the read views with their async versions. asgi.py turns this
+# on, so ASGI deployments don't hop to a thread for every request
+
+BLOG_ASYNC_VIEWS = os.environ.get('BLOG_ASYNC_VIEWS') == '1'
+
+# Put new comments in an outbox that the drain_comments command writes
+# to the comment table in batches, instead of saving each one directly
+
+BLOG_COMMENT_QUEUE = os.environ.get('BLOG_COMMENT_QUEUE') == '1'
+
+# Comments allowed per client address and per post, as (comments,
+# seconds) token buckets kept in the cache. None turns a limit off
+
+BLOG_COMMENT_RATE_PER_IP = (5, 60)
+
+BLOG_COMMENT_RATE_PER_POST = (30, 60)
+
+# Seconds during which the same comment on the same post is rejected
+
+BLOG_COMMENT_DUPLICATE_WINDOW = 60 * 10
+
+# META key of the header holding the client address when running
+# behind a reverse proxy, e.g. 'HTTP_X_FORWARDED_FOR'
+
+BLOG_CLIENT_IP_HEADER = None
+
+# Comments moved to the archive by the archive_comments command: those
+# older than BLOG_COMMENT_ARCHIVE_DAYS days and those beyond the newest
+# BLOG_COMMENT_ARCHIVE_KEEP of a post. None keeps them
+
+BLOG_COMMENT_ARCHIVE_DAYS = None
+
+BLOG_COMMENT_ARCHIVE_KEEP = None
+
+# Comments deleted per statement when a post is deleted
+
+BLOG_DELETE_CHUNK_SIZE = 1000
+
+# Related posts kept and shown for every post, ranked by the
+# categories they share, chosen from the given number of posts before
+# and after the post in each of its categories. A change to a post
+# ranks the lists of those posts again. See the rebuild_related_posts
+# command
+
+BLOG_RELATED_POSTS = 5
+
+BLOG_RELATED_CANDIDATES = 50
+
+# Record per view timings, query counts and response sizes with
+# blog.middleware.PerformanceMiddleware, for the given fraction of
+# requests. See the metrics_report command and the blog_metrics view
+
+BLOG_METRICS = os.environ.get('BLOG_METRICS') == '1'
+
+BLOG_METRICS_SAMPLE_RATE = float(os.environ.get('BLOG_METRICS_SAMPLE_RATE', '0.1'))
+
+# The histograms cover BLOG_METRICS_WINDOWS windows of
+# BLOG_METRICS_WINDOW seconds
+
+BLOG_METRICS_WINDOW = 60
+
+BLOG_METRICS_WINDOWS = 15
+
+# Views that read from the replica database, when there is one, and
+# seconds a visitor reads from the default database after sending a
+# form, so they see their own changes despite replication lag
+
+BLOG_REPLICA_VIEWS = [
+    'blog_index', 'blog_category', 'blog_detail', 'blog_comments', 'blog_archived_comments',
+    'blog_search',
+    'blog_feed_atom', 'blog_feed_rss', 'blog_feed_json',
+    'blog_category_feed_atom', 'blog_category_feed_rss', 'blog_category_feed_json',
+    'blog_api_posts', 'blog_api_post', 'blog_api_comments', 'blog_api_categories',
+]
+
+BLOG_REPLICA_PIN_SECONDS = 10
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 